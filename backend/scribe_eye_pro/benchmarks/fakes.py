@@ -0,0 +1,167 @@
+"""
+Deterministic stand-ins for Gemini used by the offline benchmarks: same input, same
+output, with configurable latency so provider time can be modelled without a network.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hashed bag-of-words vectors: texts sharing words get similar vectors, so retrieval
+    behaves plausibly. Each provider call sleeps `latency` seconds plus
+    `latency_per_text` per text.
+    """
+
+    def __init__(self, dimension: int = 768, latency: float = 0.05, latency_per_text: float = 0.0):
+        self.dimension = dimension
+        self.latency = latency
+        self.latency_per_text = latency_per_text
+        self.calls = 0
+        self.texts = 0
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in re.findall(r"\w+", text.casefold()):
+            vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.dimension] += 1
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _delay(self, count: int) -> float:
+        self.calls += 1
+        self.texts += count
+        return self.latency + self.latency_per_text * count
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self._delay(len(texts)))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self._delay(1))
+        return self._vector(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self._delay(len(texts)))
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self._delay(1))
+        return self._vector(text)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Answers the extraction prompt with JSON built from the screenplay's character cues
+    and scene headings, and any other prompt with a short answer made of the prompt's
+    last words. Each call waits `latency` seconds; streaming waits `token_latency` per word.
+    """
+
+    latency: float = 0.2
+    token_latency: float = 0.005
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        self.calls += 1
+        prompt = "\n".join(message.content for message in messages if isinstance(message.content, str))
+        if "extract the key entities" in prompt:
+            characters = sorted(set(re.findall(r"^([A-Z][A-Z .']{2,})$", prompt, re.M)))
+            locations = sorted(set(re.findall(r"^(?:INT|EXT)\. ([A-Z' ]+?)(?: -|$)", prompt, re.M)))
+            text = json.dumps({
+                "characters": [{"name": name.title(), "description": f"Speaks as {name}."} for name in characters],
+                "locations": [{"name": name.title(), "description": "A scene location."} for name in locations],
+                "events": [],
+            })
+        else:
+            words = re.findall(r"\w+", prompt)
+            text = "Based on the script, " + " ".join(words[-30:]) + "."
+        usage = {
+            "input_tokens": len(prompt) // 4,
+            "output_tokens": len(text) // 4,
+            "total_tokens": (len(prompt) + len(text)) // 4,
+        }
+        return AIMessage(content=text, usage_metadata=usage)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for word in self._respond(messages).content.split(" "):
+            time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for word in self._respond(messages).content.split(" "):
+            await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+
+_CHARACTERS = ["MARA", "JONAS", "ELSPETH", "CAPTAIN VOSS", "ODILE", "BRAM", "THE WARDEN", "PIP"]
+_PLACES = ["LIGHTHOUSE", "HARBOUR MARKET", "OBSERVATORY", "RAIL YARD", "CHAPEL", "ORCHARD", "SALT MINE"]
+WORDS = (
+    "the a of and to in that it with as on was for at by from his her they storm lamp "
+    "ledger tide glass iron door window rain letter silence map key shadow bell road "
+    "river smoke engine whisper promise debt harbour lantern candle north south"
+).split()
+
+
+def synthetic_script(size_bytes: int, seed: int = 0) -> str:
+    """A screenplay-shaped text of about `size_bytes` characters; the same seed gives the same text."""
+    rng = random.Random(seed)
+    parts, length, scene = [], 0, 0
+    while length < size_bytes:
+        scene += 1
+        heading = f"{rng.choice(['INT.', 'EXT.'])} {rng.choice(_PLACES)} - {rng.choice(['DAY', 'NIGHT', 'DAWN'])}"
+        lines = [heading, "", " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 45))).capitalize() + "."]
+        for _ in range(rng.randint(2, 5)):
+            lines += ["", rng.choice(_CHARACTERS), " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18))).capitalize() + "."]
+        text = "\n".join(lines)
+        parts.append(text)
+        length += len(text) + 2
+    return "\n\n".join(parts)[:size_bytes]
@@ -0,0 +1,126 @@
+"""
+Retrieval benchmark: vector-only vs hybrid (BM25 + vector, reciprocal-rank fusion).
+
+Indexes the fixture corpus into a throwaway local vector index and reports, for each
+mode, recall@1 and recall@k (a question counts as recalled when one of its top chunks
+contains the expected passage), MRR and retrieval latency. With --answer it also runs
+the answer chain on the retrieved chunks and reports end-to-end latency.
+
+Embeddings (and answers) come from Gemini, so GEMINI_API_KEY must be set; set
+EMBEDDING_CACHE_PATH to make reruns free. Run from backend/scribe_eye_pro:
+
+    python -m benchmarks.retrieval [--answer] [--json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+# Index into a temporary local store instead of the configured backend.
+os.environ["VECTOR_BACKEND"] = "local"
+os.environ["LOCAL_INDEX_DIR"] = tempfile.mkdtemp(prefix="retrieval-benchmark-")
+
+from services import langchain_service  # noqa: E402
+from services.lexical_index import ProjectLexicalIndex, lexical_index  # noqa: E402
+from vector_store import aadd_texts_batched, embeddings  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "retrieval_corpus.json")
+
+
+async def index_corpus(corpus: Dict[str, Any]):
+    project_id = corpus["project_id"]
+    index = ProjectLexicalIndex()
+    for script in corpus["scripts"]:
+        chunks = langchain_service.split_script(script["content"], script["id"])
+        await aadd_texts_batched(
+            texts=[chunk["text"] for chunk in chunks],
+            metadatas=[{"project_id": project_id, "script_id": script["id"]} for _ in chunks],
+            ids=[chunk["id"] for chunk in chunks],
+        )
+        index.replace_script(script["id"], {chunk["id"]: chunk["text"] for chunk in chunks})
+    lexical_index.install(project_id, index, lexical_index.version(project_id))
+
+
+def _percentile(values: List[float], percentile: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[percentile - 1]
+
+
+async def run_mode(corpus: Dict[str, Any], question_embeddings: Dict[str, List[float]], hybrid: bool, answer: bool):
+    project_id = corpus["project_id"]
+    chain = await langchain_service.qa_chain.aget() if answer else None
+    ranks, retrieval_ms, answer_ms = [], [], []
+    for query in corpus["queries"]:
+        started = time.perf_counter()
+        documents = await langchain_service.retrieve_chunks(
+            project_id, query["question"], question_embeddings[query["question"]], hybrid=hybrid
+        )
+        retrieval_ms.append((time.perf_counter() - started) * 1000)
+        rank = next((i for i, doc in enumerate(documents, start=1) if query["relevant"] in doc.page_content), None)
+        ranks.append(rank)
+
+        if chain is not None:
+            started = time.perf_counter()
+            await chain.ainvoke({"context": documents, "question": query["question"]})
+            answer_ms.append((time.perf_counter() - started) * 1000)
+
+    report = {
+        "mode": "hybrid" if hybrid else "vector",
+        "queries": len(ranks),
+        "recall@1": sum(1 for rank in ranks if rank == 1) / len(ranks),
+        f"recall@{langchain_service.QA_TOP_K}": sum(1 for rank in ranks if rank) / len(ranks),
+        "mrr": sum(1 / rank for rank in ranks if rank) / len(ranks),
+        "retrieval_ms_p50": statistics.median(retrieval_ms),
+        "retrieval_ms_p95": _percentile(retrieval_ms, 95),
+        "missed": [query["question"] for query, rank in zip(corpus["queries"], ranks) if not rank],
+    }
+    if answer_ms:
+        totals = [r + a for r, a in zip(retrieval_ms, answer_ms)]
+        report["end_to_end_ms_p50"] = statistics.median(totals)
+        report["end_to_end_ms_p95"] = _percentile(totals, 95)
+    return report
+
+
+async def main(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--answer", action="store_true", help="also generate answers and time end to end")
+    parser.add_argument("--json", action="store_true", help="print the reports as JSON")
+    args = parser.parse_args(argv)
+
+    with open(FIXTURE, encoding="utf-8") as fixture:
+        corpus = json.load(fixture)
+    await index_corpus(corpus)
+
+    # Embed every question once up front so both modes see the same (cached) embedding
+    # cost; the embedding call is reported separately.
+    question_embeddings, embed_ms = {}, []
+    for query in corpus["queries"]:
+        started = time.perf_counter()
+        question_embeddings[query["question"]] = await (await embeddings.aget()).aembed_query(query["question"])
+        embed_ms.append((time.perf_counter() - started) * 1000)
+
+    reports = [await run_mode(corpus, question_embeddings, hybrid, args.answer) for hybrid in (False, True)]
+    for report in reports:
+        report["question_embedding_ms_p50"] = statistics.median(embed_ms)
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    for report in reports:
+        print(f"{report['mode']}:")
+        for key, value in report.items():
+            if key in ("mode", "missed"):
+                continue
+            print(f"  {key:28} {value:.3f}" if isinstance(value, float) else f"  {key:28} {value}")
+        for question in report["missed"]:
+            print(f"  missed: {question}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,181 @@
+"""
+Serialization microbenchmark for list endpoints: the model path (a Pydantic model per
+document from the `*_helper` functions, validated and serialized again through the
+route's response_model) against the fast path (`*_row` dicts encoded with orjson, see
+fast_json.py), as one JSON array and as an NDJSON stream.
+
+Each path is a route on a throwaway FastAPI app serving the same in-memory entity
+documents, so no database is involved. The ASGI app is called directly to time the
+first body bytes as well as the whole response, and tracemalloc reports the peak
+memory allocated while serving it (the collected body included). Run from
+backend/scribe_eye_pro:
+
+    python -m benchmarks.serialization [--entities 10000] [--runs 5] [--json]
+"""
+import os
+
+os.environ.setdefault("MONGO_DETAILS", "mongodb://localhost:27017")
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import random  # noqa: E402
+import statistics  # noqa: E402
+import time  # noqa: E402
+import tracemalloc  # noqa: E402
+from datetime import datetime, timedelta  # noqa: E402
+from typing import Any, Dict, List  # noqa: E402
+
+from bson import ObjectId  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from benchmarks.fakes import WORDS  # noqa: E402
+from database import entity_helper, entity_row  # noqa: E402
+from fast_json import json_page, ndjson_response  # noqa: E402
+from models import EntityResponse  # noqa: E402
+from routes.analysis import ENTITY_SORT  # noqa: E402
+
+ENTITY_TYPES = ["character", "location", "event"]
+
+
+def synthetic_entities(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Entity documents shaped like the extraction job's, sorted as the list route sorts them."""
+    rng = random.Random(seed)
+    project_id, script_id = str(ObjectId()), str(ObjectId())
+    created = datetime(2024, 1, 1)
+    docs = []
+    for i in range(count):
+        docs.append({
+            "_id": ObjectId(),
+            "project_id": project_id,
+            "script_id": script_id,
+            "type": rng.choice(ENTITY_TYPES),
+            "name": " ".join(rng.choice(WORDS) for _ in range(2)).title() + f" {i}",
+            "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 40))),
+            "attributes": {"role": rng.choice(WORDS), "aliases": [rng.choice(WORDS) for _ in range(2)]},
+            "created_at": created + timedelta(seconds=i, microseconds=rng.randint(0, 999) * 1000),
+        })
+    docs.sort(key=lambda doc: (doc["type"], doc["name"], doc["_id"]))
+    return docs
+
+
+def build_app(docs: List[Dict[str, Any]]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/models", response_model=List[EntityResponse])
+    async def models_path():
+        return [entity_helper(doc) for doc in docs]
+
+    @app.get("/fast", response_model=List[EntityResponse])
+    async def fast_path():
+        # Every document in one page, like the model route.
+        return json_page(docs, entity_row, ENTITY_SORT, len(docs))
+
+    @app.get("/ndjson", response_model=List[EntityResponse])
+    async def ndjson_path():
+        async def cursor():
+            for doc in docs:
+                yield doc
+        return ndjson_response(cursor(), entity_row)
+
+    return app
+
+
+async def request(app: FastAPI, path: str) -> Dict[str, Any]:
+    """Calls the app for `path`; returns the body and the time to the first body bytes and to the end."""
+    # ASGI spec 2.4: streaming responses do not poll receive() for a disconnect.
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"benchmark")], "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    chunks: List[bytes] = []
+    first = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal first
+        if message["type"] == "http.response.body" and message.get("body"):
+            if first is None:
+                first = time.perf_counter()
+            chunks.append(message["body"])
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    finished = time.perf_counter()
+    return {
+        "body": b"".join(chunks),
+        "first_byte_ms": ((first or finished) - started) * 1000,
+        "total_ms": (finished - started) * 1000,
+    }
+
+
+def parse(path: str, body: bytes) -> List[Dict[str, Any]]:
+    if path == "/ndjson":
+        return [json.loads(line) for line in body.splitlines()]
+    return json.loads(body)
+
+
+async def measure(app: FastAPI, path: str, runs: int) -> Dict[str, Any]:
+    await request(app, path)  # warm-up
+    first_byte, total, peaks = [], [], []
+    for _ in range(runs):
+        tracemalloc.start()
+        result = await request(app, path)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        # Timed again untraced: tracemalloc slows allocation-heavy code unevenly.
+        result = await request(app, path)
+        first_byte.append(result["first_byte_ms"])
+        total.append(result["total_ms"])
+    return {
+        "first_byte_ms": round(statistics.median(first_byte), 2),
+        "total_ms": round(statistics.median(total), 2),
+        "peak_memory_mb": round(statistics.median(peaks) / 1e6, 2),
+        "bytes": len(result["body"]),
+        "body": result["body"],
+    }
+
+
+async def run(entities: int, runs: int) -> Dict[str, Any]:
+    docs = synthetic_entities(entities)
+    app = build_app(docs)
+    report: Dict[str, Any] = {"entities": entities, "runs": runs, "paths": {}}
+    for path in ("/models", "/fast", "/ndjson"):
+        report["paths"][path.strip("/")] = await measure(app, path, runs)
+
+    # The fast paths must produce exactly what the model path does.
+    expected = parse("/models", report["paths"]["models"].pop("body"))
+    for name in ("fast", "ndjson"):
+        if parse(f"/{name}", report["paths"][name].pop("body")) != expected:
+            raise SystemExit(f"{name} output differs from the model path")
+    baseline = report["paths"]["models"]["total_ms"]
+    for stats in report["paths"].values():
+        stats["speedup"] = round(baseline / stats["total_ms"], 1) if stats["total_ms"] else None
+    return report
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Model vs orjson serialization of an entity list.")
+    parser.add_argument("--entities", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.entities, args.runs))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['entities']} entities, median of {report['runs']} runs")
+    print(f"{'path':<8} {'first byte ms':>14} {'total ms':>10} {'peak MB':>9} {'bytes':>11} {'speedup':>8}")
+    for name, stats in report["paths"].items():
+        print(f"{name:<8} {stats['first_byte_ms']:>14} {stats['total_ms']:>10} {stats['peak_memory_mb']:>9} "
+              f"{stats['bytes']:>11} {stats['speedup']:>7}x")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,139 @@
+"""
+Startup benchmark: how long a fresh process takes to import the app, run its startup
+(lifespan) to the point where the server would bind its port, and finish warming
+the lazily created providers.
+
+Each run is a new interpreter so import caches do not flatter the numbers. MongoDB is
+replaced by mongomock for the index setup and the vector backend defaults to the local
+store, so no network is needed; set VECTOR_BACKEND=pinecone (with credentials) to time
+the real index connection. With --importtime it also lists the slowest imported
+packages from `python -X importtime`. Run from backend/scribe_eye_pro:
+
+    python -m benchmarks.startup [--runs 5] [--importtime] [--json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("MONGO_DETAILS", "mongodb://localhost:27017")
+    env.setdefault("GEMINI_API_KEY", "startup-benchmark")
+    env.setdefault("VECTOR_BACKEND", "local")
+    env.setdefault("LOCAL_INDEX_DIR", tempfile.mkdtemp(prefix="startup-benchmark-"))
+    env.update({"RUN_JOB_WORKERS": "false", "EMBEDDING_CACHE_PATH": "", "LOG_LEVEL": "WARNING"})
+    return env
+
+
+async def measure_startup() -> Dict[str, Any]:
+    """Runs inside the child process: times import, lifespan and warm-up."""
+    started = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+
+    import database
+    from motor.motor_asyncio import AsyncIOMotorCollection
+    from mongomock_motor import AsyncMongoMockClient
+
+    mock_db = AsyncMongoMockClient().scribes_eye
+    for name, value in list(vars(database).items()):
+        if isinstance(value, AsyncIOMotorCollection):
+            setattr(database, name, mock_db[value.name])
+
+    lifespan_started = time.perf_counter()
+    async with main.lifespan(main.app):
+        bound = time.perf_counter()
+        if main.app.state.warm_up is not None:
+            await main.app.state.warm_up
+        warmed = time.perf_counter()
+        providers = {provider.name: provider.status() for provider in main.providers}
+    return {
+        "import_ms": (imported - started) * 1000,
+        "lifespan_ms": (bound - lifespan_started) * 1000,
+        "warm_up_ms": (warmed - bound) * 1000,
+        "ready_ms": (warmed - started) * 1000,
+        "providers": providers,
+    }
+
+
+def run_child() -> Dict[str, Any]:
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child"],
+        cwd=APP_DIR, env=child_env(), capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(limit: int) -> List[Dict[str, Any]]:
+    """Packages imported by `main`, by the cumulative time of their first (outermost) import."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=APP_DIR, env=child_env(), capture_output=True, text=True, check=True,
+    )
+    packages: Dict[str, float] = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        if not cumulative.strip().isdigit() or package == "main":
+            continue
+        packages[package] = max(packages.get(package, 0.0), int(cumulative) / 1000)
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [{"module": package, "cumulative_ms": ms} for package, ms in slowest]
+
+
+def main(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes to time")
+    parser.add_argument("--importtime", action="store_true", help="also list the slowest imported packages")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(asyncio.run(measure_startup())))
+        return
+
+    runs = [run_child() for _ in range(args.runs)]
+    report: Dict[str, Any] = {"runs": args.runs, "vector_backend": child_env()["VECTOR_BACKEND"]}
+    for key in ("import_ms", "lifespan_ms", "warm_up_ms", "ready_ms"):
+        values = [run[key] for run in runs]
+        report[key] = {"median": statistics.median(values), "min": min(values), "max": max(values)}
+    report["provider_init_ms"] = {
+        name: statistics.median(run["providers"][name]["init_ms"] or 0 for run in runs)
+        for name in runs[0]["providers"]
+    }
+    report["provider_errors"] = {
+        name: status["error"] for name, status in runs[-1]["providers"].items() if status["error"]
+    }
+    if args.importtime:
+        report["slowest_imports"] = slowest_imports(15)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"startup over {args.runs} fresh processes ({report['vector_backend']} vector backend):")
+    for key in ("import_ms", "lifespan_ms", "warm_up_ms", "ready_ms"):
+        stats = report[key]
+        print(f"  {key:16} median {stats['median']:9.1f}  min {stats['min']:9.1f}  max {stats['max']:9.1f}")
+    for name, value in report["provider_init_ms"].items():
+        print(f"  init {name:16} {value:9.1f} ms")
+    for name, error in report["provider_errors"].items():
+        print(f"  {name} failed: {error}")
+    for module in report.get("slowest_imports", []):
+        print(f"  import {module['module']:40} {module['cumulative_ms']:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
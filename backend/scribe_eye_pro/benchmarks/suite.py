@@ -0,0 +1,367 @@
+"""
+Offline end-to-end benchmark and load test.
+
+Runs the FastAPI app in-process against deterministic fakes: FakeChatModel in place
+of Gemini, FakeEmbeddings behind the real embedding cache, mongomock-motor in place
+of MongoDB and the local vector backend in a temporary directory. No network is used.
+
+Measures, and writes as JSON:
+- routes: throughput and p50/p95/p99 latency for every API route
+- ingestion: create, embed and extract time for scripts from 1 KB to 5 MB
+- resave: the same after editing one paragraph of each script
+- concurrent_qa: many questions across several projects at once, checking that
+  every source passage comes from the asking project's own scripts
+
+Run from backend/scribe_eye_pro (needs benchmarks/requirements.txt installed):
+
+    python -m benchmarks.suite --output results.json
+"""
+import os
+import tempfile
+
+# Configure the app for offline use before any of its modules are imported.
+os.environ.update({
+    "VECTOR_BACKEND": "local",
+    "LOCAL_INDEX_DIR": tempfile.mkdtemp(prefix="suite-benchmark-"),
+    "RUN_JOB_WORKERS": "false",
+    "EMBEDDING_CACHE_PATH": "",
+    "LOG_LEVEL": "WARNING",
+})
+os.environ.setdefault("MONGO_DETAILS", "mongodb://localhost:27017")
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+# The fakes have no quota, so by default only the request rate is limited; set these
+# to a real quota to see the gateway's queueing under load.
+os.environ.setdefault("GEMINI_CHAT_TOKENS_PER_MINUTE", "0")
+os.environ.setdefault("GEMINI_EMBEDDING_TOKENS_PER_MINUTE", "0")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import platform  # noqa: E402
+import random  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+from datetime import datetime, timezone  # noqa: E402
+from typing import Any, Awaitable, Callable, Dict, List  # noqa: E402
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+from langchain.chains.combine_documents import create_stuff_documents_chain  # noqa: E402
+from langchain.chains.question_answering.stuff_prompt import PROMPT_SELECTOR  # noqa: E402
+from langchain_core.output_parsers import StrOutputParser  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorCollection  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+import main  # noqa: E402
+import vector_store  # noqa: E402
+from benchmarks.fakes import WORDS, FakeChatModel, FakeEmbeddings, synthetic_script  # noqa: E402
+from observability import LLMMetricsCallback  # noqa: E402
+from services import langchain_service, summaries  # noqa: E402
+from services.job_queue import job_queue  # noqa: E402
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 5_000_000]
+
+
+# --- Setup ---
+
+def use_fakes(args) -> Dict[str, Any]:
+    """Swaps MongoDB, Gemini chat and Gemini embeddings for local fakes; returns the fakes."""
+    mock_db = AsyncMongoMockClient().scribes_eye
+
+    def swap(value):
+        if isinstance(value, AsyncIOMotorCollection):
+            return mock_db[value.name]
+        if isinstance(value, list) and any(isinstance(item, tuple) for item in value):
+            # Tables of (name, collection, ...) rows, like query_plans.HOT_QUERIES.
+            return [tuple(swap(part) for part in item) if isinstance(item, tuple) else item for item in value]
+        return value
+
+    # Routes and services import collections by name, so replace every module's reference.
+    for module in list(sys.modules.values()):
+        if not getattr(module, "__file__", None) or not module.__file__.startswith(APP_DIR):
+            continue
+        for name, value in list(vars(module).items()):
+            swapped = swap(value)
+            if swapped is not value:
+                setattr(module, name, swapped)
+    job_queue.collection = mock_db[job_queue.collection.name]
+
+    fake_embeddings = FakeEmbeddings(latency=args.embed_latency_ms / 1000)
+    vector_store.embeddings.set(vector_store.cached_embeddings(fake_embeddings))
+
+    extraction_llm = FakeChatModel(latency=args.llm_latency_ms / 1000, callbacks=[LLMMetricsCallback("extraction")])
+    langchain_service.extraction_chain.set(langchain_service.prompt | extraction_llm | langchain_service.parser)
+    qa_llm = FakeChatModel(
+        latency=args.llm_latency_ms / 1000,
+        token_latency=args.token_latency_ms / 1000,
+        callbacks=[LLMMetricsCallback("qa")],
+    )
+    langchain_service.qa_chain.set(create_stuff_documents_chain(qa_llm, PROMPT_SELECTOR.get_prompt(qa_llm)))
+    summary_llm = FakeChatModel(latency=args.llm_latency_ms / 1000, callbacks=[LLMMetricsCallback("summary")])
+    summaries.summary_chain.set(summaries.summary_prompt | summary_llm | StrOutputParser())
+    return {"embeddings": fake_embeddings, "extraction_llm": extraction_llm, "qa_llm": qa_llm, "summary_llm": summary_llm}
+
+
+async def index_script(project_id: str, script_id: str, content: str) -> Dict[str, float]:
+    """Runs what the embed and extract jobs would, timing each."""
+    started = time.perf_counter()
+    await langchain_service.process_and_embed_script(content, project_id, script_id)
+    embedded = time.perf_counter()
+    await langchain_service.extract_and_store_entities(content, project_id, script_id)
+    return {"embed_ms": (embedded - started) * 1000, "extract_ms": (time.perf_counter() - embedded) * 1000}
+
+
+# --- Measurement ---
+
+def summarize(latencies_ms: List[float], wall_seconds: float, errors: int) -> Dict[str, Any]:
+    values = np.array(latencies_ms) if latencies_ms else np.zeros(1)
+    return {
+        "requests": len(latencies_ms),
+        "errors": errors,
+        "throughput_rps": round(len(latencies_ms) / wall_seconds, 2) if wall_seconds else None,
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+async def load(request: Callable[[int], Awaitable[httpx.Response]], count: int, concurrency: int) -> Dict[str, Any]:
+    """Issues `count` requests, at most `concurrency` at a time, and summarizes their latency."""
+    slots = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with slots:
+            started = time.perf_counter()
+            response = await request(i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def read_stream(client: httpx.AsyncClient, url: str, body: Dict[str, Any]) -> httpx.Response:
+    async with client.stream("POST", url, json=body) as response:
+        async for _ in response.aiter_bytes():
+            pass
+    return response
+
+
+def random_question(rng: random.Random) -> str:
+    # Distinct word mixes, so neither the exact nor the semantic answer cache serves them.
+    return "What happens with the " + " ".join(rng.sample(WORDS, 5)) + "?"
+
+
+# --- Scenarios ---
+
+async def bench_routes(client: httpx.AsyncClient, args) -> Dict[str, Any]:
+    n, c = args.requests, args.concurrency
+    rng = random.Random(1)
+
+    project = (await client.post("/api/projects", json={"title": "Route benchmark", "description": ""})).json()
+    pid = project["id"]
+    script_ids = []
+    for i in range(args.seed_scripts):
+        content = synthetic_script(20_000, seed=i)
+        script = (await client.post(f"/api/projects/{pid}/scripts", json={"title": f"Script {i}", "content": content})).json()
+        await index_script(pid, script["id"], content)
+        script_ids.append(script["id"])
+    sid = script_ids[0]
+
+    async def make_projects(count):
+        return [(await client.post("/api/projects", json={"title": f"Doomed {i}"})).json()["id"] for i in range(count)]
+
+    async def make_scripts(count):
+        return [
+            (await client.post(f"/api/projects/{pid}/scripts", json={"title": f"Doomed {i}", "content": "Short."})).json()["id"]
+            for i in range(count)
+        ]
+
+    doomed_projects = await make_projects(n)
+    doomed_scripts = await make_scripts(n)
+    cached_question = {"question": "What happens in the lighthouse?"}
+    await client.post(f"/api/projects/{pid}/question", json=cached_question)
+
+    scenarios: Dict[str, Callable[[int], Awaitable[httpx.Response]]] = {
+        "GET /api/projects": lambda i: client.get("/api/projects"),
+        "POST /api/projects": lambda i: client.post("/api/projects", json={"title": f"Project {i}"}),
+        "GET /api/projects/dashboard": lambda i: client.get("/api/projects/dashboard"),
+        "GET /api/projects/{project_id}": lambda i: client.get(f"/api/projects/{pid}"),
+        "PUT /api/projects/{project_id}": lambda i: client.put(f"/api/projects/{pid}", json={"title": f"Renamed {i}"}),
+        "POST /api/projects/{project_id}/scripts": lambda i: client.post(
+            f"/api/projects/{pid}/scripts", json={"title": f"New {i}", "content": synthetic_script(2_000, seed=1000 + i)}
+        ),
+        "GET /api/projects/{project_id}/scripts": lambda i: client.get(f"/api/projects/{pid}/scripts"),
+        "GET /api/scripts/{script_id}": lambda i: client.get(f"/api/scripts/{sid}"),
+        "GET /api/scripts/{script_id}/status": lambda i: client.get(f"/api/scripts/{sid}/status"),
+        "PUT /api/scripts/{script_id}": lambda i: client.put(
+            f"/api/scripts/{script_ids[-1]}", json={"title": "Edited", "content": synthetic_script(20_000, seed=i)}
+        ),
+        "GET /api/projects/{project_id}/entities": lambda i: client.get(f"/api/projects/{pid}/entities"),
+        "POST /api/projects/{project_id}/question": lambda i: client.post(
+            f"/api/projects/{pid}/question", json={"question": random_question(rng)}
+        ),
+        "POST /api/projects/{project_id}/question (cached)": lambda i: client.post(
+            f"/api/projects/{pid}/question", json=cached_question
+        ),
+        "POST /api/projects/{project_id}/question/stream": lambda i: read_stream(
+            client, f"/api/projects/{pid}/question/stream", {"question": random_question(rng)}
+        ),
+        "GET /api/diagnostics/query-plans": lambda i: client.get("/api/diagnostics/query-plans"),
+        "GET /metrics": lambda i: client.get("/metrics"),
+        "DELETE /api/scripts/{script_id}": lambda i: client.delete(f"/api/scripts/{doomed_scripts[i]}"),
+        "DELETE /api/projects/{project_id}": lambda i: client.delete(f"/api/projects/{doomed_projects[i]}"),
+    }
+
+    results = {}
+    for name, request in scenarios.items():
+        try:
+            results[name] = await load(request, n, c)
+        except Exception as e:
+            # Routes that need aggregation or explain() features mongomock lacks end up here,
+            # as would a genuine failure; the error is kept in the report either way.
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+    return results
+
+
+def _edit_one_paragraph(content: str) -> str:
+    paragraphs = content.split("\n\n")
+    middle = len(paragraphs) // 2
+    paragraphs[middle] = paragraphs[middle] + " An unexpected edit."
+    return "\n\n".join(paragraphs)
+
+
+async def bench_ingestion(client: httpx.AsyncClient, fakes: Dict[str, Any], sizes: List[int]):
+    ingestion, resave = [], []
+    for size in sizes:
+        project = (await client.post("/api/projects", json={"title": f"Ingest {size}"})).json()
+        content = synthetic_script(size, seed=size)
+
+        before = (fakes["embeddings"].texts, fakes["extraction_llm"].calls)
+        started = time.perf_counter()
+        script = (await client.post(
+            f"/api/projects/{project['id']}/scripts", json={"title": f"{size} bytes", "content": content}
+        )).json()
+        create_ms = (time.perf_counter() - started) * 1000
+        timings = await index_script(project["id"], script["id"], content)
+        ingestion.append({
+            "size_bytes": size,
+            "create_ms": round(create_ms, 3),
+            **{key: round(value, 3) for key, value in timings.items()},
+            "chunks": len(langchain_service.split_script(content, script["id"])),
+            "texts_embedded": fakes["embeddings"].texts - before[0],
+            "extraction_calls": fakes["extraction_llm"].calls - before[1],
+        })
+
+        edited = _edit_one_paragraph(content)
+        before = (fakes["embeddings"].texts, fakes["extraction_llm"].calls)
+        started = time.perf_counter()
+        await client.put(f"/api/scripts/{script['id']}", json={"title": f"{size} bytes", "content": edited})
+        update_ms = (time.perf_counter() - started) * 1000
+        timings = await index_script(project["id"], script["id"], edited)
+        resave.append({
+            "size_bytes": size,
+            "update_ms": round(update_ms, 3),
+            **{key: round(value, 3) for key, value in timings.items()},
+            "texts_embedded": fakes["embeddings"].texts - before[0],
+            "extraction_calls": fakes["extraction_llm"].calls - before[1],
+        })
+    return ingestion, resave
+
+
+async def bench_concurrent_qa(client: httpx.AsyncClient, args) -> Dict[str, Any]:
+    project_scripts: Dict[str, List[str]] = {}
+    for p in range(args.qa_projects):
+        pid = (await client.post("/api/projects", json={"title": f"QA {p}"})).json()["id"]
+        project_scripts[pid] = []
+        for s in range(3):
+            content = synthetic_script(30_000, seed=10_000 + p * 10 + s)
+            script = (await client.post(f"/api/projects/{pid}/scripts", json={"title": f"S{s}", "content": content})).json()
+            await index_script(pid, script["id"], content)
+            project_scripts[pid].append(content)
+
+    project_ids = list(project_scripts)
+    rng = random.Random(2)
+    leaks = 0
+
+    async def ask(i: int) -> httpx.Response:
+        nonlocal leaks
+        pid = project_ids[i % len(project_ids)]
+        response = await client.post(f"/api/projects/{pid}/question", json={"question": random_question(rng)})
+        if response.status_code == 200:
+            for passage in response.json()["source_chunks"]:
+                if not any(passage in content for content in project_scripts[pid]):
+                    leaks += 1
+        return response
+
+    result = await load(ask, args.qa_questions, args.qa_concurrency)
+    result.update({"projects": len(project_ids), "concurrency": args.qa_concurrency, "cross_project_leaks": leaks})
+    return result
+
+
+# --- Entry point ---
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=APP_DIR, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args) -> Dict[str, Any]:
+    fakes = use_fakes(args)
+    sizes = [size for size in SIZES if size <= args.max_size]
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            routes = await bench_routes(client, args)
+            ingestion, resave = await bench_ingestion(client, fakes, sizes)
+            concurrent_qa = await bench_concurrent_qa(client, args)
+    return {
+        "suite": "offline",
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "routes": routes,
+        "ingestion": ingestion,
+        "resave": resave,
+        "concurrent_qa": concurrent_qa,
+    }
+
+
+def main_cli(argv: List[str]):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the Scribe's Eye API.")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--requests", type=int, default=100, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent requests per route")
+    parser.add_argument("--seed-scripts", type=int, default=5, help="indexed scripts in the route benchmark project")
+    parser.add_argument("--max-size", type=int, default=5_000_000, help="largest script to ingest, in bytes")
+    parser.add_argument("--qa-projects", type=int, default=5)
+    parser.add_argument("--qa-questions", type=int, default=300)
+    parser.add_argument("--qa-concurrency", type=int, default=50)
+    parser.add_argument("--embed-latency-ms", type=float, default=50, help="fake embedding call latency")
+    parser.add_argument("--llm-latency-ms", type=float, default=200, help="fake Gemini latency before the first token")
+    parser.add_argument("--token-latency-ms", type=float, default=5, help="fake Gemini latency per streamed word")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main_cli(sys.argv[1:])
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -6,10 +7,105 @@ load_dotenv()
 
 class Settings(BaseSettings):
     MONGO_DETAILS: str
-    PINECONE_API_KEY: str
-    PINECONE_INDEX_NAME: str
     GEMINI_API_KEY: str
 
+    # Vector index backend: "pinecone", or "local" for memory-mapped files under LOCAL_INDEX_DIR
+    VECTOR_BACKEND: str = "pinecone"
+    PINECONE_API_KEY: str = ""
+    PINECONE_INDEX_NAME: str = ""
+    LOCAL_INDEX_DIR: str = "local_index"
+
+    # Async indexing: texts per embedding request (Gemini accepts up to 100) and vectors
+    # per upsert request, each with a cap on how many requests are in flight at once
+    EMBEDDING_BATCH_SIZE: int = 100
+    EMBEDDING_CONCURRENCY: int = 4
+    VECTOR_UPSERT_BATCH_SIZE: int = 100
+    VECTOR_UPSERT_CONCURRENCY: int = 4
+
+    # Embedding cache: in-memory LRU entries, plus an optional SQLite file for a persistent tier
+    EMBEDDING_CACHE_SIZE: int = 10000
+    EMBEDDING_CACHE_PATH: Optional[str] = None
+    EMBEDDING_CACHE_DISK_SIZE: int = 500000
+
+    # Q&A answer cache: per-project entries, matched exactly or by question-embedding cosine similarity
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    ANSWER_CACHE_MAX_ENTRIES: int = 256
+    ANSWER_CACHE_SIMILARITY: float = 0.95
+
+    # Hybrid retrieval: the top HYBRID_CANDIDATES chunks from vector search and from a per-project
+    # BM25 index are fused by reciprocal rank; BM25 indexes are kept for this many projects
+    HYBRID_SEARCH: bool = True
+    HYBRID_CANDIDATES: int = 20
+    LEXICAL_INDEX_MAX_PROJECTS: int = 200
+
+    # Retrieved chunks are merged into passages and packed into the answer prompt up to
+    # this many (estimated) tokens; 0 means no limit
+    QA_CONTEXT_TOKEN_BUDGET: int = 1500
+
+    # Gemini rate limits per process (0 means unlimited): requests and estimated tokens per
+    # minute for the chat model and the embedding model. Calls that get a 429 anyway slow the
+    # model down and are retried, up to GEMINI_MAX_ATTEMPTS attempts
+    GEMINI_CHAT_REQUESTS_PER_MINUTE: int = 1000
+    GEMINI_CHAT_TOKENS_PER_MINUTE: int = 1_000_000
+    GEMINI_EMBEDDING_REQUESTS_PER_MINUTE: int = 1500
+    GEMINI_EMBEDDING_TOKENS_PER_MINUTE: int = 0
+    GEMINI_MAX_ATTEMPTS: int = 5
+
+    # Summary trees (scene -> script -> project) kept up to date by a background job per
+    # script; broad questions ("summarize act two") are answered from them, using up to
+    # QA_SUMMARY_TOKEN_BUDGET (estimated) tokens of summaries
+    SUMMARY_TREES: bool = True
+    SUMMARY_CONCURRENCY: int = 4
+    QA_SUMMARY_TOKEN_BUDGET: int = 6000
+
+    # Background jobs (embedding, entity extraction). Set RUN_JOB_WORKERS=false on web
+    # processes when the workers run separately via `python worker.py`.
+    RUN_JOB_WORKERS: bool = True
+    JOB_EMBED_CONCURRENCY: int = 4
+    JOB_EXTRACT_CONCURRENCY: int = 2
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_SECONDS: float = 5
+    JOB_LEASE_SECONDS: float = 300
+    JOB_POLL_SECONDS: float = 2
+
+    # Entity extraction runs per chunk of this many characters, at most EXTRACTION_CONCURRENCY at once
+    EXTRACTION_CHUNK_SIZE: int = 8000
+    EXTRACTION_CONCURRENCY: int = 4
+    EXTRACTION_CACHE_TTL_DAYS: int = 30
+
+    # Bulk import (POST /projects/{id}/scripts/import): scripts larger than IMPORT_MAX_SCRIPT_BYTES
+    # are skipped; parsed scripts are written IMPORT_INSERT_BATCH_SIZE at a time, then embedded
+    # across script boundaries in rounds of up to IMPORT_EMBED_BATCH_CHUNKS chunks
+    IMPORT_MAX_SCRIPT_BYTES: int = 10_000_000
+    IMPORT_INSERT_BATCH_SIZE: int = 100
+    IMPORT_EMBED_BATCH_CHUNKS: int = 1000
+    IMPORT_MAX_REPORTED_SKIPS: int = 100
+    JOB_IMPORT_CONCURRENCY: int = 1
+    JOB_SUMMARIZE_CONCURRENCY: int = 1
+
+    # Script history: every save is stored as a delta, and every SCRIPT_SNAPSHOT_INTERVAL-th
+    # revision also as full text, so old revisions rebuild from at most that many deltas
+    SCRIPT_SNAPSHOT_INTERVAL: int = 50
+
+    # Deleting a project or script only tombstones it; a background job then reclaims its
+    # data RECLAIM_BATCH_SIZE documents at a time (vectors go VECTOR_UPSERT_BATCH_SIZE at a time)
+    RECLAIM_BATCH_SIZE: int = 500
+    JOB_RECLAIM_CONCURRENCY: int = 1
+
+    # List endpoints return pages of PAGE_SIZE by default; ?limit= can go up to MAX_PAGE_SIZE
+    PAGE_SIZE: int = 50
+    MAX_PAGE_SIZE: int = 500
+
+    # Structured (JSON) logs at this level; metrics are served at /metrics, and a standalone
+    # worker serves its own on WORKER_METRICS_PORT (0 turns that off)
+    LOG_LEVEL: str = "INFO"
+    WORKER_METRICS_PORT: int = 0
+
+    # Gemini clients and the vector index are created on first use. With STARTUP_WARMUP they
+    # are created in the background right after startup instead; /ready reports progress
+    STARTUP_WARMUP: bool = True
+    READINESS_TIMEOUT_SECONDS: float = 2
+
     class Config:
         # This tells Pydantic to look for an env file, but load_dotenv() has already done the job
         env_file = ".env"
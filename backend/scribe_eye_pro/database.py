@@ -1,24 +1,103 @@
+from typing import Any, Dict
+
 import motor.motor_asyncio
-from models import ProjectDB, ScriptDB, EntityDB
+from pymongo import ASCENDING, DESCENDING
+from models import ProjectDB, ScriptDB, ScriptSummary, ScriptRevisionSummary, EntityDB, CanonicalEntityResponse, GraphNode, GraphEdge, ImportJobResponse
 from config import settings
+from observability import MongoCommandMetrics
 
-client = motor.motor_asyncio.AsyncIOMotorClient(settings.MONGO_DETAILS)
+client = motor.motor_asyncio.AsyncIOMotorClient(settings.MONGO_DETAILS, event_listeners=[MongoCommandMetrics()])
 db = client.scribes_eye
 
 # Collections
 project_collection = db.get_collection("projects")
 script_collection = db.get_collection("scripts")
+script_revision_collection = db.get_collection("script_revisions")
 entity_collection = db.get_collection("entities")
+canonical_entity_collection = db.get_collection("canonical_entities")
+chunk_mention_collection = db.get_collection("chunk_mentions")
+entity_edge_collection = db.get_collection("entity_edges")
+chunk_manifest_collection = db.get_collection("chunk_manifests")
+job_collection = db.get_collection("jobs")
+extraction_cache_collection = db.get_collection("extraction_cache")
+import_collection = db.get_collection("imports")
+summary_collection = db.get_collection("summaries")
+summary_tree_collection = db.get_collection("summary_trees")
+tombstone_collection = db.get_collection("tombstones")
+legacy_vector_collection = db.get_collection("legacy_vectors")
+migration_collection = db.get_collection("migrations")
+# One document per project (`_id` is the project ID) counting answer cache invalidations.
+answer_cache_collection = db.get_collection("answer_cache_generations")
+
+async def ensure_indexes():
+    """
+    Creates the indexes behind every hot lookup; safe to call on each startup.
+    """
+    # The trailing _id keys make keyset pagination sorts index-only.
+    await project_collection.create_index([("updated_at", DESCENDING), ("_id", DESCENDING)])
+    await script_collection.create_index([("project_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)])
+    await entity_collection.create_index([("project_id", ASCENDING), ("type", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)])
+    await entity_collection.create_index([("script_id", ASCENDING)])
+    # The registry holds one entity per (project, type, canonical name); autocomplete
+    # searches the prefix and trigram arrays, and script updates find entities by script.
+    await canonical_entity_collection.create_index(
+        [("project_id", ASCENDING), ("type", ASCENDING), ("key", ASCENDING)], unique=True
+    )
+    await canonical_entity_collection.create_index([("project_id", ASCENDING), ("type", ASCENDING), ("keys", ASCENDING)])
+    await canonical_entity_collection.create_index([("project_id", ASCENDING), ("type", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)])
+    await canonical_entity_collection.create_index([("project_id", ASCENDING), ("prefixes", ASCENDING)])
+    await canonical_entity_collection.create_index([("project_id", ASCENDING), ("trigrams", ASCENDING)])
+    await canonical_entity_collection.create_index([("project_id", ASCENDING), ("script_ids", ASCENDING)])
+    # Entity graph: top-k nodes by mentions, neighbourhoods by edge weight.
+    await canonical_entity_collection.create_index([("project_id", ASCENDING), ("type", ASCENDING), ("chunk_count", DESCENDING), ("_id", ASCENDING)])
+    await canonical_entity_collection.create_index([("project_id", ASCENDING), ("chunk_count", DESCENDING), ("_id", ASCENDING)])
+    await entity_edge_collection.create_index([("project_id", ASCENDING), ("source", ASCENDING), ("weight", DESCENDING), ("_id", ASCENDING)])
+    await entity_edge_collection.create_index([("project_id", ASCENDING), ("weight", ASCENDING)])
+    await chunk_mention_collection.create_index([("script_id", ASCENDING)])
+    await chunk_mention_collection.create_index([("project_id", ASCENDING), ("entities", ASCENDING)])
+    # Bulk imports walk their scripts in _id order; only imported scripts carry import_id.
+    await script_collection.create_index([("import_id", ASCENDING), ("_id", ASCENDING)], sparse=True)
+    await script_revision_collection.create_index([("script_id", ASCENDING), ("revision", DESCENDING)], unique=True)
+    await script_revision_collection.create_index([("project_id", ASCENDING)])
+    await import_collection.create_index([("project_id", ASCENDING)])
+    await chunk_manifest_collection.create_index([("script_id", ASCENDING)], unique=True)
+    # A project's reclaim walks its manifests in _id order.
+    await chunk_manifest_collection.create_index([("project_id", ASCENDING), ("_id", ASCENDING)])
+    # Job coalescing relies on there being at most one job per (type, script_id).
+    await job_collection.create_index([("type", ASCENDING), ("script_id", ASCENDING)], unique=True)
+    await job_collection.create_index([("type", ASCENDING), ("status", ASCENDING), ("run_after", ASCENDING)])
+    await job_collection.create_index([("project_id", ASCENDING)])
+    await extraction_cache_collection.create_index(
+        [("used_at", ASCENDING)], expireAfterSeconds=settings.EXTRACTION_CACHE_TTL_DAYS * 86400
+    )
+    # Reads filter out the tombstoned scripts of the project they list.
+    await tombstone_collection.create_index([("project_id", ASCENDING)])
+    # Vectors stored before chunk IDs existed, found by the legacy vector scan.
+    await legacy_vector_collection.create_index([("script_id", ASCENDING)])
+    await legacy_vector_collection.create_index([("project_id", ASCENDING)])
+    await summary_tree_collection.create_index([("script_id", ASCENDING)], unique=True)
+    await summary_tree_collection.create_index([("project_id", ASCENDING), ("created_at", ASCENDING)])
+    # Cached summary nodes are content-addressed; trees keep their own copy of the text,
+    # so expiring unused nodes only costs a recomputation.
+    await summary_collection.create_index(
+        [("used_at", ASCENDING)], expireAfterSeconds=settings.EXTRACTION_CACHE_TTL_DAYS * 86400
+    )
 
 # Helper function to convert MongoDB docs to Pydantic models
+# `*_row` functions map a document to its response fields as plain values, for list
+# endpoints that encode them directly (see fast_json.py); the helpers build the models.
+
+def project_row(project) -> Dict[str, Any]:
+    return {
+        "id": str(project["_id"]),
+        "title": project["title"],
+        "description": project.get("description"),
+        "created_at": project["created_at"],
+        "updated_at": project["updated_at"],
+    }
+
 def project_helper(project) -> ProjectDB:
-    return ProjectDB(
-        id=str(project["_id"]),
-        title=project["title"],
-        description=project.get("description"),
-        created_at=project["created_at"],
-        updated_at=project["updated_at"],
-    )
+    return ProjectDB(**project_row(project))
 
 def script_helper(script) -> ScriptDB:
     return ScriptDB(
@@ -26,18 +105,104 @@ def script_helper(script) -> ScriptDB:
         project_id=script["project_id"],
         title=script["title"],
         content=script.get("content", ""),
+        revision=script.get("revision", 0),
         created_at=script["created_at"],
         updated_at=script["updated_at"],
     )
 
+def script_summary_row(script) -> Dict[str, Any]:
+    return {
+        "id": str(script["_id"]),
+        "project_id": script["project_id"],
+        "title": script["title"],
+        "length": script.get("length", 0),
+        "word_count": script.get("word_count", 0),
+        "preview": script.get("preview", ""),
+        "created_at": script["created_at"],
+        "updated_at": script["updated_at"],
+    }
+
+def script_summary_helper(script) -> ScriptSummary:
+    return ScriptSummary(**script_summary_row(script))
+
+def script_revision_row(revision) -> Dict[str, Any]:
+    return {
+        "revision": revision["revision"],
+        "length": revision.get("length", 0),
+        "snapshot": bool(revision.get("snapshot", False)),
+        "created_at": revision["created_at"],
+    }
+
+def script_revision_helper(revision) -> ScriptRevisionSummary:
+    return ScriptRevisionSummary(**script_revision_row(revision))
+
+def content_stats(content: str) -> dict:
+    """Length and word-count fields stored with each script so listings can skip its content."""
+    return {"length": len(content), "word_count": len(content.split())}
+
+# Aggregation expressions for the same stats; scripts saved before they were stored
+# get them computed from their content.
+_CONTENT_EXPR = {"$ifNull": ["$content", ""]}
+SCRIPT_LENGTH_EXPR = {"$ifNull": ["$length", {"$strLenCP": _CONTENT_EXPR}]}
+SCRIPT_WORD_COUNT_EXPR = {"$ifNull": ["$word_count", {"$size": {"$filter": {
+    "input": {"$split": [_CONTENT_EXPR, " "]}, "cond": {"$ne": ["$$this", ""]},
+}}}]}
+
+def import_job_helper(import_job) -> ImportJobResponse:
+    return ImportJobResponse(
+        id=str(import_job["_id"]),
+        project_id=import_job["project_id"],
+        status=import_job["status"],
+        files_received=import_job.get("files_received", 0),
+        scripts_imported=import_job.get("scripts_imported", 0),
+        scripts_embedded=import_job.get("scripts_embedded", 0),
+        chunks_embedded=import_job.get("chunks_embedded", 0),
+        skipped_count=import_job.get("skipped_count", 0),
+        skipped=import_job.get("skipped", []),
+        last_error=import_job.get("last_error"),
+        created_at=import_job["created_at"],
+        updated_at=import_job["updated_at"],
+        finished_at=import_job.get("finished_at"),
+    )
+
+def entity_row(entity) -> Dict[str, Any]:
+    return {
+        "id": str(entity["_id"]),
+        "project_id": entity["project_id"],
+        "script_id": entity["script_id"],
+        "type": entity["type"],
+        "name": entity["name"],
+        "description": entity.get("description"),
+        "attributes": entity.get("attributes", {}),
+        "created_at": entity["created_at"],
+    }
+
 def entity_helper(entity) -> EntityDB:
-    return EntityDB(
+    return EntityDB(**entity_row(entity))
+
+def canonical_entity_row(entity) -> Dict[str, Any]:
+    return {
+        "id": str(entity["_id"]),
+        "project_id": entity["project_id"],
+        "type": entity["type"],
+        "name": entity["name"],
+        "aliases": entity.get("aliases", []),
+        "description": entity.get("description"),
+        "script_ids": entity.get("script_ids", []),
+        "created_at": entity["created_at"],
+        "updated_at": entity["updated_at"],
+    }
+
+def canonical_entity_helper(entity) -> CanonicalEntityResponse:
+    return CanonicalEntityResponse(**canonical_entity_row(entity))
+
+def graph_node_helper(entity) -> GraphNode:
+    return GraphNode(
         id=str(entity["_id"]),
-        project_id=entity["project_id"],
-        script_id=entity["script_id"],
         type=entity["type"],
         name=entity["name"],
-        description=entity.get("description"),
-        attributes=entity.get("attributes", {}),
-        created_at=entity["created_at"],
+        weight=entity.get("chunk_count", 0),
     )
+
+def graph_edge_helper(edge) -> GraphEdge:
+    return GraphEdge(source=edge["source"], target=edge["target"], weight=edge["weight"])
@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from observability import EMBEDDING_BATCH_SIZE, EMBEDDING_CACHE_LOOKUPS, EMBEDDING_REQUEST_SECONDS, timed
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated texts from a cache instead of the provider.
+
+    Vectors are keyed by model name, embedding kind (document or query, since providers
+    embed them differently) and a SHA-256 of the text. Lookups go to an in-memory LRU
+    first and then to an optional SQLite file, which survives restarts. The async
+    methods run the SQLite reads and writes in a thread, off the event loop.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model_name: str,
+        max_entries: int = 10000,
+        disk_path: Optional[str] = None,
+        disk_max_entries: int = 500000,
+    ):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._memory: "OrderedDict[str, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        # The connection is shared across threads, so its statements are serialized.
+        self._disk_lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        self._disk_writes = 0
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._disk.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._disk.commit()
+
+    # --- Cache plumbing ---
+
+    def _key(self, kind: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{kind}:{digest}"
+
+    def _lookup_memory(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector.tolist()
+        return found
+
+    def _lookup_disk(self, keys: List[str]) -> List[Tuple[str, bytes]]:
+        """Reads vectors from the SQLite tier and marks them used. Blocking."""
+        rows = []
+        with self._disk_lock:
+            # Stay well under SQLite's bound-parameter limit for large scripts.
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" for _ in batch)
+                rows.extend(self._disk.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall())
+            if rows:
+                self._disk.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(time.time(), key) for key, _ in rows],
+                )
+                self._disk.commit()
+        return rows
+
+    def _promote(self, rows: List[Tuple[str, bytes]]) -> Dict[str, List[float]]:
+        """Moves vectors read from disk into the memory tier."""
+        found = {}
+        with self._lock:
+            for key, blob in rows:
+                vector = array("f")
+                vector.frombytes(blob)
+                self._remember(key, vector)
+                found[key] = vector.tolist()
+            self.disk_hits += len(rows)
+        return found
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = self._lookup_memory(keys)
+        missing = [key for key in keys if key not in found]
+        if self._disk is not None and missing:
+            found.update(self._promote(self._lookup_disk(missing)))
+        return found
+
+    async def _alookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = self._lookup_memory(keys)
+        missing = [key for key in keys if key not in found]
+        if self._disk is not None and missing:
+            found.update(self._promote(await asyncio.to_thread(self._lookup_disk, missing)))
+        return found
+
+    def _remember(self, key: str, vector: array):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _store_memory(self, entries: Dict[str, List[float]]):
+        with self._lock:
+            for key, values in entries.items():
+                self._remember(key, array("f", values))
+
+    def _store_disk(self, entries: Dict[str, List[float]]):
+        """Writes vectors to the SQLite tier, trimming it now and then. Blocking."""
+        now = time.time()
+        with self._disk_lock:
+            self._disk.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", values).tobytes(), now) for key, values in entries.items()],
+            )
+            self._disk_writes += len(entries)
+            # Counting rows is not free, so only trim the disk tier every so often.
+            if self._disk_writes >= 1000:
+                self._disk_writes = 0
+                self._disk.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.disk_max_entries,),
+                )
+            self._disk.commit()
+
+    def _store(self, entries: Dict[str, List[float]]):
+        self._store_memory(entries)
+        if self._disk is not None and entries:
+            self._store_disk(entries)
+
+    async def _astore(self, entries: Dict[str, List[float]]):
+        self._store_memory(entries)
+        if self._disk is not None and entries:
+            await asyncio.to_thread(self._store_disk, entries)
+
+    def _plan(self, kind: str, texts: List[str]):
+        keys = [self._key(kind, text) for text in texts]
+        return keys, *self._missing(kind, texts, keys, self._lookup(list(dict.fromkeys(keys))))
+
+    async def _aplan(self, kind: str, texts: List[str]):
+        keys = [self._key(kind, text) for text in texts]
+        return keys, *self._missing(kind, texts, keys, await self._alookup(list(dict.fromkeys(keys))))
+
+    def _missing(self, kind: str, texts: List[str], keys: List[str], found: Dict[str, List[float]]):
+        # Each distinct missing text is sent to the provider once, however often it repeats.
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        EMBEDDING_CACHE_LOOKUPS.labels(kind, "hit").inc(len(texts) - len(missing))
+        EMBEDDING_CACHE_LOOKUPS.labels(kind, "miss").inc(len(missing))
+        if missing:
+            EMBEDDING_BATCH_SIZE.labels(kind).observe(len(missing))
+        return found, missing
+
+    def stats(self) -> Dict[str, int]:
+        """Returns cache counters; `hits` includes hits served from the disk tier."""
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+        }
+
+    # --- Embeddings interface ---
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._plan("document", texts)
+        if missing:
+            with timed(EMBEDDING_REQUEST_SECONDS, kind="document"):
+                vectors = self.underlying.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = await self._aplan("document", texts)
+        if missing:
+            with timed(EMBEDDING_REQUEST_SECONDS, kind="document"):
+                vectors = await self.underlying.aembed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            await self._astore(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found, missing = self._plan("query", [text])
+        if missing:
+            with timed(EMBEDDING_REQUEST_SECONDS, kind="query"):
+                vector = self.underlying.embed_query(text)
+            self._store({keys[0]: vector})
+            return vector
+        return found[keys[0]]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, missing = await self._aplan("query", [text])
+        if missing:
+            with timed(EMBEDDING_REQUEST_SECONDS, kind="query"):
+                vector = await self.underlying.aembed_query(text)
+            await self._astore({keys[0]: vector})
+            return vector
+        return found[keys[0]]
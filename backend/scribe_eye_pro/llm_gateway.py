@@ -0,0 +1,292 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import random
+import re
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, TypeVar
+
+from langchain_core.embeddings import Embeddings
+
+from config import settings
+from observability import (
+    LLM_COALESCED_CALLS, LLM_GATEWAY_WAIT_SECONDS, LLM_RATE_SCALE, LLM_THROTTLED, log_event,
+)
+
+T = TypeVar("T")
+
+# Priority lanes: a waiting interactive call always goes before any background one.
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# AIMD: each 429 halves a model's rate (down to MIN_RATE_SCALE of its quota) and pauses
+# it with exponential backoff; each success gives back RATE_RECOVERY_STEP of the quota.
+MIN_RATE_SCALE = 0.1
+RATE_RECOVERY_STEP = 0.05
+MAX_BACKOFF_SECONDS = 60
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough prompt size at four characters per token; enough for rate budgeting."""
+    return sum(len(text) for text in texts) // 4 + 1
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """
+    True for a provider 429 / RESOURCE_EXHAUSTED, also when LangChain has wrapped it
+    in its own exception type.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if getattr(error, "code", None) == 429 or type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+            return True
+        if "RESOURCE_EXHAUSTED" in str(error) or re.search(r"\b429\b", str(error)):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute` a minute, up to one minute's worth; 0 means unlimited."""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float, scale: float):
+        self.level = min(self.per_minute, self.level + (now - self._updated) * self.per_minute * scale / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float, scale: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)."""
+        if not self.per_minute:
+            return 0.0
+        self._refill(now, scale)
+        needed = min(amount, self.per_minute)
+        return 0.0 if self.level >= needed else (needed - self.level) * 60 / (self.per_minute * scale)
+
+    def take(self, amount: float):
+        # May go negative: an oversized request is let through and paid back by later waits.
+        if self.per_minute:
+            self.level -= amount
+
+
+class ModelLimiter:
+    """
+    Request and token buckets for one model, shared by every caller in the process.
+    Callers queue by (priority, arrival) and only the head of the queue may take from
+    the buckets, so background work cannot starve interactive calls by arriving first.
+    """
+
+    def __init__(self, model: str, requests_per_minute: float, tokens_per_minute: float):
+        self.model = model
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.scale = 1.0
+        self._paused_until = 0.0
+        self._waiters: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        LLM_RATE_SCALE.labels(model).set(self.scale)
+
+    def _changed(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._condition, self._loop, self._waiters = asyncio.Condition(), loop, []
+        return self._condition
+
+    def _try_take(self, tokens: int) -> float:
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        wait = max(self.requests.wait_time(1, now, self.scale), self.tokens.wait_time(tokens, now, self.scale))
+        if wait == 0:
+            self.requests.take(1)
+            self.tokens.take(tokens)
+        return wait
+
+    async def acquire(self, tokens: int, priority: int) -> float:
+        """Waits for this call's turn and quota; returns the seconds spent waiting."""
+        changed = self._changed()
+        waiter = (priority, next(self._sequence))
+        started = time.monotonic()
+        async with changed:
+            heapq.heappush(self._waiters, waiter)
+            try:
+                while True:
+                    timeout = None
+                    if self._waiters[0] == waiter:
+                        timeout = self._try_take(tokens)
+                        if timeout == 0:
+                            return time.monotonic() - started
+                    try:
+                        await asyncio.wait_for(changed.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                changed.notify_all()
+
+    def throttled(self, attempt: int) -> float:
+        """Backs off after a 429; returns the pause in seconds."""
+        self.scale = max(MIN_RATE_SCALE, self.scale / 2)
+        delay = min(MAX_BACKOFF_SECONDS, 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        LLM_THROTTLED.labels(self.model).inc()
+        LLM_RATE_SCALE.labels(self.model).set(self.scale)
+        return delay
+
+    def succeeded(self):
+        if self.scale < 1:
+            self.scale = min(1.0, self.scale + RATE_RECOVERY_STEP)
+            LLM_RATE_SCALE.labels(self.model).set(self.scale)
+
+
+class LLMGateway:
+    """
+    The one way this process calls Gemini: per-model rate limits with adaptive
+    backoff and retries on 429, priority lanes, and single-flight coalescing of
+    identical concurrent calls.
+    """
+
+    def __init__(self):
+        self._limiters: Dict[str, ModelLimiter] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def configure(self, model: str, requests_per_minute: float, tokens_per_minute: float):
+        self._limiters[model] = ModelLimiter(model, requests_per_minute, tokens_per_minute)
+
+    def limiter(self, model: str) -> ModelLimiter:
+        if model not in self._limiters:
+            self.configure(model, 0, 0)
+        return self._limiters[model]
+
+    async def _acquire(self, limiter: ModelLimiter, tokens: int, priority: int):
+        waited = await limiter.acquire(tokens, priority)
+        LLM_GATEWAY_WAIT_SECONDS.labels(limiter.model, PRIORITY_NAMES[priority]).observe(waited)
+
+    def _retry_or_raise(self, limiter: ModelLimiter, error: Exception, attempt: int, retryable: bool = True):
+        if not is_rate_limited(error):
+            raise error
+        delay = limiter.throttled(attempt)
+        log_event("llm_rate_limited", logging.WARNING, model=limiter.model, attempt=attempt,
+                  rate_scale=limiter.scale, retry_in_s=round(delay, 3))
+        if not retryable or attempt >= settings.GEMINI_MAX_ATTEMPTS:
+            raise error
+
+    async def _call(self, model: str, fn: Callable[[], Awaitable[T]], tokens: int, priority: int) -> T:
+        limiter = self.limiter(model)
+        attempt = 0
+        while True:
+            attempt += 1
+            await self._acquire(limiter, tokens, priority)
+            try:
+                result = await fn()
+            except Exception as e:
+                self._retry_or_raise(limiter, e, attempt)
+                continue
+            limiter.succeeded()
+            return result
+
+    def _landed(self, key: Hashable, flight: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not flight.cancelled():
+            # Mark the error as seen even if every caller has gone away.
+            flight.exception()
+
+    async def call(
+        self,
+        model: str,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        tokens: int,
+        priority: int = BACKGROUND,
+        key: Optional[Hashable] = None,
+    ) -> T:
+        """
+        Runs `fn` (a Gemini call costing about `tokens`) within the model's limits.
+        Calls with the same `key` while one is in flight share its result instead
+        of calling Gemini again.
+        """
+        if key is None:
+            return await self._call(model, fn, tokens, priority)
+        key = (model, key)
+        flight = self._inflight.get(key)
+        if flight is not None:
+            LLM_COALESCED_CALLS.labels(model).inc()
+        else:
+            flight = asyncio.ensure_future(self._call(model, fn, tokens, priority))
+            self._inflight[key] = flight
+            flight.add_done_callback(lambda done: self._landed(key, done))
+        # Shielded so one caller going away (a closed request) does not cancel the
+        # call for everyone else sharing it.
+        return await asyncio.shield(flight)
+
+    async def stream(
+        self, model: str, fn: Callable[[], AsyncIterator[T]], *, tokens: int, priority: int = INTERACTIVE
+    ) -> AsyncIterator[T]:
+        """
+        Like call() for a streamed response. A 429 before the first item is retried;
+        after that the partial response has been sent, so it is raised.
+        """
+        limiter = self.limiter(model)
+        attempt = 0
+        while True:
+            attempt += 1
+            await self._acquire(limiter, tokens, priority)
+            started = False
+            try:
+                async for item in fn():
+                    started = True
+                    yield item
+            except Exception as e:
+                self._retry_or_raise(limiter, e, attempt, retryable=not started)
+                continue
+            limiter.succeeded()
+            return
+
+
+gateway = LLMGateway()
+
+# The chat model behind extraction, summaries and answers; the embedding model is
+# configured with the vector store.
+CHAT_MODEL = "gemini-2.5-flash"
+gateway.configure(CHAT_MODEL, settings.GEMINI_CHAT_REQUESTS_PER_MINUTE, settings.GEMINI_CHAT_TOKENS_PER_MINUTE)
+
+
+class GatedEmbeddings(Embeddings):
+    """
+    Routes an embeddings model's async calls through the gateway: query embeddings
+    (a user is waiting) in the interactive lane, document batches in the background
+    lane, and identical concurrent calls coalesced.
+    """
+
+    def __init__(self, underlying: Embeddings, model: str):
+        self.underlying = underlying
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        digest = hashlib.sha256("\0".join(texts).encode("utf-8")).hexdigest()
+        return await gateway.call(
+            self.model, lambda: self.underlying.aembed_documents(texts),
+            tokens=estimate_tokens(*texts), priority=BACKGROUND, key=("documents", digest),
+        )
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await gateway.call(
+            self.model, lambda: self.underlying.aembed_query(text),
+            tokens=estimate_tokens(text), priority=INTERACTIVE, key=("query", text),
+        )
@@ -0,0 +1,492 @@
+import bisect
+import heapq
+import json
+import os
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+# Rows are appended to a per-project matrix; once more than this fraction of rows are
+# dead (deleted or superseded), the project is rewritten with each script contiguous.
+COMPACT_DEAD_FRACTION = 0.25
+INITIAL_CAPACITY = 1024
+# Suffix of a compaction's new matrix and log until they replace the current ones.
+COMPACTED = ".compacted"
+
+
+def _fsync_directory(directory: str):
+    """Makes the renames and removals in `directory` durable."""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _ProjectIndex:
+    """
+    Vectors for one project: a memory-mapped float32 matrix of unit-normalized rows,
+    an append-only log of each row's ID, text and metadata (`rows.jsonl`, one line per
+    stored row and one per batch of deleted rows), and a small `meta.json` header.
+
+    Writes only append to the log and update the lookups for the rows they touch; the
+    log and the matrix are rewritten when the project is compacted. A compaction writes
+    both in full beside the current ones and commits them with a marker file, so a crash
+    leaves either the old pair or the new one, never a mix.
+    """
+
+    def __init__(self, directory: str, dimension: int):
+        self.directory = directory
+        self.dimension = dimension
+        self.rows: List[Optional[Dict[str, Any]]] = []
+        self.capacity = 0
+        self.matrix: Optional[np.memmap] = None
+        os.makedirs(directory, exist_ok=True)
+        self._finish_compaction()
+
+        header_path = os.path.join(directory, "meta.json")
+        if os.path.exists(header_path):
+            with open(header_path, "r", encoding="utf-8") as f:
+                header = json.load(f)
+            self.dimension = header["dimension"]
+            self.capacity = header["capacity"]
+            self.matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dimension))
+            if "rows" in header:
+                # Sidecar from before the row log: every row inline in meta.json.
+                self.rows = header["rows"]
+                self._rewrite_log()
+                self._save_header()
+            else:
+                self._replay_log()
+        self._reindex()
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.directory, "vectors.f32")
+
+    @property
+    def _log_path(self) -> str:
+        return os.path.join(self.directory, "rows.jsonl")
+
+    @property
+    def _compaction_marker_path(self) -> str:
+        return os.path.join(self.directory, "compaction.commit")
+
+    def _finish_compaction(self):
+        """
+        Moves a committed compaction's matrix and log into place, or discards those of a
+        compaction that crashed before its commit. A no-op when none was in progress.
+        """
+        committed = os.path.exists(self._compaction_marker_path)
+        for path in (self._vectors_path, self._log_path):
+            if os.path.exists(path + COMPACTED):
+                if committed:
+                    os.replace(path + COMPACTED, path)
+                else:
+                    os.remove(path + COMPACTED)
+        if committed:
+            _fsync_directory(self.directory)
+            os.remove(self._compaction_marker_path)
+
+    def _replay_log(self):
+        if not os.path.exists(self._log_path):
+            return
+        truncated = False
+        with open(self._log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    # A write cut short by a crash: drop it before anything is appended after it.
+                    truncated = True
+                    break
+                record = json.loads(line)
+                if "dead" in record:
+                    for row in record["dead"]:
+                        self.rows[row] = None
+                    continue
+                row = record.pop("row")
+                if row >= len(self.rows):
+                    self.rows.extend([None] * (row + 1 - len(self.rows)))
+                self.rows[row] = record
+        if truncated:
+            self._rewrite_log()
+
+    def _reindex(self):
+        """Rebuilds the ID lookup and the per-script row ranges used for filtered search."""
+        self.id_to_row: Dict[str, int] = {}
+        self.script_ranges: Dict[str, List[Tuple[int, int]]] = {}
+        self.live_ranges: List[Tuple[int, int]] = []
+        self.dead = 0
+        for row, entry in enumerate(self.rows):
+            if entry is None:
+                self.dead += 1
+                continue
+            self._index_row(row, entry)
+
+    def _index_row(self, row: int, entry: Dict[str, Any]):
+        self.id_to_row[entry["id"]] = row
+        self._extend_range(self.script_ranges.setdefault(entry["metadata"].get("script_id"), []), row)
+        self._extend_range(self.live_ranges, row)
+
+    @staticmethod
+    def _extend_range(ranges: List[Tuple[int, int]], row: int):
+        if ranges and ranges[-1][1] == row:
+            ranges[-1] = (ranges[-1][0], row + 1)
+        else:
+            ranges.append((row, row + 1))
+
+    @staticmethod
+    def _cut(ranges: List[Tuple[int, int]], dead: List[int]) -> List[Tuple[int, int]]:
+        """`ranges` without the (sorted) `dead` rows; ranges holding none of them are kept as they are."""
+        result = []
+        for start, end in ranges:
+            i = bisect.bisect_left(dead, start)
+            position = start
+            while i < len(dead) and dead[i] < end:
+                if dead[i] > position:
+                    result.append((position, dead[i]))
+                position = dead[i] + 1
+                i += 1
+            if position < end:
+                result.append((position, end))
+        return result
+
+    def _ensure_capacity(self, needed: int):
+        if needed <= self.capacity:
+            return
+        new_capacity = max(INITIAL_CAPACITY, self.capacity)
+        while new_capacity < needed:
+            new_capacity *= 2
+        if self.matrix is not None:
+            self.matrix.flush()
+            self.matrix = None
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dimension * 4)
+        self.capacity = new_capacity
+        self.matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dimension))
+        self._save_header()
+
+    def _save_header(self):
+        tmp_path = os.path.join(self.directory, "meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dimension": self.dimension, "capacity": self.capacity}, f)
+        os.replace(tmp_path, os.path.join(self.directory, "meta.json"))
+
+    def _append_log(self, records: List[Dict[str, Any]]):
+        # The vectors are flushed first, so a logged row always has its vector on disk.
+        self.matrix.flush()
+        with open(self._log_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+
+    @staticmethod
+    def _write_log(path: str, rows: List[Optional[Dict[str, Any]]]):
+        with open(path, "w", encoding="utf-8") as f:
+            for row, entry in enumerate(rows):
+                if entry is not None:
+                    f.write(json.dumps({"row": row, **entry}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rewrite_log(self):
+        tmp_path = self._log_path + ".tmp"
+        self._write_log(tmp_path, self.rows)
+        os.replace(tmp_path, self._log_path)
+
+    def _kill(self, rows: Iterable[int]) -> List[int]:
+        """Marks rows dead in memory and in the lookups; returns them sorted."""
+        dead = sorted(set(rows))
+        scripts = set()
+        for row in dead:
+            entry = self.rows[row]
+            if self.id_to_row.get(entry["id"]) == row:
+                del self.id_to_row[entry["id"]]
+            scripts.add(entry["metadata"].get("script_id"))
+            self.rows[row] = None
+        for script_id in scripts:
+            ranges = self._cut(self.script_ranges[script_id], dead)
+            if ranges:
+                self.script_ranges[script_id] = ranges
+            else:
+                del self.script_ranges[script_id]
+        self.live_ranges = self._cut(self.live_ranges, dead)
+        self.dead += len(dead)
+        return dead
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, texts: List[str], metadatas: List[Dict[str, Any]]):
+        superseded = self._kill(self.id_to_row[vector_id] for vector_id in ids if vector_id in self.id_to_row)
+        if self.matrix is None:
+            self.dimension = vectors.shape[1]
+        start = len(self.rows)
+        self._ensure_capacity(start + len(ids))
+        self.matrix[start:start + len(ids)] = vectors
+        records = [{"dead": superseded}] if superseded else []
+        for offset, (vector_id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+            entry = {"id": vector_id, "text": text, "metadata": metadata}
+            self.rows.append(entry)
+            self._index_row(start + offset, entry)
+            records.append({"row": start + offset, **entry})
+        self._append_log(records)
+        self._maybe_compact()
+
+    def delete(self, ids: Optional[List[str]] = None, script_ids: Optional[List[str]] = None) -> int:
+        rows = set()
+        for vector_id in ids or []:
+            if vector_id in self.id_to_row:
+                rows.add(self.id_to_row[vector_id])
+        for script_id in script_ids or []:
+            for start, end in self.script_ranges.get(script_id, []):
+                rows.update(range(start, end))
+        if not rows:
+            return 0
+        self._append_log([{"dead": self._kill(rows)}])
+        self._maybe_compact()
+        return len(rows)
+
+    def _maybe_compact(self):
+        """Rewrites the project with each script contiguous once enough rows are dead (amortized over the writes that killed them)."""
+        if not self.rows or self.dead / len(self.rows) <= COMPACT_DEAD_FRACTION:
+            return
+        order = [row for ranges in self.script_ranges.values() for start, end in ranges for row in range(start, end)]
+        vectors = np.array(self.matrix[order]) if order else np.empty((0, self.dimension), dtype=np.float32)
+        rows = [self.rows[row] for row in order]
+        with open(self._vectors_path + COMPACTED, "wb") as f:
+            f.write(vectors.tobytes())
+            f.truncate(self.capacity * self.dimension * 4)
+            f.flush()
+            os.fsync(f.fileno())
+        self._write_log(self._log_path + COMPACTED, rows)
+        # Both files are complete and durable; from the marker on, a restart finishes the move.
+        with open(self._compaction_marker_path, "w") as f:
+            os.fsync(f.fileno())
+        _fsync_directory(self.directory)
+
+        self.matrix.flush()
+        self.matrix = None
+        self._finish_compaction()
+        self.matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dimension))
+        self.rows = rows
+        self._reindex()
+
+    def scripts_matching(self, condition: Dict[str, Any]) -> List[str]:
+        if "$in" in condition:
+            return [script_id for script_id in condition["$in"] if script_id in self.script_ranges]
+        excluded = set(condition["$nin"])
+        return [script_id for script_id in self.script_ranges if script_id not in excluded]
+
+    def ranges_for(self, script_condition: Optional[Dict[str, Any]]) -> List[Tuple[int, int]]:
+        if script_condition is None:
+            return self.live_ranges
+        return [r for script_id in self.scripts_matching(script_condition) for r in self.script_ranges[script_id]]
+
+    def search(self, queries: np.ndarray, k: int, ranges: List[Tuple[int, int]]) -> List[List[Tuple[int, float]]]:
+        """Cosine top-k for a batch of unit-normalized queries over the given row ranges."""
+        if not ranges or k <= 0:
+            return [[] for _ in range(len(queries))]
+        row_ids = np.concatenate([np.arange(start, end) for start, end in ranges])
+        scores = np.concatenate([self.matrix[start:end] @ queries.T for start, end in ranges])
+        k = min(k, len(row_ids))
+        results = []
+        for column in range(queries.shape[0]):
+            column_scores = scores[:, column]
+            top = np.argpartition(-column_scores, k - 1)[:k]
+            top = top[np.argsort(-column_scores[top])]
+            results.append([(int(row_ids[i]), float(column_scores[i])) for i in top])
+        return results
+
+
+def _normalize(vectors: List[List[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _as_condition(value: Any) -> Optional[Dict[str, Any]]:
+    """Normalizes a Pinecone-style filter value into {"$in": [...]} or {"$nin": [...]}."""
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        if "$eq" in value:
+            return {"$in": [value["$eq"]]}
+        if "$in" in value or "$nin" in value:
+            return value
+        raise ValueError(f"Unsupported filter condition: {value}")
+    return {"$in": [value]}
+
+
+class LocalVectorStore(VectorStore):
+    """
+    File-backed vector store with one memory-mapped matrix per project.
+
+    It mirrors the parts of PineconeVectorStore the app relies on: `add_texts` with
+    explicit IDs, `delete` by IDs or by a `project_id`/`script_id` filter, and filtered
+    similarity search. Filters support plain values, `$eq`, `$in` and `$nin`, and are
+    answered from per-script row ranges rather than by scanning every row.
+    """
+
+    def __init__(self, directory: str, embedding: Embeddings, dimension: int = 768):
+        self.directory = directory
+        self.dimension = dimension
+        self._embedding = embedding
+        self._projects: Dict[str, _ProjectIndex] = {}
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding
+
+    def _project(self, project_id: str) -> _ProjectIndex:
+        index = self._projects.get(project_id)
+        if index is None:
+            index = _ProjectIndex(os.path.join(self.directory, project_id), self.dimension)
+            self._projects[project_id] = index
+        return index
+
+    def _projects_for(self, condition: Optional[Dict[str, Any]]) -> List[_ProjectIndex]:
+        if condition is not None and "$in" in condition:
+            candidates = condition["$in"]
+        else:
+            excluded = set(condition["$nin"]) if condition else set()
+            candidates = [name for name in os.listdir(self.directory) if name not in excluded]
+        return [self._project(pid) for pid in candidates if os.path.isdir(os.path.join(self.directory, pid))]
+
+    # --- Writes ---
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = self._embedding.embed_documents(texts)
+        self.add_embeddings(texts, vectors, metadatas, ids)
+        return ids
+
+    def add_embeddings(self, texts: List[str], vectors: List[List[float]], metadatas: List[dict], ids: List[str]):
+        """Stores precomputed vectors, grouped into their projects' matrices."""
+        by_project: Dict[str, List[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            if "project_id" not in metadata:
+                raise ValueError("LocalVectorStore requires a project_id in every metadata dict")
+            by_project.setdefault(metadata["project_id"], []).append(i)
+
+        matrix = _normalize(vectors) if texts else None
+        with self._lock:
+            for project_id, positions in by_project.items():
+                self._project(project_id).upsert(
+                    [ids[i] for i in positions],
+                    matrix[positions],
+                    [texts[i] for i in positions],
+                    [dict(metadatas[i]) for i in positions],
+                )
+
+    def delete(self, ids: Optional[List[str]] = None, filter: Optional[dict] = None, **kwargs: Any) -> Optional[bool]:
+        if ids is None and filter is None:
+            raise ValueError("Either ids or filter must be provided.")
+        filter = filter or {}
+        unsupported = set(filter) - {"project_id", "script_id"}
+        if unsupported:
+            raise ValueError(f"Unsupported filter keys: {sorted(unsupported)}")
+
+        project_condition = _as_condition(filter.get("project_id"))
+        script_condition = _as_condition(filter.get("script_id"))
+        deleted = 0
+        with self._lock:
+            for index in self._projects_for(project_condition):
+                if ids is not None:
+                    deleted += index.delete(ids=ids)
+                elif script_condition is not None:
+                    deleted += index.delete(script_ids=index.scripts_matching(script_condition))
+                else:
+                    deleted += index.delete(ids=list(index.id_to_row))
+        return deleted > 0
+
+    def get_metadata(self, ids: List[str]) -> Dict[str, dict]:
+        """The metadata of each of `ids` that is stored, across projects."""
+        wanted = set(ids)
+        found = {}
+        with self._lock:
+            for index in self._projects_for(None):
+                for vector_id in wanted & index.id_to_row.keys():
+                    found[vector_id] = dict(index.rows[index.id_to_row[vector_id]]["metadata"])
+        return found
+
+    def list_ids(self, prefix: str = "", after: Optional[str] = None, limit: int = 100) -> List[str]:
+        """The first `limit` IDs (in order) starting with `prefix` and greater than `after`, across projects."""
+        with self._lock:
+            return heapq.nsmallest(limit, (
+                vector_id
+                for index in self._projects_for(None)
+                for vector_id in index.id_to_row
+                if vector_id.startswith(prefix) and (after is None or vector_id > after)
+            ))
+
+    # --- Reads ---
+
+    def similarity_search_by_vectors_with_score(
+        self, embeddings: List[List[float]], k: int = 4, filter: Optional[dict] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """Batched search: one matrix product per project answers all queries at once."""
+        filter = filter or {}
+        queries = _normalize(embeddings)
+        project_condition = _as_condition(filter.get("project_id"))
+        script_condition = _as_condition(filter.get("script_id"))
+
+        merged: List[List[Tuple[Document, float]]] = [[] for _ in range(len(queries))]
+        with self._lock:
+            for index in self._projects_for(project_condition):
+                ranges = index.ranges_for(script_condition)
+                for q, hits in enumerate(index.search(queries, k, ranges)):
+                    for row, score in hits:
+                        entry = index.rows[row]
+                        merged[q].append(
+                            (Document(id=entry["id"], page_content=entry["text"], metadata=dict(entry["metadata"])), score)
+                        )
+        return [sorted(hits, key=lambda hit: hit[1], reverse=True)[:k] for hits in merged]
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vectors_with_score([embedding], k=k, filter=filter)[0]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Scores are already cosine similarities.
+        return lambda score: score
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        directory: str = "local_index",
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(directory, embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
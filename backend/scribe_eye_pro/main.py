@@ -1,13 +1,31 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Dict
+
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from motor.motor_asyncio import AsyncIOMotorClient
 from fastapi import APIRouter
 
 from config import settings
-from database import client as db_client
-from vector_store import pc as pinecone_client
-from routes import projects, scripts, analysis
+from pagination import NEXT_CURSOR_HEADER
+from database import client as db_client, ensure_indexes
+from routes import projects, scripts, analysis, diagnostics
+from services.indexing import register_indexing_jobs
+from services.reclaimer import register_reclaim_jobs
+from services.legacy_vectors import enqueue_legacy_scan
+from services.job_queue import job_queue
+from providers import registry as providers, warm_up
+from observability import HTTP_REQUEST_SECONDS, configure_logging, log_event, request_id_var, route_var
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+configure_logging(settings.LOG_LEVEL)
 
 # --- Diagnostic Check ---
 # This will print the first few characters of your key if the .env file is loaded correctly.
@@ -19,22 +37,47 @@ print(f"Attempting to load settings. Gemini Key starts with: {settings.GEMINI_AP
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # On startup
-    print("Connecting to databases...")
     app.mongodb_client = db_client
     app.mongodb = app.mongodb_client.get_database("scribes_eye")
-    app.pinecone_client = pinecone_client
-    print("Database connections established.")
+    await ensure_indexes()
+    # Gemini and the vector index are not needed to bind the port: they are created on
+    # first use, or warmed in the background here, and /ready reports their progress.
+    app.state.warm_up = asyncio.create_task(warm_up()) if settings.STARTUP_WARMUP else None
+    if settings.RUN_JOB_WORKERS:
+        register_indexing_jobs()
+        register_reclaim_jobs()
+        await job_queue.start()
+        await enqueue_legacy_scan()
     yield
     # On shutdown
+    if settings.RUN_JOB_WORKERS:
+        await job_queue.stop()
+    if app.state.warm_up is not None and not app.state.warm_up.done():
+        app.state.warm_up.cancel()
     print("Closing database connections...")
     app.mongodb_client.close()
     print("Connections closed.")
 
+def _route_template(request: Request) -> str:
+    """
+    The request path with path parameters put back as `{name}`, e.g.
+    /api/projects/{project_id}; labels use it to keep their cardinality bounded.
+    """
+    if "route" not in request.scope:
+        return "unmatched"
+    names = {str(value): name for name, value in request.path_params.items()}
+    return "/".join(f"{{{names[part]}}}" if part in names else part for part in request.url.path.split("/"))
+
+async def tag_route(request: Request):
+    """Runs inside the matched route, so Mongo timings and logs can use its template."""
+    route_var.set(_route_template(request))
+
 app = FastAPI(
     title="Scribe's Eye PRO API",
     description="Advanced API for creative writing with AI-powered analysis, entity extraction, and Q&A.",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    dependencies=[Depends(tag_route)],
 )
 
 # --- Add this CORS Middleware section ---
@@ -49,16 +92,76 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, REQUEST_ID_HEADER],
 )
 
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """
+    Tags the request with an ID (the client's X-Request-ID, or a new one) that appears
+    in every log line it causes, and records its latency by route.
+    """
+    request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+    request_id_var.set(request_id)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers[REQUEST_ID_HEADER] = request_id
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        HTTP_REQUEST_SECONDS.labels(request.method, _route_template(request), str(status)).observe(elapsed)
+        log_event("http_request", route=_route_template(request), method=request.method, path=request.url.path, status=status,
+                  duration_ms=round(elapsed * 1000, 3))
+
 # Include all the routers with a global prefix
 api_router = APIRouter(prefix="/api")
 api_router.include_router(projects.router)
 api_router.include_router(scripts.router)
 api_router.include_router(analysis.router)
+api_router.include_router(diagnostics.router)
 
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for this process, with the job-queue depth sampled at scrape time."""
+    try:
+        await job_queue.sample_depth()
+    except Exception as e:
+        # A MongoDB hiccup should not cost us the rest of the scrape.
+        log_event("job_queue_depth_failed", logging.WARNING, error=str(e))
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+async def _mongodb_status() -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(db_client.admin.command("ping"), settings.READINESS_TIMEOUT_SECONDS)
+    except Exception as e:
+        return {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+    return {"status": "ready", "ping_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+@app.get("/ready", tags=["Root"])
+async def readiness():
+    """
+    Reports each dependency separately: MongoDB (a live ping) and every lazily created
+    provider, and answers 503 until all of them are ready. Without STARTUP_WARMUP,
+    providers not needed yet ("idle") do not hold readiness back. Failed providers are
+    retried in the background, since a process kept out of rotation gets no traffic
+    that would retry them.
+    """
+    failed = [provider for provider in providers if provider.status()["status"] == "failed"]
+    if failed and (app.state.warm_up is None or app.state.warm_up.done()):
+        app.state.warm_up = asyncio.create_task(warm_up(failed))
+
+    dependencies = {"mongodb": await _mongodb_status()}
+    dependencies.update({provider.name: provider.status() for provider in providers})
+    acceptable = ("ready",) if settings.STARTUP_WARMUP else ("ready", "idle")
+    ready = all(dependency["status"] in acceptable for dependency in dependencies.values())
+    return JSONResponse({"ready": ready, "dependencies": dependencies}, status_code=200 if ready else 503)
+
 @app.get("/", tags=["Root"])
 async def read_root():
     return {"message": "Welcome to the Scribe's Eye PRO API. Visit /docs for documentation."}
@@ -35,9 +35,23 @@ class ScriptBase(BaseModel):
 class ScriptCreate(ScriptBase):
     pass
 
+class TextEdit(BaseModel):
+    # Replaces content[start:end] of the base revision with text.
+    start: int = Field(..., ge=0)
+    end: int = Field(..., ge=0)
+    text: str = ""
+
+class ScriptPatch(BaseModel):
+    base_revision: int = Field(..., ge=0) # the revision the edits were made against
+    edits: List[TextEdit] = [] # in order, not overlapping
+    title: Optional[str] = Field(None, min_length=1)
+
 class Question(BaseModel):
     question: str
 
+class EntityAliases(BaseModel):
+    aliases: List[str] = Field(..., min_length=1)
+
 # --- Database Models ---
 class BaseDBModel(BaseModel):
     id: str = Field(..., alias="_id")
@@ -53,10 +67,21 @@ class ProjectDB(ProjectBase):
 class ScriptDB(ScriptBase):
     id: str = Field(..., alias="_id")
     project_id: str
+    revision: int = 0
     created_at: datetime
     updated_at: datetime
     model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
 
+class ScriptSummary(BaseModel):
+    id: str
+    project_id: str
+    title: str
+    length: int
+    word_count: int
+    preview: str
+    created_at: datetime
+    updated_at: datetime
+
 class EntityDB(BaseModel):
     id: str = Field(..., alias="_id")
     project_id: str
@@ -74,12 +99,40 @@ class ProjectResponse(ProjectBase):
     created_at: datetime
     updated_at: datetime
     
+class ProjectDashboardEntry(ProjectResponse):
+    script_count: int
+    word_count: int
+    entity_counts: Dict[str, int] # by entity type
+    last_updated: datetime # latest change to the project or any of its scripts
+    indexing_state: str # not_indexed, queued, processing, indexed, failed
+    job_counts: Dict[str, int] # by job status
+
 class ScriptResponse(ScriptBase):
     id: str
     project_id: str
+    revision: int = 0
     created_at: datetime
     updated_at: datetime
 
+class ScriptPatchResponse(BaseModel):
+    id: str
+    revision: int
+    length: int
+    word_count: int
+    updated_at: datetime
+
+class ScriptRevisionSummary(BaseModel):
+    revision: int
+    length: int
+    snapshot: bool # stored as full text rather than as edits
+    created_at: datetime
+
+class ScriptRevisionResponse(BaseModel):
+    script_id: str
+    revision: int
+    content: str
+    created_at: datetime
+
 class EntityResponse(BaseModel):
     id: str
     project_id: str
@@ -90,10 +143,75 @@ class EntityResponse(BaseModel):
     attributes: Dict[str, Any] = {}
     created_at: datetime
 
+class CanonicalEntityResponse(BaseModel):
+    id: str
+    project_id: str
+    type: str
+    name: str
+    aliases: List[str] = []
+    description: Optional[str] = None
+    script_ids: List[str] = [] # every script that mentions the entity
+    created_at: datetime
+    updated_at: datetime
+
+class GraphNode(BaseModel):
+    id: str # canonical entity ID
+    type: str
+    name: str
+    weight: int # chunks mentioning the entity
+
+class GraphEdge(BaseModel):
+    source: str
+    target: str
+    weight: int # chunks mentioning both entities
+
+class EntityGraphResponse(BaseModel):
+    nodes: List[GraphNode]
+    edges: List[GraphEdge]
+
 class MessageResponse(BaseModel):
     message: str
     
+class JobStatusResponse(BaseModel):
+    type: str
+    status: str # queued, running, done, failed
+    attempts: int
+    last_error: Optional[str] = None
+    updated_at: datetime
+
+class ImportSkippedFile(BaseModel):
+    file: str
+    reason: str
+
+class ImportJobResponse(BaseModel):
+    id: str
+    project_id: str
+    status: str # parsing, indexing, done, failed
+    files_received: int
+    scripts_imported: int
+    scripts_embedded: int
+    chunks_embedded: int
+    skipped_count: int
+    skipped: List[ImportSkippedFile] # first IMPORT_MAX_REPORTED_SKIPS only
+    last_error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+class ScriptIndexingStatus(BaseModel):
+    script_id: str
+    state: str # not_indexed, queued, processing, indexed, failed
+    jobs: List[JobStatusResponse]
+
+class QueryPlanReport(BaseModel):
+    route: str
+    collection: str
+    filter: Dict[str, Any]
+    stages: List[str]
+    collection_scan: bool
+
 class QAResponse(BaseModel):
     question: str
     answer: str
     source_chunks: List[str]
+    cached: bool = False
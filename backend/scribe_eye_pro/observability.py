@@ -0,0 +1,209 @@
+import contextvars
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import Counter, Gauge, Histogram
+from pymongo import monitoring
+
+# --- Request context ---
+
+# Set per HTTP request by the middleware in main.py, and per job by the job queue, so
+# logs and Mongo timings can be attributed without threading IDs through every call.
+# Motor runs each operation with a copy of the caller's context, so these are visible
+# in the Mongo command listener too.
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+route_var: contextvars.ContextVar[str] = contextvars.ContextVar("route", default="none")
+
+# --- Metrics ---
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "scribe_http_request_duration_seconds", "HTTP request latency.", ["method", "route", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+EMBEDDING_REQUEST_SECONDS = Histogram(
+    "scribe_embedding_request_duration_seconds", "Latency of embedding provider calls.", ["kind"],
+    buckets=_LATENCY_BUCKETS,
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "scribe_embedding_batch_size", "Texts per embedding provider call.", ["kind"], buckets=_SIZE_BUCKETS,
+)
+EMBEDDING_CACHE_LOOKUPS = Counter(
+    "scribe_embedding_cache_lookups_total", "Embedding cache lookups by outcome.", ["kind", "outcome"],
+)
+VECTOR_OPERATION_SECONDS = Histogram(
+    "scribe_vector_operation_duration_seconds", "Vector store upsert, delete and query latency.",
+    ["operation", "backend"], buckets=_LATENCY_BUCKETS,
+)
+VECTOR_RECORDS = Counter(
+    "scribe_vector_records_total", "Vectors upserted or deleted by ID.", ["operation"],
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "scribe_llm_request_duration_seconds", "Gemini call latency.", ["chain"], buckets=_LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "scribe_llm_tokens_total", "Gemini tokens used, by chain and direction.", ["chain", "direction"],
+)
+LLM_GATEWAY_WAIT_SECONDS = Histogram(
+    "scribe_llm_gateway_wait_seconds", "Time Gemini calls waited for their rate limit, by model and lane.",
+    ["model", "priority"], buckets=_LATENCY_BUCKETS,
+)
+LLM_THROTTLED = Counter(
+    "scribe_llm_throttled_total", "Gemini 429 responses, by model.", ["model"],
+)
+LLM_COALESCED_CALLS = Counter(
+    "scribe_llm_coalesced_calls_total", "Gemini calls served by an identical call already in flight.", ["model"],
+)
+LLM_RATE_SCALE = Gauge(
+    "scribe_llm_rate_scale", "Fraction of each model's configured rate currently in use (lowered after 429s).",
+    ["model"],
+)
+QA_STAGE_SECONDS = Histogram(
+    "scribe_qa_stage_duration_seconds", "Time spent in each stage of answering a question.", ["stage"],
+    buckets=_LATENCY_BUCKETS,
+)
+QA_ANSWERS = Counter(
+    "scribe_qa_answers_total", "Questions answered, by whether the answer cache served them.", ["cached"],
+)
+EXTRACTION_SECONDS = Histogram(
+    "scribe_extraction_duration_seconds", "Entity extraction time per script.", buckets=_LATENCY_BUCKETS,
+)
+EXTRACTION_CHUNKS = Counter(
+    "scribe_extraction_chunks_total", "Extraction chunks, by whether the extraction cache served them.",
+    ["outcome"],
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "scribe_mongo_command_duration_seconds", "MongoDB command latency by route.",
+    ["route", "command", "collection"], buckets=_LATENCY_BUCKETS,
+)
+JOB_SECONDS = Histogram(
+    "scribe_job_duration_seconds", "Background job run time, by type and outcome.", ["type", "outcome"],
+    buckets=_LATENCY_BUCKETS,
+)
+JOB_QUEUE_DEPTH = Gauge(
+    "scribe_job_queue_depth", "Background jobs by type and status.", ["type", "status"],
+)
+
+
+@contextmanager
+def timed(histogram: Histogram, timings: Optional[Dict[str, float]] = None, **labels: str) -> Iterator[None]:
+    """
+    Observes the block's duration on `histogram`; when `timings` is given, also records
+    it there in milliseconds under the first label value, for a structured log line.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        (histogram.labels(**labels) if labels else histogram).observe(elapsed)
+        if timings is not None:
+            timings[next(iter(labels.values()), "total")] = round(elapsed * 1000, 3)
+
+
+# --- Structured logs ---
+
+logger = logging.getLogger("scribe_eye")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, carrying the current request ID and route."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "event": record.getMessage(),
+            "request_id": request_id_var.get(),
+            "route": route_var.get(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str = "INFO"):
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    logger.handlers = [handler]
+    logger.setLevel(level.upper())
+    logger.propagate = False
+
+
+def log_event(event: str, level: int = logging.INFO, **fields: Any):
+    logger.log(level, event, extra={"fields": fields})
+
+
+# --- MongoDB ---
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command, labelled with the route or job that issued it."""
+
+    def __init__(self):
+        self._collections: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        target = event.command.get(event.command_name)
+        with self._lock:
+            self._collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else ""
+
+    def _finish(self, event, outcome: str):
+        with self._lock:
+            collection = self._collections.pop((event.connection_id, event.request_id), "")
+        MONGO_COMMAND_SECONDS.labels(route_var.get(), event.command_name, collection).observe(
+            event.duration_micros / 1_000_000
+        )
+        if outcome == "failed":
+            log_event("mongo_command_failed", logging.WARNING, command=event.command_name,
+                      collection=collection, failure=str(event.failure))
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event, "succeeded")
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event, "failed")
+
+
+# --- LLM ---
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """Records Gemini latency and prompt/completion token usage for one chain."""
+
+    # Cheap bookkeeping only, so run inline instead of in LangChain's thread pool.
+    run_inline = True
+
+    def __init__(self, chain: str):
+        self.chain = chain
+        self._started: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            LLM_REQUEST_SECONDS.labels(self.chain).observe(time.perf_counter() - started)
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                LLM_TOKENS.labels(self.chain, "prompt").inc(usage.get("input_tokens", 0))
+                LLM_TOKENS.labels(self.chain, "completion").inc(usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._started.pop(run_id, None)
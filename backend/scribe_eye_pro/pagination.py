@@ -0,0 +1,62 @@
+import base64
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import json_util
+from fastapi import HTTPException, Response
+
+# Keyset (cursor) pagination: a page is "the next `limit` documents after the last one
+# seen" in a fixed sort order that ends in _id, so pages stay stable while documents
+# are added and never need skip().
+
+SortSpec = List[Tuple[str, int]]
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: List[Any]) -> str:
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, sort: SortSpec) -> List[Any]:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def keyset_filter(sort: SortSpec, values: List[Any]) -> Dict[str, Any]:
+    """Builds the filter matching documents strictly after `values` in `sort` order."""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prev_field: values[j] for j, (prev_field, _) in enumerate(sort[:i])}
+        clause[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+def page_query(query: Dict[str, Any], sort: SortSpec, cursor: Optional[str]) -> Dict[str, Any]:
+    if not cursor:
+        return query
+    return {"$and": [query, keyset_filter(sort, decode_cursor(cursor, sort))]}
+
+
+def next_cursor(docs: List[Dict[str, Any]], sort: SortSpec, limit: int) -> Optional[str]:
+    """
+    Returns the cursor for the following page, or None on the last page. Callers fetch
+    `limit + 1` documents; the extra one only signals that another page exists.
+    """
+    if len(docs) <= limit:
+        return None
+    last = docs[limit - 1]
+    return encode_cursor([last[field] for field, _ in sort])
+
+
+def paginate(response: Response, docs: List[Dict[str, Any]], sort: SortSpec, limit: int) -> List[Dict[str, Any]]:
+    """Sets the next-page cursor header on `response` and returns this page's documents."""
+    cursor = next_cursor(docs, sort, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return docs[:limit]
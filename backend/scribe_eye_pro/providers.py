@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+from observability import log_event
+
+T = TypeVar("T")
+
+
+class Provider(Generic[T]):
+    """
+    A dependency (Gemini client, vector index, ...) created on first use and then cached.
+
+    Creation runs at most once at a time; if it fails, the error is kept for the
+    readiness report and the next use tries again. `aget()` creates it in a worker
+    thread, so a slow provider (Pinecone creating an index) never blocks the event loop.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self._factory = factory
+        self._value: Optional[T] = None
+        self._ready = False
+        self._initializing = False
+        self._error: Optional[str] = None
+        self._init_ms: Optional[float] = None
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def get(self) -> T:
+        if self._ready:
+            return self._value
+        with self._lock:
+            if self._ready:
+                return self._value
+            self._initializing = True
+            started = time.perf_counter()
+            try:
+                value = self._factory()
+            except Exception as e:
+                self._error = f"{type(e).__name__}: {e}"
+                log_event("provider_failed", logging.WARNING, provider=self.name, error=self._error)
+                raise
+            finally:
+                self._initializing = False
+            self._init_ms = round((time.perf_counter() - started) * 1000, 3)
+            self._value, self._ready, self._error = value, True, None
+            log_event("provider_ready", provider=self.name, init_ms=self._init_ms)
+            return value
+
+    async def aget(self) -> T:
+        if self._ready:
+            return self._value
+        return await asyncio.to_thread(self.get)
+
+    def set(self, value: T):
+        """Installs a ready-made value instead of calling the factory (benchmarks, tests)."""
+        with self._lock:
+            self._value, self._ready, self._error, self._init_ms = value, True, None, 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def status(self) -> Dict[str, Any]:
+        if self._ready:
+            state = "ready"
+        elif self._initializing:
+            state = "initializing"
+        elif self._error:
+            state = "failed"
+        else:
+            state = "idle"
+        return {"status": state, "init_ms": self._init_ms, "error": self._error}
+
+
+# Every provider, in creation order; readiness reports and warm-up walk this list.
+registry: List[Provider] = []
+
+
+async def warm_up(providers: Optional[List[Provider]] = None):
+    """
+    Creates every provider concurrently. Failures are recorded on the provider (and
+    retried on first use) rather than raised, so warm-up never takes the process down.
+    """
+    providers = registry if providers is None else providers
+    started = time.perf_counter()
+    results = await asyncio.gather(*(provider.aget() for provider in providers), return_exceptions=True)
+    log_event(
+        "warm_up_finished",
+        duration_ms=round((time.perf_counter() - started) * 1000, 3),
+        failed=[provider.name for provider, result in zip(providers, results) if isinstance(result, Exception)],
+    )
@@ -1,37 +1,198 @@
-from fastapi import APIRouter, HTTPException, Query, Body
+import json
+import logging
+from fastapi import APIRouter, HTTPException, Query, Body, Request
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from bson import ObjectId
 
-from models import EntityResponse, Question, QAResponse
-from database import entity_collection, project_collection, entity_helper
-from services.langchain_service import answer_question
+from config import settings
+from models import EntityResponse, CanonicalEntityResponse, EntityAliases, EntityGraphResponse, Question, QAResponse
+from database import entity_collection, canonical_entity_collection, project_collection, entity_row, canonical_entity_row, canonical_entity_helper, graph_node_helper, graph_edge_helper
+from services.entity_registry import LIST_PROJECTION, add_aliases, ensure_project_registry, search_entities
+from services.entity_graph import neighbourhood, top_graph
+from services.langchain_service import answer_question, stream_answer
+from services.tombstones import LIVE, exclude_scripts, tombstoned_scripts
+from pagination import page_query
+from fast_json import list_response
+from observability import log_event
 
 router = APIRouter(tags=["AI Features"])
 
+# Ordered by type and name to match the (project_id, type, name, _id) index.
+ENTITY_SORT = [("type", 1), ("name", 1), ("_id", 1)]
+
+async def _hidden_scripts(project_id: str) -> List[str]:
+    """The project's deleted scripts whose data is not reclaimed yet; 404 if the project is deleted."""
+    hidden = await tombstoned_scripts(project_id)
+    if hidden is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return hidden
+
+def _without_scripts(hidden: List[str]):
+    """canonical_entity_row, minus the deleted scripts in `script_ids`."""
+    if not hidden:
+        return canonical_entity_row
+    excluded = set(hidden)
+
+    def row(entity):
+        return {**canonical_entity_row(entity), "script_ids": [s for s in entity.get("script_ids", []) if s not in excluded]}
+    return row
+
 @router.get("/projects/{project_id}/entities", response_model=List[EntityResponse])
 async def get_entities_by_project(
     project_id: str, 
-    type: Optional[str] = Query(None, enum=["character", "location", "event"])
+    request: Request,
+    type: Optional[str] = Query(None, enum=["character", "location", "event"]),
+    limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
 ):
+    """
+    Lists entities by type and name, `limit` (default PAGE_SIZE) at a time. If more
+    entities follow, the X-Next-Cursor response header holds the `cursor` for the next
+    page. With `Accept: application/x-ndjson` every remaining entity is streamed
+    instead, one JSON object per line.
+    """
     if not ObjectId.is_valid(project_id):
         raise HTTPException(status_code=400, detail="Invalid project ID")
+    hidden = await _hidden_scripts(project_id)
     
     query = {"project_id": project_id}
     if type:
         query["type"] = type
-        
-    entities = []
-    async for entity in entity_collection.find(query):
-        entities.append(entity_helper(entity))
-    return entities
+    query = page_query(exclude_scripts(query, hidden), ENTITY_SORT, cursor)
+
+    return await list_response(
+        request, lambda n: entity_collection.find(query).sort(ENTITY_SORT).limit(n or 0),
+        entity_row, ENTITY_SORT, limit,
+    )
+
+@router.get("/projects/{project_id}/entities/canonical", response_model=List[CanonicalEntityResponse])
+async def get_canonical_entities(
+    project_id: str,
+    request: Request,
+    type: Optional[str] = Query(None, enum=["character", "location", "event"]),
+    limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """
+    Lists the project's canonical entities (each script's mentions merged by name and
+    aliases) by type and name, paginated like the per-script entity list.
+    """
+    if not ObjectId.is_valid(project_id):
+        raise HTTPException(status_code=400, detail="Invalid project ID")
+    hidden = await _hidden_scripts(project_id)
+    await ensure_project_registry(project_id)
+
+    query = {"project_id": project_id}
+    if type:
+        query["type"] = type
+    if hidden:
+        # Entities only deleted scripts mention are left out until the reclaim removes them.
+        query["script_ids"] = {"$elemMatch": {"$nin": hidden}}
+
+    query = page_query(query, ENTITY_SORT, cursor)
+    return await list_response(
+        request, lambda n: canonical_entity_collection.find(query, LIST_PROJECTION).sort(ENTITY_SORT).limit(n or 0),
+        _without_scripts(hidden), ENTITY_SORT, limit,
+    )
+
+@router.get("/projects/{project_id}/entities/search", response_model=List[CanonicalEntityResponse])
+async def search_project_entities(
+    project_id: str,
+    q: str = Query(..., min_length=1, max_length=100),
+    type: Optional[str] = Query(None, enum=["character", "location", "event"]),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """
+    Entity autocomplete: canonical entities with a name or alias word starting with
+    `q`, then close (misspelled) matches.
+    """
+    if not ObjectId.is_valid(project_id):
+        raise HTTPException(status_code=400, detail="Invalid project ID")
+    hidden = await _hidden_scripts(project_id)
+    await ensure_project_registry(project_id)
+    row = _without_scripts(hidden)
+    entities = await search_entities(project_id, q, type, limit)
+    return [
+        CanonicalEntityResponse(**row(entity)) for entity in entities
+        if not hidden or set(entity.get("script_ids", [])) - set(hidden)
+    ]
+
+@router.post("/projects/{project_id}/entities/canonical/{entity_id}/aliases", response_model=CanonicalEntityResponse)
+async def add_entity_aliases(project_id: str, entity_id: str, body: EntityAliases = Body(...)):
+    """
+    Adds other names for a canonical entity; entities already known by one of them
+    are merged into it.
+    """
+    if not ObjectId.is_valid(project_id) or not ObjectId.is_valid(entity_id):
+        raise HTTPException(status_code=400, detail="Invalid ID")
+    await _hidden_scripts(project_id)
+    entity = await add_aliases(project_id, ObjectId(entity_id), body.aliases)
+    if entity is None:
+        raise HTTPException(status_code=404, detail="Entity not found")
+    return canonical_entity_helper(entity)
+
+@router.get("/projects/{project_id}/entities/graph", response_model=EntityGraphResponse)
+async def get_entity_graph(
+    project_id: str,
+    entity_id: Optional[str] = None,
+    type: Optional[str] = Query(None, enum=["character", "location", "event"]),
+    limit: int = Query(50, ge=1, le=500),
+    edge_limit: int = Query(200, ge=0, le=5000),
+):
+    """
+    The entity co-occurrence graph, weighted by the number of chunks two entities share.
+    Without `entity_id`: the `limit` most mentioned entities (of `type`, if given) and
+    the heaviest edges between them. With it: that entity's `limit` strongest
+    neighbours (of `type`) and the edges among them.
+    """
+    if not ObjectId.is_valid(project_id) or (entity_id is not None and not ObjectId.is_valid(entity_id)):
+        raise HTTPException(status_code=400, detail="Invalid ID")
+    await _hidden_scripts(project_id)
+    if entity_id is None:
+        graph = await top_graph(project_id, type, limit, edge_limit)
+    else:
+        graph = await neighbourhood(project_id, ObjectId(entity_id), type, limit, edge_limit)
+        if graph is None:
+            raise HTTPException(status_code=404, detail="Entity not found")
+    return EntityGraphResponse(
+        nodes=[graph_node_helper(node) for node in graph["nodes"]],
+        edges=[graph_edge_helper(edge) for edge in graph["edges"]],
+    )
 
 @router.post("/projects/{project_id}/question", response_model=QAResponse)
 async def ask_project_question(project_id: str, question: Question = Body(...)):
     if not ObjectId.is_valid(project_id):
         raise HTTPException(status_code=400, detail="Invalid project ID")
-    project = await project_collection.find_one({"_id": ObjectId(project_id)})
+    project = await project_collection.find_one({"_id": ObjectId(project_id), **LIVE})
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
         
     result = await answer_question(project_id, question.question)
     return result
+
+@router.post("/projects/{project_id}/question/stream")
+async def stream_project_question(project_id: str, question: Question = Body(...)):
+    """
+    Server-Sent Events variant of the question endpoint: a `sources` event with the
+    source chunks, `token` events as the answer is generated, then `done` (or `error`).
+    """
+    if not ObjectId.is_valid(project_id):
+        raise HTTPException(status_code=400, detail="Invalid project ID")
+    project = await project_collection.find_one({"_id": ObjectId(project_id), **LIVE})
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    async def event_stream():
+        try:
+            async for event, data in stream_answer(project_id, question.question):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            log_event("stream_answer_failed", logging.ERROR, project_id=project_id, error=str(e))
+            yield f"event: error\ndata: {json.dumps({'detail': 'Failed to generate an answer'})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
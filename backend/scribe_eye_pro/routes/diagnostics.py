@@ -0,0 +1,25 @@
+from fastapi import APIRouter, status
+from typing import List
+
+from models import MessageResponse, QueryPlanReport
+from services.query_plans import explain_hot_queries
+from services.reclaimer import enqueue_orphan_sweep
+
+router = APIRouter(prefix="/diagnostics", tags=["Diagnostics"])
+
+@router.get("/query-plans", response_model=List[QueryPlanReport])
+async def get_query_plans():
+    """
+    Runs explain() on every hot route query and flags any that would scan a whole collection.
+    """
+    return await explain_hot_queries()
+
+@router.post("/orphan-sweep", response_model=MessageResponse, status_code=status.HTTP_202_ACCEPTED)
+async def start_orphan_sweep():
+    """
+    Queues a background sweep that reconciles MongoDB with the vector index: pending
+    deletes are reclaimed again, data left by projects and scripts that no longer
+    exist is removed, and so are vectors no live script accounts for.
+    """
+    await enqueue_orphan_sweep()
+    return {"message": "Orphan sweep queued"}
@@ -1,20 +1,94 @@
-from fastapi import APIRouter, HTTPException, status, Body
-from typing import List
+from fastapi import APIRouter, HTTPException, status, Body, Query, Request, Response
+from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
 
-from models import ProjectCreate, ProjectResponse, MessageResponse
-from database import project_collection, script_collection, entity_collection, project_helper
-from vector_store import vector_store_instance
+from config import settings
+from models import ProjectCreate, ProjectResponse, ProjectDashboardEntry, MessageResponse
+from database import project_collection, script_collection, entity_collection, job_collection, project_helper, project_row, SCRIPT_WORD_COUNT_EXPR
+from services.indexing import indexing_state
+from services.tombstones import LIVE, all_tombstoned_scripts, exclude_scripts, tombstone_project
+from pagination import page_query, paginate
+from fast_json import list_response
 
 router = APIRouter(prefix="/projects", tags=["Projects"])
 
+PROJECT_SORT = [("updated_at", -1), ("_id", -1)]
+
 @router.get("", response_model=List[ProjectResponse])
-async def get_all_projects():
-    projects = []
-    async for project in project_collection.find():
-        projects.append(project_helper(project))
-    return projects
+async def get_all_projects(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """
+    Most recently updated first, `limit` (default PAGE_SIZE) at a time. If more
+    projects follow, the X-Next-Cursor response header holds the `cursor` for the next
+    page. With `Accept: application/x-ndjson` every project is streamed instead.
+    """
+    query = page_query(LIVE, PROJECT_SORT, cursor)
+    return await list_response(
+        request, lambda n: project_collection.find(query).sort(PROJECT_SORT).limit(n or 0),
+        project_row, PROJECT_SORT, limit,
+    )
+
+def _lookup_stats(collection, group_pipeline: list, as_field: str) -> dict:
+    # Joins on the stringified project _id; each lookup is served by a project_id index.
+    return {"$lookup": {
+        "from": collection.name,
+        "localField": "_project_id",
+        "foreignField": "project_id",
+        "pipeline": group_pipeline,
+        "as": as_field,
+    }}
+
+@router.get("/dashboard", response_model=List[ProjectDashboardEntry])
+async def get_projects_dashboard(
+    response: Response,
+    limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """
+    Every project with its script, word and entity counts and indexing state, in one
+    aggregation and in the same order and pages as GET /projects.
+    """
+    # Entities of deleted scripts stay until their reclaim job runs; like the entity
+    # routes, the counts leave them out.
+    hidden = await all_tombstoned_scripts()
+    pipeline = [
+        {"$match": page_query(LIVE, PROJECT_SORT, cursor)},
+        {"$sort": dict(PROJECT_SORT)},
+        {"$limit": limit + 1},
+        {"$addFields": {"_project_id": {"$toString": "$_id"}}},
+        _lookup_stats(script_collection, [{"$match": LIVE}, {"$group": {
+            "_id": None,
+            "count": {"$sum": 1},
+            "words": {"$sum": SCRIPT_WORD_COUNT_EXPR},
+            "last_updated": {"$max": "$updated_at"},
+        }}], "script_stats"),
+        _lookup_stats(entity_collection, [
+            {"$match": exclude_scripts({}, hidden)},
+            {"$group": {"_id": "$type", "count": {"$sum": 1}}},
+        ], "entity_stats"),
+        _lookup_stats(job_collection, [{"$group": {"_id": "$status", "count": {"$sum": 1}}}], "job_stats"),
+    ]
+    docs = await project_collection.aggregate(pipeline).to_list(length=None)
+
+    entries = []
+    for doc in paginate(response, docs, PROJECT_SORT, limit):
+        scripts = doc["script_stats"][0] if doc["script_stats"] else {"count": 0, "words": 0, "last_updated": None}
+        job_counts = {stat["_id"]: stat["count"] for stat in doc["job_stats"]}
+        entries.append(ProjectDashboardEntry(
+            **project_row(doc),
+            script_count=scripts["count"],
+            word_count=scripts["words"],
+            entity_counts={stat["_id"]: stat["count"] for stat in doc["entity_stats"]},
+            last_updated=max(filter(None, [doc["updated_at"], scripts["last_updated"]])),
+            indexing_state=indexing_state(job_counts),
+            job_counts=job_counts,
+        ))
+    return entries
 
 @router.post("", response_model=ProjectResponse, status_code=status.HTTP_201_CREATED)
 async def create_project(project: ProjectCreate = Body(...)):
@@ -30,7 +104,7 @@ async def create_project(project: ProjectCreate = Body(...)):
 async def get_project_by_id(project_id: str):
     if not ObjectId.is_valid(project_id):
         raise HTTPException(status_code=400, detail="Invalid project ID")
-    project = await project_collection.find_one({"_id": ObjectId(project_id)})
+    project = await project_collection.find_one({"_id": ObjectId(project_id), **LIVE})
     if project:
         return project_helper(project)
     raise HTTPException(status_code=404, detail=f"Project {project_id} not found")
@@ -43,28 +117,23 @@ async def update_project(project_id: str, project_data: ProjectCreate = Body(...
     update_data = project_data.model_dump(exclude_unset=True)
     update_data["updated_at"] = datetime.utcnow()
     
-    await project_collection.update_one(
-        {"_id": ObjectId(project_id)}, {"$set": update_data}
+    updated_project = await project_collection.find_one_and_update(
+        {"_id": ObjectId(project_id), **LIVE}, {"$set": update_data}, return_document=ReturnDocument.AFTER
     )
-    
-    updated_project = await project_collection.find_one({"_id": ObjectId(project_id)})
     if updated_project:
         return project_helper(updated_project)
     raise HTTPException(status_code=404, detail=f"Project {project_id} not found")
 
 @router.delete("/{project_id}", response_model=MessageResponse)
 async def delete_project(project_id: str):
+    """
+    Deletes the project at once; its scripts, entities and vectors are removed by a
+    background job (services/reclaimer.py) and hidden from every read until then.
+    """
     if not ObjectId.is_valid(project_id):
         raise HTTPException(status_code=400, detail="Invalid project ID")
-        
-    delete_result = await project_collection.delete_one({"_id": ObjectId(project_id)})
 
-    if delete_result.deleted_count == 1:
-        # Delete associated data
-        await script_collection.delete_many({"project_id": project_id})
-        await entity_collection.delete_many({"project_id": project_id})
-        vector_store_instance.delete(filter={"project_id": project_id})
-        
+    if await tombstone_project(project_id):
         return {"message": f"Project {project_id} deleted successfully"}
         
     raise HTTPException(status_code=404, detail=f"Project {project_id} not found")
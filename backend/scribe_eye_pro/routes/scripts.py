@@ -1,82 +1,305 @@
-from fastapi import APIRouter, HTTPException, status, Body, BackgroundTasks
-from typing import List
+from fastapi import APIRouter, HTTPException, status, Body, File, Query, Request, UploadFile
+from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
 
-from models import ScriptCreate, ScriptResponse, MessageResponse
-from database import script_collection, project_collection, entity_collection, script_helper
-from services.langchain_service import process_and_embed_script, extract_and_store_entities
-from vector_store import vector_store_instance
+from config import settings
+from models import ScriptCreate, ScriptPatch, ScriptResponse, ScriptPatchResponse, ScriptSummary, ScriptRevisionSummary, ScriptRevisionResponse, MessageResponse, ScriptIndexingStatus, ImportJobResponse
+from database import script_collection, script_revision_collection, project_collection, script_helper, script_summary_row, script_revision_row, import_job_helper, content_stats, SCRIPT_LENGTH_EXPR, SCRIPT_WORD_COUNT_EXPR
+from services.indexing import enqueue_script_indexing, get_indexing_status, get_import_status
+from services.script_import import import_scripts
+from services.answer_cache import answer_cache
+from services.langchain_service import update_lexical_index
+from services.tombstones import LIVE, tombstone_script
+from services.revisions import apply_edits, diff_edits, record_revision, revision_content, start_history
+from pagination import page_query
+from fast_json import list_response
 
 router = APIRouter(tags=["Scripts"])
 
 @router.post("/projects/{project_id}/scripts", response_model=ScriptResponse, status_code=status.HTTP_201_CREATED)
-async def create_script(project_id: str, background_tasks: BackgroundTasks, script: ScriptCreate = Body(...)):
+async def create_script(project_id: str, script: ScriptCreate = Body(...)):
     if not ObjectId.is_valid(project_id):
         raise HTTPException(status_code=400, detail="Invalid project ID")
-    project = await project_collection.find_one({"_id": ObjectId(project_id)})
+    project = await project_collection.find_one({"_id": ObjectId(project_id), **LIVE})
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
     script_dict = script.model_dump()
+    script_dict.update(content_stats(script_dict.get("content") or ""))
     script_dict["project_id"] = project_id
+    script_dict["revision"] = 0
     script_dict["created_at"] = datetime.utcnow()
     script_dict["updated_at"] = datetime.utcnow()
 
     new_script = await script_collection.insert_one(script_dict)
     created_script = await script_collection.find_one({"_id": new_script.inserted_id})
-    
-    # Run heavy AI processing in the background
     script_id = str(created_script["_id"])
-    background_tasks.add_task(process_and_embed_script, script.content, project_id, script_id)
-    background_tasks.add_task(extract_and_store_entities, script.content, project_id, script_id)
+    await record_revision(project_id, script_id, 0, [], created_script.get("content") or "")
+    update_lexical_index(project_id, script_id, created_script.get("content") or "")
+    await answer_cache.invalidate(project_id)
+    
+    # Queue heavy AI processing for the background workers
+    await enqueue_script_indexing(project_id, script_id)
 
     return script_helper(created_script)
 
-@router.get("/projects/{project_id}/scripts", response_model=List[ScriptResponse])
-async def get_scripts_for_project(project_id: str):
+@router.post("/projects/{project_id}/scripts/import", response_model=ImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def import_project_scripts(project_id: str, files: List[UploadFile] = File(...)):
+    """
+    Bulk-imports scripts from a multipart upload: plain text (.txt) and Fountain
+    (.fountain) files, or zip/tar archives of them. Scripts are created before this
+    returns; embedding and entity extraction run in the background, and
+    GET /projects/{project_id}/imports/{import_id} reports their progress.
+    """
     if not ObjectId.is_valid(project_id):
         raise HTTPException(status_code=400, detail="Invalid project ID")
-    
-    scripts = []
-    async for script in script_collection.find({"project_id": project_id}):
-        scripts.append(script_helper(script))
-    return scripts
+    if not await project_collection.find_one({"_id": ObjectId(project_id), **LIVE}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    # Uploads are spooled to temporary files, so each one is parsed as a stream.
+    record = await import_scripts(project_id, [(upload.filename or "upload", upload.file) for upload in files])
+    return import_job_helper(record)
+
+@router.get("/projects/{project_id}/imports/{import_id}", response_model=ImportJobResponse)
+async def get_import(project_id: str, import_id: str):
+    if not ObjectId.is_valid(import_id):
+        raise HTTPException(status_code=400, detail="Invalid import ID")
+    record = await get_import_status(project_id, import_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Import {import_id} not found")
+    return import_job_helper(record)
+
+SCRIPT_SORT = [("updated_at", -1), ("_id", -1)]
+PREVIEW_LENGTH = 120
+
+@router.get("/projects/{project_id}/scripts", response_model=List[ScriptSummary])
+async def get_scripts_for_project(
+    project_id: str,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """
+    Lists script summaries (no content), most recently updated first. If more scripts
+    follow, the X-Next-Cursor response header holds the `cursor` for the next page.
+    With `Accept: application/x-ndjson` they are streamed instead (see fast_json).
+    """
+    if not ObjectId.is_valid(project_id):
+        raise HTTPException(status_code=400, detail="Invalid project ID")
+    if not await project_collection.find_one({"_id": ObjectId(project_id), **LIVE}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    def pipeline(n: Optional[int]) -> list:
+        return [
+            {"$match": page_query({"project_id": project_id, **LIVE}, SCRIPT_SORT, cursor)},
+            {"$sort": dict(SCRIPT_SORT)},
+        ] + ([{"$limit": n}] if n else []) + [
+            # Only the preview leaves the server.
+            {"$project": {
+                "project_id": 1,
+                "title": 1,
+                "created_at": 1,
+                "updated_at": 1,
+                "preview": {"$substrCP": [{"$ifNull": ["$content", ""]}, 0, PREVIEW_LENGTH]},
+                "length": SCRIPT_LENGTH_EXPR,
+                "word_count": SCRIPT_WORD_COUNT_EXPR,
+            }},
+        ]
+
+    return await list_response(
+        request, lambda n: script_collection.aggregate(pipeline(n)), script_summary_row, SCRIPT_SORT, limit
+    )
+
+async def _live_script(script_id: str, projection: Optional[dict] = None) -> Optional[dict]:
+    # A script is gone once it or its project is deleted, though both stay until reclaimed.
+    if projection is not None:
+        projection = {**projection, "project_id": 1}
+    script = await script_collection.find_one({"_id": ObjectId(script_id), **LIVE}, projection)
+    if script is None or not await project_collection.find_one({"_id": ObjectId(script["project_id"]), **LIVE}, {"_id": 1}):
+        return None
+    return script
+
+@router.get("/scripts/{script_id}", response_model=ScriptResponse)
+async def get_script_by_id(script_id: str):
+    if not ObjectId.is_valid(script_id):
+        raise HTTPException(status_code=400, detail="Invalid script ID")
+    script = await _live_script(script_id)
+    if script:
+        return script_helper(script)
+    raise HTTPException(status_code=404, detail=f"Script {script_id} not found")
+
+@router.get("/scripts/{script_id}/status", response_model=ScriptIndexingStatus)
+async def get_script_status(script_id: str):
+    """
+    Reports whether the script's embedding and entity extraction are queued,
+    processing, done or failed.
+    """
+    if not ObjectId.is_valid(script_id):
+        raise HTTPException(status_code=400, detail="Invalid script ID")
+    if not await _live_script(script_id, {"_id": 1}):
+        raise HTTPException(status_code=404, detail=f"Script {script_id} not found")
+    return await get_indexing_status(script_id)
+
+async def _record_save(project_id: str, script_id: str, base_revision: int, old_content: str, edits, content: str):
+    # Scripts saved before revisions were kept start their history at revision 0.
+    if base_revision == 0:
+        await start_history(project_id, script_id, 0, old_content)
+    await record_revision(project_id, script_id, base_revision + 1, edits, content)
 
 @router.put("/scripts/{script_id}", response_model=ScriptResponse)
-async def update_script(script_id: str, background_tasks: BackgroundTasks, script_data: ScriptCreate = Body(...)):
+async def update_script(script_id: str, script_data: ScriptCreate = Body(...)):
+    """
+    Replaces the script's title and content. The change is stored in its history as a
+    diff against the previous content; PATCH sends only the edits in the first place.
+    """
     if not ObjectId.is_valid(script_id):
         raise HTTPException(status_code=400, detail="Invalid script ID")
         
     update_data = script_data.model_dump(exclude_unset=True)
+    update = {"$set": update_data}
+    if "content" in update_data:
+        update_data.update(content_stats(update_data["content"] or ""))
+        update["$inc"] = {"revision": 1}
     update_data["updated_at"] = datetime.utcnow()
     
-    await script_collection.update_one({"_id": ObjectId(script_id)}, {"$set": update_data})
-    
-    updated_script = await script_collection.find_one({"_id": ObjectId(script_id)})
-    if updated_script:
-        # Re-run AI processing on updated content
-        project_id = updated_script["project_id"]
-        content = updated_script.get("content", "")
-        background_tasks.add_task(process_and_embed_script, content, project_id, script_id)
-        background_tasks.add_task(extract_and_store_entities, content, project_id, script_id)
+    # The previous version comes back from the same write, for the diff.
+    old_script = await script_collection.find_one_and_update(
+        {"_id": ObjectId(script_id), **LIVE}, update, return_document=ReturnDocument.BEFORE
+    )
+    if old_script:
+        updated_script = {**old_script, **update_data, "revision": old_script.get("revision", 0)}
+        # Re-run AI processing on updated content; rapid saves coalesce into one run
+        project_id = old_script["project_id"]
+        if "content" in update_data:
+            old_content = old_script.get("content") or ""
+            content = update_data["content"] or ""
+            updated_script["revision"] += 1
+            await _record_save(project_id, script_id, updated_script["revision"] - 1, old_content, diff_edits(old_content, content), content)
+            update_lexical_index(project_id, script_id, content)
+        await answer_cache.invalidate(project_id)
+        await enqueue_script_indexing(project_id, script_id)
         
         return script_helper(updated_script)
         
     raise HTTPException(status_code=404, detail=f"Script {script_id} not found")
+
+@router.patch("/scripts/{script_id}", response_model=ScriptPatchResponse)
+async def patch_script(script_id: str, patch: ScriptPatch = Body(...)):
+    """
+    Applies text edits made against revision `base_revision` (and an optional new
+    title). If the script has moved on since, nothing is changed and the response is
+    409 with the current revision in the X-Script-Revision header, so the client can
+    rebase its edits. Edits must be in order and must not overlap.
+    """
+    if not ObjectId.is_valid(script_id):
+        raise HTTPException(status_code=400, detail="Invalid script ID")
+    script = await _live_script(script_id, {"project_id": 1, "content": 1, "revision": 1})
+    if not script:
+        raise HTTPException(status_code=404, detail=f"Script {script_id} not found")
+
+    def conflict(revision: int) -> HTTPException:
+        return HTTPException(
+            status_code=409,
+            detail=f"Script is at revision {revision}, not {patch.base_revision}",
+            headers={"X-Script-Revision": str(revision)},
+        )
+
+    if script.get("revision", 0) != patch.base_revision:
+        raise conflict(script.get("revision", 0))
+    old_content = script.get("content") or ""
+    edits = [(edit.start, edit.end, edit.text) for edit in patch.edits]
+    try:
+        content = apply_edits(old_content, edits)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    update_data = {"content": content, **content_stats(content), "updated_at": datetime.utcnow()}
+    if patch.title is not None:
+        update_data["title"] = patch.title
+    # Only applies if no other save got in since the script was read.
+    current = {"$in": [0, None]} if patch.base_revision == 0 else patch.base_revision
+    result = await script_collection.update_one(
+        {"_id": ObjectId(script_id), "revision": current, **LIVE},
+        {"$set": update_data, "$inc": {"revision": 1}},
+    )
+    if result.matched_count == 0:
+        latest = await script_collection.find_one({"_id": ObjectId(script_id), **LIVE}, {"revision": 1})
+        if latest is None:
+            raise HTTPException(status_code=404, detail=f"Script {script_id} not found")
+        raise conflict(latest.get("revision", 0))
+
+    revision = patch.base_revision + 1
+    project_id = script["project_id"]
+    await _record_save(project_id, script_id, patch.base_revision, old_content, edits, content)
+    update_lexical_index(project_id, script_id, content)
+    await answer_cache.invalidate(project_id)
+    await enqueue_script_indexing(project_id, script_id)
+    return ScriptPatchResponse(
+        id=script_id,
+        revision=revision,
+        length=update_data["length"],
+        word_count=update_data["word_count"],
+        updated_at=update_data["updated_at"],
+    )
+
+REVISION_SORT = [("revision", -1)]
+
+@router.get("/scripts/{script_id}/revisions", response_model=List[ScriptRevisionSummary])
+async def get_script_revisions(
+    script_id: str,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """
+    Lists the script's stored revisions, newest first. If more follow, the
+    X-Next-Cursor response header holds the `cursor` for the next page.
+    """
+    if not ObjectId.is_valid(script_id):
+        raise HTTPException(status_code=400, detail="Invalid script ID")
+    if not await _live_script(script_id, {"_id": 1}):
+        raise HTTPException(status_code=404, detail=f"Script {script_id} not found")
+
+    def pipeline(n: Optional[int]) -> list:
+        return [
+            {"$match": page_query({"script_id": script_id}, REVISION_SORT, cursor)},
+            {"$sort": dict(REVISION_SORT)},
+        ] + ([{"$limit": n}] if n else []) + [
+            # Snapshots stay on the server; only whether there is one is listed.
+            {"$project": {
+                "revision": 1,
+                "length": 1,
+                "created_at": 1,
+                "snapshot": {"$gt": ["$snapshot", None]},
+            }},
+        ]
+
+    return await list_response(
+        request, lambda n: script_revision_collection.aggregate(pipeline(n)), script_revision_row, REVISION_SORT, limit
+    )
+
+@router.get("/scripts/{script_id}/revisions/{revision}", response_model=ScriptRevisionResponse)
+async def get_script_revision(script_id: str, revision: int):
+    """The script's content as of a past revision, rebuilt from the nearest snapshot."""
+    if not ObjectId.is_valid(script_id):
+        raise HTTPException(status_code=400, detail="Invalid script ID")
+    found = await revision_content(script_id, revision) if await _live_script(script_id, {"_id": 1}) else None
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Revision {revision} of script {script_id} not found")
+    return ScriptRevisionResponse(script_id=script_id, **found)
     
 @router.delete("/scripts/{script_id}", response_model=MessageResponse)
 async def delete_script(script_id: str):
+    """
+    Deletes the script at once; its entities, vectors and history are removed by a
+    background job (services/reclaimer.py) and hidden from every read until then.
+    """
     if not ObjectId.is_valid(script_id):
         raise HTTPException(status_code=400, detail="Invalid script ID")
 
-    delete_result = await script_collection.delete_one({"_id": ObjectId(script_id)})
-    
-    if delete_result.deleted_count == 1:
-        # Also delete associated entities and vectors
-        await entity_collection.delete_many({"script_id": script_id})
-        vector_store_instance.delete(filter={"script_id": script_id})
-        
+    if await tombstone_script(script_id):
         return {"message": f"Script {script_id} deleted successfully"}
         
     raise HTTPException(status_code=404, detail=f"Script {script_id} not found")
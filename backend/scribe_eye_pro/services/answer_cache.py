@@ -0,0 +1,139 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pymongo import ReturnDocument
+
+from config import settings
+from database import answer_cache_collection
+
+
+def normalize_question(question: str) -> str:
+    """Case-folds, collapses whitespace and drops trailing punctuation."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").casefold()
+
+
+class AnswerCache:
+    """
+    Per-project cache of Q&A responses.
+
+    A question is served from cache when its normalized text matches a cached one
+    exactly, or when its embedding is within `similarity_threshold` (cosine) of a
+    cached question's embedding. Entries expire after `ttl_seconds`, each project
+    keeps at most `max_entries` (least recently used are evicted first), and
+    `invalidate` drops a project's entries whenever its scripts change.
+
+    Entries live in each process's memory, but a project's generation is kept in
+    MongoDB: `invalidate` bumps it (in the worker, say, after re-embedding), and
+    `generation`, which every lookup follows, drops the entries this process stored
+    under an older one.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, similarity_threshold: float):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.misses = 0
+        self._projects: Dict[str, "OrderedDict[str, Dict[str, Any]]"] = {}
+        # The latest generation this process has seen per project; its entries belong to it.
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def generation(self, project_id: str) -> int:
+        """
+        Reads the project's generation, dropping this process's entries if another
+        process has invalidated them. Call it before the lookups; `store` takes the
+        result and rejects answers computed before a later invalidation.
+        """
+        doc = await answer_cache_collection.find_one({"_id": project_id}, {"generation": 1})
+        generation = doc["generation"] if doc else 0
+        self._advance(project_id, generation)
+        return generation
+
+    def _advance(self, project_id: str, generation: int):
+        with self._lock:
+            # Generations only grow; a read that lost a race with a newer one changes nothing.
+            if generation > self._generations.get(project_id, 0):
+                self._projects.pop(project_id, None)
+                self._generations[project_id] = generation
+
+    def _live_entries(self, project_id: str) -> "OrderedDict[str, Dict[str, Any]]":
+        entries = self._projects.get(project_id)
+        if entries is None:
+            return OrderedDict()
+        now = time.monotonic()
+        for key in [key for key, entry in entries.items() if entry["expires_at"] <= now]:
+            del entries[key]
+        return entries
+
+    def lookup_exact(self, project_id: str, question: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entries = self._live_entries(project_id)
+            key = normalize_question(question)
+            if key in entries:
+                entries.move_to_end(key)
+                self.hits += 1
+                return entries[key]["response"]
+            return None
+
+    def lookup_similar(self, project_id: str, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """Returns the closest cached response above the threshold; counts a miss otherwise."""
+        with self._lock:
+            entries = self._live_entries(project_id)
+            if entries:
+                keys = list(entries.keys())
+                matrix = np.stack([entries[key]["embedding"] for key in keys])
+                scores = matrix @ _unit(embedding)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    entries.move_to_end(keys[best])
+                    self.hits += 1
+                    return entries[keys[best]]["response"]
+            self.misses += 1
+            return None
+
+    def store(self, project_id: str, question: str, embedding: List[float], response: Dict[str, Any], generation: int):
+        with self._lock:
+            if generation != self._generations.get(project_id, 0):
+                return
+            entries = self._projects.setdefault(project_id, OrderedDict())
+            key = normalize_question(question)
+            entries[key] = {
+                "embedding": _unit(embedding),
+                "response": response,
+                "expires_at": time.monotonic() + self.ttl_seconds,
+            }
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    async def invalidate(self, project_id: str):
+        doc = await answer_cache_collection.find_one_and_update(
+            {"_id": project_id}, {"$inc": {"generation": 1}},
+            projection={"generation": 1}, upsert=True, return_document=ReturnDocument.AFTER,
+        )
+        self._advance(project_id, doc["generation"])
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": sum(len(entries) for entries in self._projects.values()),
+        }
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+answer_cache = AnswerCache(
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    similarity_threshold=settings.ANSWER_CACHE_SIMILARITY,
+)
@@ -0,0 +1,103 @@
+import re
+from typing import Dict, List, Optional, Set
+
+from langchain_core.documents import Document
+
+# Chunks of one script are merged when one's tail repeats the other's head for at least
+# this many characters; shorter matches are likely coincidental.
+MIN_MERGE_OVERLAP = 20
+# Passages sharing at least this fraction of their word trigrams with a passage already
+# in the context are dropped as near-duplicates.
+NEAR_DUPLICATE_THRESHOLD = 0.8
+# Rough characters-per-token ratio for English prose; good enough to size a prompt.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _overlap(first: str, second: str) -> int:
+    """Length of the longest suffix of `first` that is a prefix of `second` (0 if too short)."""
+    if len(first) < MIN_MERGE_OVERLAP or len(second) < MIN_MERGE_OVERLAP:
+        return 0
+    probe = second[:MIN_MERGE_OVERLAP]
+    start = max(0, len(first) - len(second))
+    while True:
+        position = first.find(probe, start)
+        if position == -1:
+            return 0
+        if second.startswith(first[position:]):
+            return len(first) - position
+        start = position + 1
+
+
+def _merge_script_chunks(chunks: List[Dict]) -> List[Dict]:
+    """
+    Merges one script's chunks back into contiguous passages: a chunk contained in
+    another is dropped, and chunks that overlap end-to-start are joined.
+    """
+    passages = list(chunks)
+    merged = True
+    while merged:
+        merged = False
+        for i, first in enumerate(passages):
+            for j, second in enumerate(passages):
+                if i == j:
+                    continue
+                if second["text"] in first["text"]:
+                    text = first["text"]
+                else:
+                    overlap = _overlap(first["text"], second["text"])
+                    if not overlap:
+                        continue
+                    text = first["text"] + second["text"][overlap:]
+                passages[i] = {"text": text, "rank": min(first["rank"], second["rank"]), "metadata": first["metadata"]}
+                del passages[j]
+                merged = True
+                break
+            if merged:
+                break
+    return passages
+
+
+def _shingles(text: str) -> Set[str]:
+    words = re.findall(r"\w+", text.casefold())
+    return {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+
+def assemble_context(documents: List[Document], token_budget: Optional[int]) -> List[Document]:
+    """
+    Turns ranked retrieval results into prompt passages: overlapping chunks of the
+    same script are merged, near-duplicate passages are dropped, and the rest are
+    packed in relevance order until `token_budget` (estimated tokens) is used up.
+    """
+    by_script: Dict[str, List[Dict]] = {}
+    for rank, doc in enumerate(documents):
+        script_id = doc.metadata.get("script_id", "")
+        by_script.setdefault(script_id, []).append({"text": doc.page_content, "rank": rank, "metadata": doc.metadata})
+
+    passages = [passage for chunks in by_script.values() for passage in _merge_script_chunks(chunks)]
+    passages.sort(key=lambda passage: passage["rank"])
+
+    assembled: List[Document] = []
+    kept_shingles: List[Set[str]] = []
+    remaining = token_budget
+    for passage in passages:
+        shingles = _shingles(passage["text"])
+        if any(len(shingles & kept) >= NEAR_DUPLICATE_THRESHOLD * len(shingles) for kept in kept_shingles):
+            continue
+        text = passage["text"]
+        if remaining is not None:
+            cost = estimate_tokens(text)
+            if cost > remaining:
+                if assembled:
+                    # Too big for what is left; a smaller, less relevant passage may still fit.
+                    continue
+                # Never send an empty context: cut the most relevant passage down to size.
+                text = text[:remaining * CHARS_PER_TOKEN]
+                cost = remaining
+            remaining -= cost
+        assembled.append(Document(page_content=text, metadata=dict(passage["metadata"])))
+        kept_shingles.append(shingles)
+    return assembled
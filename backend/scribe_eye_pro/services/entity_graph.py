@@ -0,0 +1,213 @@
+import hashlib
+import itertools
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import DeleteOne, UpdateOne
+
+from database import canonical_entity_collection, chunk_mention_collection, entity_edge_collection
+from observability import log_event
+from services.entity_registry import normalize_entity_name
+
+# The project's entity graph: canonical entities are the nodes, and two entities are
+# joined by an edge weighted by the number of embedding chunks mentioning both. Each
+# chunk's mentions are stored under its content-addressed chunk ID, so a save only
+# touches the chunks it changed and applies the difference to the edge weights.
+# Edges are stored in both directions so a neighbourhood is a single index range.
+
+# Names shorter than this match too much ordinary text to count as mentions.
+MIN_NAME_LENGTH = 2
+
+
+def _mention_pattern(entities: List[Dict[str, Any]]) -> Tuple[Optional[re.Pattern], Dict[str, str]]:
+    """One alternation over every name and alias (longest first) and the entity each belongs to."""
+    owners: Dict[str, str] = {}
+    for entity in entities:
+        for key in entity["keys"]:
+            if len(key) >= MIN_NAME_LENGTH:
+                owners.setdefault(key, str(entity["_id"]))
+    if not owners:
+        return None, owners
+    names = sorted(owners, key=len, reverse=True)
+    return re.compile(r"(?<!\w)(?:" + "|".join(map(re.escape, names)) + r")(?!\w)"), owners
+
+def chunk_mentions(text: str, pattern: Optional[re.Pattern], owners: Dict[str, str]) -> List[str]:
+    """The IDs of the entities named in a chunk, in a stable order."""
+    if pattern is None:
+        return []
+    return sorted({owners[match.group(0)] for match in pattern.finditer(normalize_entity_name(text))})
+
+def _pairs(entity_ids: List[str]) -> List[Tuple[str, str]]:
+    return list(itertools.combinations(sorted(entity_ids), 2))
+
+async def _apply(project_id: str, node_deltas: Counter, edge_deltas: Counter, types: Dict[str, str]):
+    """Adds the weight changes to nodes and both directions of each edge; drops edges at zero."""
+    now = datetime.utcnow()
+    node_updates = [
+        UpdateOne({"_id": ObjectId(entity_id)}, {"$inc": {"chunk_count": delta}})
+        for entity_id, delta in node_deltas.items() if delta
+    ]
+    if node_updates:
+        await canonical_entity_collection.bulk_write(node_updates, ordered=False)
+
+    edge_updates = []
+    for (a, b), delta in edge_deltas.items():
+        if not delta:
+            continue
+        for source, target in ((a, b), (b, a)):
+            edge_updates.append(UpdateOne(
+                {"_id": f"{project_id}:{source}:{target}"},
+                {"$inc": {"weight": delta},
+                 "$set": {"updated_at": now},
+                 "$setOnInsert": {
+                     "project_id": project_id, "source": source, "target": target,
+                     "source_type": types.get(source), "target_type": types.get(target),
+                 }},
+                upsert=True,
+            ))
+    if edge_updates:
+        await entity_edge_collection.bulk_write(edge_updates, ordered=False)
+        await entity_edge_collection.delete_many({"project_id": project_id, "weight": {"$lte": 0}})
+
+async def update_script_graph(project_id: str, script_id: str, chunks: List[Dict[str, Any]]):
+    """
+    Brings a script's chunk mentions and its share of the edge weights up to date.
+    Only chunks that are new, gone, or whose mentions changed (because the script's
+    entities did) are written, and only their pairs change weight.
+    """
+    entities = await canonical_entity_collection.find(
+        {"project_id": project_id, "script_ids": script_id}, {"keys": 1, "type": 1}
+    ).to_list(length=None)
+    types = {str(entity["_id"]): entity["type"] for entity in entities}
+    # Mentions depend on the names the script's entities go by; when those have not
+    # changed, a stored chunk's mentions are still right and need no rescan.
+    names = hashlib.sha256(repr(sorted((str(e["_id"]), sorted(e["keys"])) for e in entities)).encode("utf-8")).hexdigest()
+    pattern, owners = _mention_pattern(entities)
+
+    stored = {
+        doc["_id"]: doc
+        for doc in await chunk_mention_collection.find({"script_id": script_id}).to_list(length=None)
+    }
+    current = {}
+    for chunk in chunks:
+        current.setdefault(chunk["id"], chunk["text"])
+
+    node_deltas: Counter = Counter()
+    edge_deltas: Counter = Counter()
+    writes = []
+    for chunk_id, text in current.items():
+        previous = stored.get(chunk_id)
+        if previous is not None and previous["names"] == names:
+            continue
+        mentions = chunk_mentions(text, pattern, owners)
+        before = previous["entities"] if previous is not None else []
+        if previous is not None and before == mentions:
+            writes.append(UpdateOne({"_id": chunk_id}, {"$set": {"names": names}}))
+            continue
+        node_deltas.update({entity_id: 1 for entity_id in mentions})
+        node_deltas.subtract({entity_id: 1 for entity_id in before})
+        edge_deltas.update({pair: 1 for pair in _pairs(mentions)})
+        edge_deltas.subtract({pair: 1 for pair in _pairs(before)})
+        writes.append(UpdateOne(
+            {"_id": chunk_id},
+            {"$set": {"project_id": project_id, "script_id": script_id, "entities": mentions, "names": names}},
+            upsert=True,
+        ))
+    for chunk_id, previous in stored.items():
+        if chunk_id in current:
+            continue
+        node_deltas.subtract({entity_id: 1 for entity_id in previous["entities"]})
+        edge_deltas.subtract({pair: 1 for pair in _pairs(previous["entities"])})
+        writes.append(DeleteOne({"_id": chunk_id}))
+
+    if writes:
+        await chunk_mention_collection.bulk_write(writes, ordered=False)
+    await _apply(project_id, node_deltas, edge_deltas, types)
+    log_event("entity_graph_updated", project_id=project_id, script_id=script_id,
+              chunks_changed=len(writes), edges_changed=sum(1 for delta in edge_deltas.values() if delta))
+
+async def remove_script_graph(project_id: str, script_id: str):
+    await update_script_graph(project_id, script_id, [])
+
+async def merge_graph_nodes(project_id: str, survivor_id: str, absorbed_ids: List[str]):
+    """
+    Re-points every script's chunk mentions of entities merged into `survivor_id` at
+    it, moving their chunk counts and edge weights over (a chunk naming several of
+    them counts once). Called by the registry after the absorbed entities are deleted.
+    """
+    absorbed = set(absorbed_ids)
+    node_deltas: Counter = Counter()
+    edge_deltas: Counter = Counter()
+    writes = []
+    async for doc in chunk_mention_collection.find(
+        {"project_id": project_id, "entities": {"$in": sorted(absorbed)}}, {"entities": 1}
+    ):
+        before = doc["entities"]
+        after = sorted({survivor_id if entity_id in absorbed else entity_id for entity_id in before})
+        node_deltas.update({entity_id: 1 for entity_id in after})
+        node_deltas.subtract({entity_id: 1 for entity_id in before})
+        edge_deltas.update({pair: 1 for pair in _pairs(after)})
+        edge_deltas.subtract({pair: 1 for pair in _pairs(before)})
+        writes.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"entities": after}}))
+    if not writes:
+        return
+
+    await chunk_mention_collection.bulk_write(writes, ordered=False)
+    neighbours = {entity_id for pair, delta in edge_deltas.items() if delta > 0 for entity_id in pair}
+    types = {
+        str(entity["_id"]): entity["type"]
+        async for entity in canonical_entity_collection.find(
+            {"_id": {"$in": [ObjectId(entity_id) for entity_id in sorted(neighbours)]}}, {"type": 1}
+        )
+    }
+    await _apply(project_id, node_deltas, edge_deltas, types)
+    log_event("entity_graph_merged", project_id=project_id, entity_id=survivor_id,
+              merged=len(absorbed), chunks_changed=len(writes))
+
+
+# --- Queries ---
+
+NODE_PROJECTION = {"type": 1, "name": 1, "chunk_count": 1}
+
+async def _nodes(project_id: str, entity_ids: List[ObjectId]) -> List[Dict[str, Any]]:
+    return await canonical_entity_collection.find(
+        {"project_id": project_id, "_id": {"$in": entity_ids}}, NODE_PROJECTION
+    ).sort([("chunk_count", -1), ("_id", 1)]).to_list(length=None)
+
+async def _edges_among(project_id: str, entity_ids: Set[str], limit: int) -> List[Dict[str, Any]]:
+    """The heaviest edges between the given entities, each once."""
+    edges = await entity_edge_collection.find(
+        {"project_id": project_id, "source": {"$in": sorted(entity_ids)}, "target": {"$in": sorted(entity_ids)}},
+        {"source": 1, "target": 1, "weight": 1},
+    ).sort([("weight", -1), ("_id", 1)]).limit(2 * limit).to_list(length=None)
+    return [edge for edge in edges if edge["source"] < edge["target"]][:limit]
+
+async def top_graph(project_id: str, entity_type: Optional[str], limit: int, edge_limit: int) -> Dict[str, Any]:
+    """The `limit` entities mentioned in the most chunks and the heaviest edges between them."""
+    query: Dict[str, Any] = {"project_id": project_id, "chunk_count": {"$gt": 0}}
+    if entity_type:
+        query["type"] = entity_type
+    nodes = await canonical_entity_collection.find(query, NODE_PROJECTION) \
+        .sort([("chunk_count", -1), ("_id", 1)]).limit(limit).to_list(length=None)
+    edges = await _edges_among(project_id, {str(node["_id"]) for node in nodes}, edge_limit)
+    return {"nodes": nodes, "edges": edges}
+
+async def neighbourhood(project_id: str, entity_id, entity_type: Optional[str], limit: int, edge_limit: int) -> Optional[Dict[str, Any]]:
+    """
+    An entity, its `limit` strongest neighbours (optionally of one type) and the
+    heaviest edges among them all. None if the entity does not exist.
+    """
+    center = await canonical_entity_collection.find_one({"project_id": project_id, "_id": entity_id}, NODE_PROJECTION)
+    if center is None:
+        return None
+    query: Dict[str, Any] = {"project_id": project_id, "source": str(entity_id)}
+    if entity_type:
+        query["target_type"] = entity_type
+    neighbours = await entity_edge_collection.find(query, {"target": 1}) \
+        .sort([("weight", -1), ("_id", 1)]).limit(limit).to_list(length=None)
+    nodes = [center] + await _nodes(project_id, [ObjectId(edge["target"]) for edge in neighbours])
+    edges = await _edges_among(project_id, {str(node["_id"]) for node in nodes}, edge_limit)
+    return {"nodes": nodes, "edges": edges}
@@ -0,0 +1,326 @@
+import re
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from database import canonical_entity_collection, entity_collection
+from observability import log_event
+
+# The project-level entity registry: one canonical entity per character, location or
+# event, merging every script's mentions of it by normalized name and aliases. Each
+# canonical entity keeps a reference to the mention in each script that names it and
+# is updated incrementally whenever a script's entities are re-extracted or deleted.
+
+# Attribute keys extraction may use to list other names for an entity.
+ALIAS_ATTRIBUTES = ("aliases", "alias", "nicknames", "nickname", "also_known_as", "aka")
+# Fuzzy matches need at least this share of the query's trigrams.
+FUZZY_MIN_SIMILARITY = 0.3
+
+# Search and listing return only what the API shows, not mention references or search arrays.
+LIST_PROJECTION = {
+    field: 1
+    for field in ("project_id", "type", "name", "aliases", "description", "script_ids", "created_at", "updated_at")
+}
+# Projects known to have a registry, so the backfill check runs once per project and process.
+_registered_projects: Set[str] = set()
+
+
+def normalize_entity_name(name: str) -> str:
+    """
+    Canonical form used to merge mentions: case-folded, punctuation-free, no leading "the".
+    """
+    normalized = unicodedata.normalize("NFKC", name).casefold()
+    normalized = re.sub(r"[^\w\s]", " ", normalized)
+    normalized = re.sub(r"\s+", " ", normalized).strip()
+    return re.sub(r"^the ", "", normalized)
+
+def entity_aliases(entity: Dict[str, Any]) -> List[str]:
+    """Other names for an extracted entity, from whichever alias attribute it has."""
+    aliases = []
+    attributes = entity.get("attributes") or {}
+    for key in ALIAS_ATTRIBUTES:
+        values = attributes.get(key)
+        for value in values if isinstance(values, list) else [values]:
+            if isinstance(value, str) and value.strip() and value.strip() not in aliases:
+                aliases.append(value.strip())
+    return aliases
+
+def name_prefixes(keys: Iterable[str]) -> List[str]:
+    """Every word-start suffix of each key, so "kar" finds "anna karenina"."""
+    prefixes: Set[str] = set()
+    for key in keys:
+        prefixes.update(key[match.start():] for match in re.finditer(r"\b\w", key))
+    return sorted(prefixes)
+
+def trigrams(text: str) -> Set[str]:
+    grams: Set[str] = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def _new_aliases(entity: Dict[str, Any], names: Iterable[str]) -> List[str]:
+    """The names that would be new aliases of `entity`, not just another spelling of one."""
+    known = {normalize_entity_name(name) for name in [entity["name"], *(entity.get("aliases") or [])]}
+    aliases = []
+    for name in names:
+        key = normalize_entity_name(name)
+        if key and key not in known:
+            known.add(key)
+            aliases.append(name)
+    return aliases
+
+def _search_fields(keys: Iterable[str]) -> Dict[str, Any]:
+    keys = sorted(set(keys))
+    return {
+        "keys": keys,
+        "prefixes": name_prefixes(keys),
+        "trigrams": sorted(set().union(*(trigrams(key) for key in keys))),
+    }
+
+
+# --- Incremental updates ---
+
+def _merged(target: Dict[str, Any], others: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """`target` with the names, aliases and mentions of `others` folded in."""
+    merged = dict(target)
+    merged["mentions"] = dict(target.get("mentions") or {})
+    merged["aliases"] = list(target.get("aliases") or [])
+    keys = set(target["keys"])
+    for other in others:
+        keys.update(other["keys"])
+        merged["aliases"] += _new_aliases(merged, [other["name"], *(other.get("aliases") or [])])
+        for script_id, mention in (other.get("mentions") or {}).items():
+            merged["mentions"].setdefault(script_id, mention)
+        merged["description"] = merged.get("description") or other.get("description")
+    merged["script_ids"] = sorted(merged["mentions"])
+    merged.update(_search_fields(keys))
+    merged["updated_at"] = datetime.utcnow()
+    return merged
+
+async def _merge_graph(project_id: str, survivor_id, absorbed: List[Dict[str, Any]]):
+    """Moves the absorbed entities' chunk mentions and edges in the entity graph to the survivor."""
+    # entity_graph builds on this module, so it is imported here rather than at the top.
+    from services.entity_graph import merge_graph_nodes
+
+    await merge_graph_nodes(project_id, str(survivor_id), [str(entity["_id"]) for entity in absorbed])
+
+async def _merge_entities(entities: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Folds canonical entities an alias has shown to be the same into the one mentioned
+    by the most scripts (the oldest on a tie) and returns it.
+    """
+    entities = sorted(entities, key=lambda entity: (-len(entity.get("script_ids") or []), entity["_id"]))
+    target = _merged(entities[0], entities[1:])
+    await canonical_entity_collection.replace_one({"_id": target["_id"]}, target)
+    await canonical_entity_collection.delete_many({"_id": {"$in": [entity["_id"] for entity in entities[1:]]}})
+    await _merge_graph(target["project_id"], target["_id"], entities[1:])
+    log_event("entities_merged", project_id=target["project_id"], entity_id=str(target["_id"]), merged=len(entities) - 1)
+    return target
+
+def _clusters(mentions: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Groups a script's mentions by type, then into clusters of mentions whose names
+    or aliases overlap; each cluster is one entity as far as this script can tell.
+    """
+    clusters: Dict[str, List[Dict[str, Any]]] = {}
+    for mention in mentions:
+        key = normalize_entity_name(mention["name"])
+        if not key:
+            continue
+        aliases = _new_aliases({"name": mention["name"]}, entity_aliases(mention))
+        cluster = {
+            "key": key,
+            "keys": {key, *(normalize_entity_name(alias) for alias in aliases)},
+            "name": mention["name"],
+            "aliases": aliases,
+            "reference": {
+                "entity_id": str(mention["_id"]) if mention.get("_id") is not None else None,
+                "name": mention["name"],
+                "description": mention.get("description") or None,
+            },
+        }
+        same_type = clusters.setdefault(mention["type"], [])
+        for other in [other for other in same_type if other["keys"] & cluster["keys"]]:
+            same_type.remove(other)
+            cluster["keys"] |= other["keys"]
+            cluster["aliases"] += _new_aliases(cluster, [other["name"], *other["aliases"]])
+        same_type.append(cluster)
+    return clusters
+
+async def _sync(project_id: str, script_id: str, mentions: List[Dict[str, Any]]):
+    clusters = _clusters(mentions)
+
+    # One query per type finds every canonical entity the script's names or aliases point to.
+    candidates: Dict[str, List[Dict[str, Any]]] = {}
+    for entity_type, type_clusters in clusters.items():
+        candidates[entity_type] = await canonical_entity_collection.find({
+            "project_id": project_id,
+            "type": entity_type,
+            "keys": {"$in": sorted(set().union(*(cluster["keys"] for cluster in type_clusters)))},
+        }).to_list(length=None)
+
+    # Merges first, so no write below targets an entity a later merge removes.
+    for entity_type, type_clusters in clusters.items():
+        for cluster in type_clusters:
+            matches = [entity for entity in candidates[entity_type] if cluster["keys"] & set(entity["keys"])]
+            if len(matches) > 1:
+                merged = await _merge_entities(matches)
+                candidates[entity_type] = [entity for entity in candidates[entity_type] if entity not in matches] + [merged]
+
+    now = datetime.utcnow()
+    operations = []
+    touched = []
+    for entity_type, type_clusters in clusters.items():
+        for cluster in type_clusters:
+            reference = cluster["reference"]
+            matches = [entity for entity in candidates[entity_type] if cluster["keys"] & set(entity["keys"])]
+            if matches:
+                entity = matches[0]
+                new_aliases = _new_aliases(entity, [cluster["name"], *cluster["aliases"]])
+                update: Dict[str, Any] = {
+                    "$set": {
+                        f"mentions.{script_id}": reference,
+                        "updated_at": now,
+                        **_search_fields(set(entity["keys"]) | cluster["keys"]),
+                    },
+                    "$addToSet": {"script_ids": script_id},
+                }
+                if new_aliases:
+                    update["$addToSet"]["aliases"] = {"$each": new_aliases}
+                if not entity.get("description") and reference["description"]:
+                    update["$set"]["description"] = reference["description"]
+                operations.append(UpdateOne({"_id": entity["_id"]}, update))
+                touched.append(entity["_id"])
+            else:
+                entity_id = ObjectId()
+                operations.append(InsertOne({
+                    "_id": entity_id,
+                    "project_id": project_id,
+                    "type": entity_type,
+                    "key": cluster["key"],
+                    "name": cluster["name"],
+                    "aliases": cluster["aliases"],
+                    "description": reference["description"],
+                    "mentions": {script_id: reference},
+                    "script_ids": [script_id],
+                    **_search_fields(cluster["keys"]),
+                    "created_at": now,
+                    "updated_at": now,
+                }))
+                touched.append(entity_id)
+    if operations:
+        await canonical_entity_collection.bulk_write(operations)
+
+    # Entities the script no longer mentions lose its reference, and go once unreferenced.
+    await canonical_entity_collection.update_many(
+        {"project_id": project_id, "script_ids": script_id, "_id": {"$nin": touched}},
+        {"$pull": {"script_ids": script_id}, "$unset": {f"mentions.{script_id}": ""}, "$set": {"updated_at": now}},
+    )
+    await canonical_entity_collection.delete_many({"project_id": project_id, "script_ids": {"$size": 0}})
+
+async def sync_script_entities(project_id: str, script_id: str, mentions: List[Dict[str, Any]]):
+    """
+    Brings the registry in line with a script's freshly stored entity documents:
+    each mention joins the canonical entity sharing its normalized name or an alias
+    (merging entities an alias turns out to connect), or starts a new one.
+    """
+    try:
+        await _sync(project_id, script_id, mentions)
+    except BulkWriteError as e:
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+        # Another script created the same entity first; join it instead.
+        await _sync(project_id, script_id, mentions)
+    log_event("entity_registry_synced", project_id=project_id, script_id=script_id, mentions=len(mentions))
+
+async def remove_script_entities(project_id: str, script_id: str):
+    await _sync(project_id, script_id, [])
+
+async def ensure_project_registry(project_id: str):
+    """
+    Builds the registry from the stored mentions of a project extracted before the
+    registry existed; later extractions keep it up to date.
+    """
+    if project_id in _registered_projects:
+        return
+    if await canonical_entity_collection.find_one({"project_id": project_id}, {"_id": 1}) is None:
+        mentions: Dict[str, List[Dict[str, Any]]] = {}
+        async for mention in entity_collection.find({"project_id": project_id}):
+            mentions.setdefault(mention["script_id"], []).append(mention)
+        for script_id, script_mentions in mentions.items():
+            await sync_script_entities(project_id, script_id, script_mentions)
+        if mentions:
+            log_event("entity_registry_backfilled", project_id=project_id, scripts=len(mentions))
+    _registered_projects.add(project_id)
+
+async def add_aliases(project_id: str, entity_id, aliases: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Adds writer-supplied aliases to a canonical entity, merging in any other entity of
+    the same type already known by one of them. Returns the updated entity.
+    """
+    entity = await canonical_entity_collection.find_one({"_id": entity_id, "project_id": project_id})
+    if entity is None:
+        return None
+    aliases = [alias.strip() for alias in aliases if normalize_entity_name(alias)]
+    keys = sorted({normalize_entity_name(alias) for alias in aliases})
+    others = await canonical_entity_collection.find(
+        {"project_id": project_id, "type": entity["type"], "keys": {"$in": keys}, "_id": {"$ne": entity_id}}
+    ).to_list(length=None)
+    named = {**entity, "aliases": [*(entity.get("aliases") or []), *_new_aliases(entity, aliases)]}
+    # The entity being edited keeps its identity even if another is mentioned more.
+    merged = _merged(named, others)
+    merged.update(_search_fields(set(merged["keys"]) | set(keys)))
+    await canonical_entity_collection.replace_one({"_id": entity_id}, merged)
+    if others:
+        await canonical_entity_collection.delete_many({"_id": {"$in": [other["_id"] for other in others]}})
+        await _merge_graph(project_id, entity_id, others)
+        log_event("entities_merged", project_id=project_id, entity_id=str(entity_id), merged=len(others))
+    return merged
+
+
+# --- Search ---
+
+async def search_entities(project_id: str, query: str, entity_type: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    """
+    Autocomplete over canonical names and aliases: entities with a name word starting
+    with the query first (by number of scripts), then trigram matches for typos.
+    Both stages are index lookups on (project_id, prefixes) and (project_id, trigrams).
+    """
+    normalized = normalize_entity_name(query)
+    if not normalized:
+        return []
+    match: Dict[str, Any] = {"project_id": project_id}
+    if entity_type:
+        match["type"] = entity_type
+    by_scripts = [
+        {"$addFields": {"script_count": {"$size": "$script_ids"}}},
+        {"$sort": {"script_count": -1, "name": 1, "_id": 1}},
+    ]
+
+    results = await canonical_entity_collection.aggregate([
+        {"$match": {**match, "prefixes": {"$regex": f"^{re.escape(normalized)}"}}},
+        *by_scripts,
+        {"$limit": limit},
+        {"$project": LIST_PROJECTION},
+    ]).to_list(length=None)
+    if len(results) >= limit:
+        return results
+
+    grams = sorted(trigrams(normalized))
+    fuzzy = await canonical_entity_collection.aggregate([
+        {"$match": {**match, "trigrams": {"$in": grams}, "_id": {"$nin": [doc["_id"] for doc in results]}}},
+        {"$addFields": {"similarity": {"$divide": [
+            {"$size": {"$filter": {"input": "$trigrams", "cond": {"$in": ["$$this", grams]}}}}, len(grams),
+        ]}}},
+        {"$match": {"similarity": {"$gte": FUZZY_MIN_SIMILARITY}}},
+        {"$addFields": {"script_count": {"$size": "$script_ids"}}},
+        {"$sort": {"similarity": -1, "script_count": -1, "_id": 1}},
+        {"$limit": limit - len(results)},
+        {"$project": LIST_PROJECTION},
+    ]).to_list(length=None)
+    return results + fuzzy
@@ -0,0 +1,158 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+
+from config import settings
+from database import script_collection, import_collection
+from services.job_queue import job_queue
+from services.tombstones import LIVE, project_deleted
+from services.langchain_service import process_and_embed_script, extract_and_store_entities, embed_new_scripts
+from services.summaries import summarize_script
+from observability import log_event
+
+JOB_EMBED = "embed"
+JOB_EXTRACT = "extract"
+# One job per bulk import (its script_id field holds the import ID).
+JOB_IMPORT = "import"
+JOB_SUMMARIZE = "summarize"
+
+
+async def _load_script(job: Dict[str, Any]):
+    # Jobs carry no content: they always process the script as it is now. Deleted
+    # scripts (and those of deleted projects) are skipped; their reclaim removes
+    # whatever was indexed.
+    if await project_deleted(job["project_id"]):
+        return None
+    return await script_collection.find_one({"_id": ObjectId(job["script_id"]), **LIVE})
+
+async def run_embed_job(job: Dict[str, Any]):
+    script = await _load_script(job)
+    if script is None:
+        return
+    await process_and_embed_script(script.get("content", ""), script["project_id"], job["script_id"], script.get("revision", 0))
+
+async def run_extract_job(job: Dict[str, Any]):
+    script = await _load_script(job)
+    if script is None:
+        return
+    await extract_and_store_entities(script.get("content", ""), script["project_id"], job["script_id"], script.get("revision", 0))
+
+async def run_summarize_job(job: Dict[str, Any]):
+    script = await _load_script(job)
+    if script is None:
+        return
+    await summarize_script(script["project_id"], job["script_id"], script.get("title", ""), script.get("content") or "")
+
+async def run_import_job(job: Dict[str, Any]):
+    """
+    Embeds an import's scripts in cross-script rounds of up to IMPORT_EMBED_BATCH_CHUNKS
+    chunks (estimated from content length), then queues their entity extraction (and
+    summaries) in one bulk write per round. Progress is saved after each round, so a retried job resumes
+    where the last attempt stopped. Scripts edited since the import are skipped: the
+    edit queued their own jobs.
+    """
+    import_id = job["script_id"]
+    record = await import_collection.find_one({"_id": ObjectId(import_id)})
+    if record is None or await project_deleted(record["project_id"]):
+        return
+    project_id = record["project_id"]
+    query: Dict[str, Any] = {"import_id": import_id, **LIVE}
+    if record.get("embedded_through"):
+        query["_id"] = {"$gt": record["embedded_through"]}
+
+    cursor = script_collection.find(query, {"content": 1, "created_at": 1, "updated_at": 1}).sort("_id", 1)
+    batch: List[Tuple[str, str]] = []
+    estimated_chunks = 0
+    last_id = None
+
+    async def flush():
+        nonlocal batch, estimated_chunks
+        chunks = await embed_new_scripts(project_id, batch) if batch else 0
+        script_ids = [script_id for script_id, _ in batch]
+        await job_queue.enqueue_new(JOB_EXTRACT, project_id, script_ids)
+        if settings.SUMMARY_TREES:
+            await job_queue.enqueue_new(JOB_SUMMARIZE, project_id, script_ids)
+        await import_collection.update_one(
+            {"_id": ObjectId(import_id)},
+            {"$inc": {"scripts_embedded": len(batch), "chunks_embedded": chunks},
+             "$set": {"embedded_through": last_id, "updated_at": datetime.utcnow()}},
+        )
+        batch, estimated_chunks = [], 0
+
+    async for script in cursor:
+        last_id = script["_id"]
+        if script["updated_at"] != script["created_at"]:
+            continue
+        content = script.get("content") or ""
+        batch.append((str(script["_id"]), content))
+        # The splitter's chunks are at most 1000 characters with 200 of overlap.
+        estimated_chunks += len(content) // 800 + 1
+        if estimated_chunks >= settings.IMPORT_EMBED_BATCH_CHUNKS:
+            await flush()
+    if last_id is not None:
+        await flush()
+
+    await import_collection.update_one(
+        {"_id": ObjectId(import_id)},
+        {"$set": {"status": "done", "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()}},
+    )
+    log_event("import_indexed", project_id=project_id, import_id=import_id)
+
+def register_indexing_jobs():
+    job_queue.register(JOB_EMBED, run_embed_job, settings.JOB_EMBED_CONCURRENCY)
+    job_queue.register(JOB_EXTRACT, run_extract_job, settings.JOB_EXTRACT_CONCURRENCY)
+    job_queue.register(JOB_IMPORT, run_import_job, settings.JOB_IMPORT_CONCURRENCY)
+    job_queue.register(JOB_SUMMARIZE, run_summarize_job, settings.JOB_SUMMARIZE_CONCURRENCY)
+
+async def enqueue_script_indexing(project_id: str, script_id: str):
+    """
+    Queues embedding, entity extraction and summarizing for a script; repeated calls
+    before the jobs run coalesce into a single run on the latest content.
+    """
+    await job_queue.enqueue(JOB_EMBED, project_id, script_id)
+    await job_queue.enqueue(JOB_EXTRACT, project_id, script_id)
+    if settings.SUMMARY_TREES:
+        await job_queue.enqueue(JOB_SUMMARIZE, project_id, script_id)
+
+def indexing_state(statuses: Iterable[str]) -> str:
+    """Summarizes the statuses of a script's (or project's) jobs into one indexing state."""
+    statuses = set(statuses)
+    if not statuses:
+        return "not_indexed"
+    if "failed" in statuses:
+        return "failed"
+    if "running" in statuses:
+        return "processing"
+    if "queued" in statuses:
+        return "queued"
+    return "indexed"
+
+async def get_indexing_status(script_id: str) -> Dict[str, Any]:
+    jobs = await job_queue.jobs_for_script(script_id)
+    return {
+        "script_id": script_id,
+        "state": indexing_state(job["status"] for job in jobs),
+        "jobs": [
+            {
+                "type": job["type"],
+                "status": job["status"],
+                "attempts": job.get("attempts", 0),
+                "last_error": job.get("last_error"),
+                "updated_at": job["updated_at"],
+            }
+            for job in sorted(jobs, key=lambda job: job["type"])
+        ],
+    }
+
+async def get_import_status(project_id: str, import_id: str) -> Optional[Dict[str, Any]]:
+    """The import record, marked failed if its indexing job has given up."""
+    record = await import_collection.find_one({"_id": ObjectId(import_id), "project_id": project_id})
+    if record is None or record["status"] != "indexing":
+        return record
+    job = next(iter(await job_queue.jobs_for_script(import_id)), None)
+    if job is not None and job["status"] == "failed":
+        record.update(status="failed", last_error=job.get("last_error"))
+    elif job is not None:
+        record.setdefault("last_error", job.get("last_error"))
+    return record
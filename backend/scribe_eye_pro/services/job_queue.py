@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from config import settings
+from database import job_collection
+from observability import JOB_QUEUE_DEPTH, JOB_SECONDS, log_event, request_id_var, route_var
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class JobQueue:
+    """
+    Durable job queue stored in MongoDB, with in-process worker pools per job type.
+
+    There is at most one job document per (type, script_id). Enqueueing a job that is
+    already queued just bumps its version, so repeated saves coalesce into one run
+    that reads the script's latest content. Enqueueing a job that is running bumps
+    its version too, and the worker re-queues it when it finishes. Failed jobs retry
+    with exponential backoff. Workers hold a lease that they renew while running, so
+    jobs from a crashed or restarted process are picked up again once it expires.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._handlers: Dict[str, Tuple[JobHandler, int]] = {}
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    def register(self, job_type: str, handler: JobHandler, concurrency: int):
+        self._handlers[job_type] = (handler, concurrency)
+
+    # --- Producer side ---
+
+    async def enqueue(self, job_type: str, project_id: str, script_id: str):
+        now = datetime.utcnow()
+        for _ in range(3):
+            running = await self.collection.update_one(
+                {"type": job_type, "script_id": script_id, "status": "running"},
+                {"$inc": {"version": 1}, "$set": {"project_id": project_id, "updated_at": now}},
+            )
+            if running.matched_count:
+                break
+            try:
+                await self.collection.update_one(
+                    {"type": job_type, "script_id": script_id, "status": {"$ne": "running"}},
+                    {
+                        "$inc": {"version": 1},
+                        "$set": {
+                            "project_id": project_id,
+                            "status": "queued",
+                            "attempts": 0,
+                            "run_after": now,
+                            "last_error": None,
+                            "updated_at": now,
+                        },
+                        "$setOnInsert": {"created_at": now},
+                    },
+                    upsert=True,
+                )
+                break
+            except DuplicateKeyError:
+                # The job was claimed between the two updates; bump the running job instead.
+                continue
+        if job_type in self._wakeups:
+            self._wakeups[job_type].set()
+
+    async def enqueue_new(self, job_type: str, project_id: str, script_ids: List[str]):
+        """
+        Queues one job per script in a single bulk write. Only for scripts that have
+        no running job of this type (e.g. just created): a running job is left as is
+        rather than re-queued, so use enqueue() when that matters.
+        """
+        if not script_ids:
+            return
+        now = datetime.utcnow()
+        try:
+            await self.collection.bulk_write([
+                UpdateOne(
+                    {"type": job_type, "script_id": script_id, "status": {"$ne": "running"}},
+                    {
+                        "$inc": {"version": 1},
+                        "$set": {
+                            "project_id": project_id,
+                            "status": "queued",
+                            "attempts": 0,
+                            "run_after": now,
+                            "last_error": None,
+                            "updated_at": now,
+                        },
+                        "$setOnInsert": {"created_at": now},
+                    },
+                    upsert=True,
+                )
+                for script_id in script_ids
+            ], ordered=False)
+        except BulkWriteError as e:
+            # Scripts whose job is already running keep it; anything else is a real failure.
+            if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+        if job_type in self._wakeups:
+            self._wakeups[job_type].set()
+
+    async def jobs_for_script(self, script_id: str) -> List[Dict[str, Any]]:
+        return await self.collection.find({"script_id": script_id}).to_list(length=None)
+
+    async def delete_for(self, query: Dict[str, Any]):
+        await self.collection.delete_many(query)
+
+    async def sample_depth(self):
+        """Refreshes the queue-depth gauge from the jobs collection (called on each metrics scrape)."""
+        counts = await self.collection.aggregate([
+            {"$group": {"_id": {"type": "$type", "status": "$status"}, "count": {"$sum": 1}}},
+        ]).to_list(length=None)
+        JOB_QUEUE_DEPTH.clear()
+        for job_type in self._handlers:
+            for status in ("queued", "running", "failed"):
+                JOB_QUEUE_DEPTH.labels(job_type, status).set(0)
+        for entry in counts:
+            JOB_QUEUE_DEPTH.labels(entry["_id"]["type"], entry["_id"]["status"]).set(entry["count"])
+
+    # --- Worker side ---
+
+    async def _claim(self, job_type: str) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {
+                "type": job_type,
+                "$or": [
+                    {"status": "queued", "run_after": {"$lte": now}},
+                    {"status": "running", "lease_until": {"$lt": now}},
+                ],
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "lease_until": now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_after", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _heartbeat(self, job: Dict[str, Any]):
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+            await self.collection.update_one(
+                {"_id": job["_id"], "status": "running"},
+                {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS)}},
+            )
+
+    async def _requeue_if_superseded(self, job: Dict[str, Any]) -> bool:
+        """Re-queues a job whose version moved on while it ran; returns True if it did."""
+        now = datetime.utcnow()
+        result = await self.collection.update_one(
+            {"_id": job["_id"], "status": "running", "version": {"$ne": job["version"]}},
+            {"$set": {"status": "queued", "attempts": 0, "run_after": now, "updated_at": now},
+             "$unset": {"lease_until": ""}},
+        )
+        return result.modified_count == 1
+
+    async def _complete(self, job: Dict[str, Any]):
+        now = datetime.utcnow()
+        result = await self.collection.update_one(
+            {"_id": job["_id"], "status": "running", "version": job["version"]},
+            {"$set": {"status": "done", "attempts": 0, "last_error": None, "finished_at": now, "updated_at": now},
+             "$unset": {"lease_until": ""}},
+        )
+        if result.matched_count == 0:
+            await self._requeue_if_superseded(job)
+
+    async def _fail(self, job: Dict[str, Any], error: Exception):
+        if await self._requeue_if_superseded(job):
+            return
+        now = datetime.utcnow()
+        if job["attempts"] >= settings.JOB_MAX_ATTEMPTS:
+            update = {"status": "failed", "last_error": str(error), "updated_at": now}
+        else:
+            delay = settings.JOB_RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1)
+            update = {
+                "status": "queued",
+                "run_after": now + timedelta(seconds=delay),
+                "last_error": str(error),
+                "updated_at": now,
+            }
+        await self.collection.update_one(
+            {"_id": job["_id"], "status": "running", "version": job["version"]},
+            {"$set": update, "$unset": {"lease_until": ""}},
+        )
+
+    async def _worker(self, job_type: str):
+        handler, _ = self._handlers[job_type]
+        wakeup = self._wakeups[job_type]
+        # Each worker is its own task, so this only labels this worker's logs and Mongo timings.
+        route_var.set(f"job:{job_type}")
+        while not self._stopping:
+            try:
+                job = await self._claim(job_type)
+            except Exception as e:
+                log_event("job_claim_failed", logging.ERROR, job_type=job_type, error=str(e))
+                await asyncio.sleep(settings.JOB_POLL_SECONDS)
+                continue
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=settings.JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                wakeup.clear()
+                continue
+
+            request_id_var.set(f"job-{job['_id']}")
+            heartbeat = asyncio.create_task(self._heartbeat(job))
+            started = time.perf_counter()
+            try:
+                await handler(job)
+            except asyncio.CancelledError:
+                # Shutting down: hand the job straight back instead of waiting for its lease to expire.
+                await self.collection.update_one(
+                    {"_id": job["_id"], "status": "running"},
+                    {"$set": {"status": "queued", "run_after": datetime.utcnow()}, "$unset": {"lease_until": ""}},
+                )
+                raise
+            except Exception as e:
+                JOB_SECONDS.labels(job_type, "failed").observe(time.perf_counter() - started)
+                log_event("job_failed", logging.WARNING, job_type=job_type, script_id=job["script_id"],
+                          attempt=job["attempts"], error=str(e))
+                await self._fail(job, e)
+            else:
+                JOB_SECONDS.labels(job_type, "succeeded").observe(time.perf_counter() - started)
+                await self._complete(job)
+            finally:
+                heartbeat.cancel()
+                request_id_var.set(None)
+
+    async def start(self):
+        self._stopping = False
+        for job_type, (_, concurrency) in self._handlers.items():
+            self._wakeups[job_type] = asyncio.Event()
+            for _ in range(concurrency):
+                self._tasks.append(asyncio.create_task(self._worker(job_type)))
+        log_event("job_workers_started", workers={t: c for t, (_, c) in self._handlers.items()})
+
+    async def stop(self):
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+job_queue = JobQueue(job_collection)
@@ -1,16 +1,34 @@
-from typing import List, Dict, Any
-from langchain_google_genai import ChatGoogleGenerativeAI
+import asyncio
+import hashlib
+from typing import List, Dict, Any, AsyncIterator, Callable, Optional, Set, Tuple
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.pydantic_v1 import BaseModel, Field
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains.retrieval_qa.base import RetrievalQA
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain.chains.question_answering.stuff_prompt import PROMPT_SELECTOR
+from langchain_core.documents import Document
 from datetime import datetime
-from pinecone.exceptions import NotFoundException
+from pymongo import UpdateOne
 
 from config import settings
-from database import entity_collection
-from vector_store import vector_store_instance
+from database import script_collection, entity_collection, chunk_manifest_collection, extraction_cache_collection
+from vector_store import vector_store, embeddings, aadd_texts_batched, adelete_vectors, alist_vector_ids
+from providers import Provider
+from llm_gateway import BACKGROUND, CHAT_MODEL, INTERACTIVE, estimate_tokens, gateway
+from services.answer_cache import answer_cache
+from services.lexical_index import ProjectLexicalIndex, lexical_index, reciprocal_rank_fusion
+from services.context_assembly import assemble_context
+from services.summaries import is_broad_question, summary_context
+from services.entity_registry import normalize_entity_name, sync_script_entities
+from services.entity_graph import update_script_graph
+from services.legacy_vectors import delete_legacy_vectors
+from services.revisions import changed_since, resplit
+from services.tombstones import LIVE, exclude_scripts, tombstoned_scripts
+from observability import (
+    EXTRACTION_CHUNKS, EXTRACTION_SECONDS, QA_ANSWERS, QA_STAGE_SECONDS, VECTOR_OPERATION_SECONDS,
+    LLMMetricsCallback, log_event, timed,
+)
 
 # --- 1. Entity Extraction ---
 
@@ -20,14 +38,6 @@ class ExtractedEntities(BaseModel):
     locations: List[Dict[str, Any]] = Field(description="List of locations, with name and description")
     events: List[Dict[str, Any]] = Field(description="List of key events, with name and description")
 
-# Setup for entity extraction using Gemini
-# **FIX APPLIED HERE**: Switched to a more stable model name
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    google_api_key=settings.GEMINI_API_KEY,
-    temperature=0,
-    convert_system_message_to_human=True
-)
 parser = JsonOutputParser(pydantic_object=ExtractedEntities)
 prompt_template = """
 You are an expert in literary analysis. Analyze the following script content and extract the key entities.
@@ -43,114 +53,621 @@ prompt = PromptTemplate(
     input_variables=["script_content"],
     partial_variables={"format_instructions": parser.get_format_instructions()}
 )
-extraction_chain = prompt | llm | parser
 
+def build_extraction_chain():
+    """
+    Creates the entity extraction chain on Gemini.
+    """
+    # Imported here: the Google client libraries are a large share of import time.
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    # **FIX APPLIED HERE**: Switched to a more stable model name
+    llm = ChatGoogleGenerativeAI(
+        model=CHAT_MODEL,
+        google_api_key=settings.GEMINI_API_KEY,
+        temperature=0,
+        convert_system_message_to_human=True,
+        # The gateway retries 429s itself, with a backoff shared by every caller.
+        max_retries=1,
+        callbacks=[LLMMetricsCallback("extraction")],
+    )
+    return prompt | llm | parser
+
+extraction_chain = Provider("extraction_llm", build_extraction_chain)
+
+
+ENTITY_TYPES = {"characters": "character", "locations": "location", "events": "event"}
+
+# Bump whenever the prompt, parser or model changes so cached chunk results are not reused.
+EXTRACTION_CACHE_VERSION = "gemini-2.5-flash:v1"
+# Output allowances added to the prompt estimate when budgeting Gemini tokens.
+EXTRACTION_OUTPUT_TOKENS = 1024
+ANSWER_OUTPUT_TOKENS = 512
+
+extraction_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=settings.EXTRACTION_CHUNK_SIZE,
+    chunk_overlap=200,
+    length_function=len,
+    add_start_index=True,
+)
+# Shared across all scripts so a burst of saves cannot flood Gemini with extraction calls.
+extraction_semaphore = asyncio.Semaphore(settings.EXTRACTION_CONCURRENCY)
+
+def extraction_cache_key(chunk_text: str) -> str:
+    return hashlib.sha256(f"{EXTRACTION_CACHE_VERSION}\n{chunk_text}".encode("utf-8")).hexdigest()
 
-async def extract_and_store_entities(script_content: str, project_id: str, script_id: str):
+def split_for_extraction(script_content: str, offset: int = 0) -> List[Dict[str, Any]]:
     """
-    Analyzes script content, extracts entities, and stores them in MongoDB.
+    Splits script content into extraction chunks, each with its cache key as ID and
+    its character offsets (shifted by `offset`).
     """
-    if not script_content.strip():
+    chunks = []
+    for doc in extraction_splitter.create_documents([script_content]):
+        start = doc.metadata["start_index"] + offset
+        chunks.append({
+            "id": extraction_cache_key(doc.page_content),
+            "text": doc.page_content,
+            "start": start,
+            "end": start + len(doc.page_content),
+        })
+    return chunks
+
+async def cached_extractions(cache_keys: List[str]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+    """The cached results among these chunk keys, fetched (and marked used) in one round trip each."""
+    if not cache_keys:
+        return {}
+    docs = await extraction_cache_collection.find(
+        {"_id": {"$in": cache_keys}}, {"result": 1}
+    ).to_list(length=None)
+    if docs:
+        await extraction_cache_collection.update_many(
+            {"_id": {"$in": [doc["_id"] for doc in docs]}}, {"$set": {"used_at": datetime.utcnow()}}
+        )
+    return {doc["_id"]: doc["result"] for doc in docs}
+
+async def extract_chunk_entities(chunk_text: str, cache_key: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Extracts entities from one chunk and caches the result. Callers look the chunk up
+    in the cache first (see cached_extractions).
+    """
+    cache_key = cache_key or extraction_cache_key(chunk_text)
+    EXTRACTION_CHUNKS.labels("extracted").inc()
+    chain = await extraction_chain.aget()
+    async with extraction_semaphore:
+        # The same chunk in flight for another script (or another save) is extracted once.
+        extracted_data = await gateway.call(
+            CHAT_MODEL, lambda: chain.ainvoke({"script_content": chunk_text}),
+            tokens=estimate_tokens(prompt_template, chunk_text) + EXTRACTION_OUTPUT_TOKENS,
+            priority=BACKGROUND, key=("extract", cache_key),
+        )
+
+    result = {
+        entity_type: [item for item in (extracted_data or {}).get(entity_type) or [] if isinstance(item, dict)]
+        for entity_type in ENTITY_TYPES
+    }
+    await extraction_cache_collection.update_one(
+        {"_id": cache_key}, {"$set": {"result": result, "used_at": datetime.utcnow()}}, upsert=True
+    )
+    return result
+
+def _merge_attribute(attributes: Dict[str, Any], key: str, value: Any):
+    if key not in attributes:
+        attributes[key] = value
         return
+    existing = attributes[key]
+    values = existing if isinstance(existing, list) else [existing]
+    for new_value in value if isinstance(value, list) else [value]:
+        if new_value not in values:
+            values = values + [new_value]
+    attributes[key] = values if len(values) > 1 else values[0]
+
+def merge_extractions(results: List[Dict[str, List[Dict[str, Any]]]]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Merges per-chunk extractions, deduplicating entities of each type by normalized
+    name. Distinct descriptions are concatenated and conflicting attributes become lists.
+    """
+    merged: Dict[str, Dict[str, Dict[str, Any]]] = {entity_type: {} for entity_type in ENTITY_TYPES}
+    for result in results:
+        for entity_type in ENTITY_TYPES:
+            for item in result.get(entity_type, []):
+                name = item.get("name")
+                if not isinstance(name, str) or not name.strip():
+                    continue
+                key = normalize_entity_name(name)
+                entry = merged[entity_type].setdefault(
+                    key, {"name": name.strip(), "descriptions": [], "attributes": {}}
+                )
+                description = item.get("description")
+                if isinstance(description, str) and description.strip() and description.strip() not in entry["descriptions"]:
+                    entry["descriptions"].append(description.strip())
+                attributes = item.get("attributes")
+                if isinstance(attributes, dict):
+                    for attr_key, attr_value in attributes.items():
+                        _merge_attribute(entry["attributes"], attr_key, attr_value)
+
+    return {
+        entity_type: [
+            {"name": entry["name"], "description": " ".join(entry["descriptions"]), "attributes": entry["attributes"]}
+            for entry in entries.values()
+        ]
+        for entity_type, entries in merged.items()
+    }
+
+async def extract_and_store_entities(script_content: str, project_id: str, script_id: str, revision: Optional[int] = None):
+    """
+    Extracts entities chunk by chunk (concurrently, with cached results for unchanged
+    chunks), merges them, replaces the script's entities in MongoDB, and updates the
+    project's canonical entity registry and entity graph.
+
+    With the script's `revision`, only the text changed since the last extraction is
+    split again (see current_chunks).
+    """
+    timings = {}
+    with timed(EXTRACTION_SECONDS, timings):
+        manifest = await chunk_manifest_collection.find_one({"script_id": script_id})
+        chunks = await current_chunks(
+            script_id, script_content, revision, (manifest or {}).get("extraction"),
+            split_for_extraction, settings.EXTRACTION_CHUNK_SIZE,
+        )
+        cached = await cached_extractions(sorted({chunk["id"] for chunk in chunks}))
+        EXTRACTION_CHUNKS.labels("cached").inc(sum(1 for chunk in chunks if chunk["id"] in cached))
+        results = await asyncio.gather(*(
+            _cached_result(cached[chunk["id"]]) if chunk["id"] in cached
+            else extract_chunk_entities(chunk["text"], chunk["id"])
+            for chunk in chunks
+        ))
+        extracted_data = merge_extractions(results)
         
-    extracted_data = await extraction_chain.ainvoke({"script_content": script_content})
-    
-    entities_to_insert = []
-    
-    for entity_type, entity_list in extracted_data.items():
-        singular_type = entity_type[:-1]
-        for item in entity_list:
-            if item.get("name"):
+        entities_to_insert = []
+        
+        for entity_type, entity_list in extracted_data.items():
+            for item in entity_list:
                 entity_doc = {
                     "project_id": project_id,
                     "script_id": script_id,
-                    "type": singular_type,
-                    "name": item.get("name"),
-                    "description": item.get("description", ""),
-                    "attributes": item.get("attributes", {}),
+                    "type": ENTITY_TYPES[entity_type],
+                    "name": item["name"],
+                    "description": item["description"],
+                    "attributes": item["attributes"],
                     "created_at": datetime.utcnow()
                 }
                 entities_to_insert.append(entity_doc)
-    
-    if entities_to_insert:
+        
         await entity_collection.delete_many({"script_id": script_id})
-        await entity_collection.insert_many(entities_to_insert)
-    print(f"Stored {len(entities_to_insert)} entities for script {script_id}")
+        if entities_to_insert:
+            await entity_collection.insert_many(entities_to_insert)
+        await sync_script_entities(project_id, script_id, entities_to_insert)
+        # The graph is built on the embedding chunks, so mentions line up with retrieval.
+        await update_script_graph(project_id, script_id, await current_chunks(
+            script_id, script_content, revision, _embedding_state(manifest),
+            lambda text, offset: split_script(text, script_id, offset), EMBEDDING_CHUNK_SIZE,
+        ))
+        if revision is not None:
+            await chunk_manifest_collection.update_one(
+                {"script_id": script_id},
+                {"$set": {
+                    "project_id": project_id,
+                    "extraction": {
+                        "revision": revision,
+                        "length": len(script_content),
+                        "chunks": [{"id": c["id"], "start": c["start"], "end": c["end"]} for c in chunks],
+                    },
+                }},
+                upsert=True,
+            )
+    log_event("entities_extracted", project_id=project_id, script_id=script_id,
+              entities=len(entities_to_insert), chunks=len(chunks), duration_ms=timings["total"])
 
-# --- 2. Embedding and Vector Storage ---
+async def _cached_result(result: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+    return result
 
-def process_and_embed_script(script_content: str, project_id: str, script_id: str):
+async def current_chunks(
+    script_id: str,
+    script_content: str,
+    revision: Optional[int],
+    previous: Optional[Dict[str, Any]],
+    split: Callable[[str, int], List[Dict[str, Any]]],
+    chunk_size: int,
+) -> List[Dict[str, Any]]:
     """
-    Splits script into chunks, creates embeddings, and upserts them to Pinecone.
+    The content's chunks as `split(text, offset)` makes them. When `previous` (the
+    `revision`, `length` and `chunks` a stage last processed) is known and the revision
+    history covers the saves since, only the changed ranges are split again; the
+    result is the same either way.
     """
     if not script_content.strip():
-        try:
-            vector_store_instance.delete(filter={"script_id": script_id})
-            print(f"Cleared vectors for empty script {script_id}")
-        except NotFoundException:
-            print(f"No vectors to clear for empty script {script_id}")
-        return
+        return []
+    if previous and revision is not None and previous.get("revision") is not None and "length" in previous:
+        changed = await changed_since(script_id, previous["revision"], revision)
+        if changed is not None:
+            spans = resplit(script_content, previous["chunks"], previous["length"], changed, split, chunk_size)
+            return [{**span, "text": script_content[span["start"]:span["end"]]} for span in spans]
+    return split(script_content, 0)
+
+# --- 2. Embedding and Vector Storage ---
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len
+EMBEDDING_CHUNK_SIZE = 1000
+
+text_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=EMBEDDING_CHUNK_SIZE,
+    chunk_overlap=200,
+    length_function=len,
+    add_start_index=True,
+)
+
+def chunk_id(script_id: str, chunk_text: str) -> str:
+    """
+    Content-addressed vector ID: unchanged chunk text always maps to the same ID.
+    """
+    digest = hashlib.sha256(f"{script_id}\n{chunk_text}".encode("utf-8")).hexdigest()
+    return f"{script_id}:{digest[:32]}"
+
+def split_script(script_content: str, script_id: str, offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    Splits script content into ordered chunks with their IDs and character offsets
+    (shifted by `offset` when the content is a span of a longer text).
+    """
+    chunks = []
+    for doc in text_splitter.create_documents([script_content]):
+        start = doc.metadata["start_index"] + offset
+        chunks.append({
+            "id": chunk_id(script_id, doc.page_content),
+            "text": doc.page_content,
+            "start": start,
+            "end": start + len(doc.page_content),
+        })
+    return chunks
+
+def _embedding_state(manifest: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The revision, length and chunks the last embedding stored, if it stored any."""
+    if manifest is None or "chunks" not in manifest:
+        return None
+    return manifest
+
+async def _stored_chunk_ids(script_id: str) -> Set[str]:
+    ids: Set[str] = set()
+    token = None
+    while True:
+        page, token = await alist_vector_ids(
+            prefix=f"{script_id}:", pagination_token=token, limit=settings.VECTOR_UPSERT_BATCH_SIZE
+        )
+        ids.update(page)
+        if token is None:
+            return ids
+
+async def process_and_embed_script(script_content: str, project_id: str, script_id: str, revision: Optional[int] = None):
+    """
+    Diffs the script's chunks against its stored manifest, embeds and upserts only
+    new chunks, and deletes only the vectors of chunks that disappeared. With the
+    script's `revision`, only the text changed since the manifest's revision is split
+    again.
+    """
+    manifest = _embedding_state(await chunk_manifest_collection.find_one({"script_id": script_id}))
+    chunks = await current_chunks(
+        script_id, script_content, revision, manifest,
+        lambda text, offset: split_script(text, script_id, offset), EMBEDDING_CHUNK_SIZE,
     )
-    chunks = text_splitter.split_text(script_content)
-    
-    metadata = [{"project_id": project_id, "script_id": script_id} for _ in chunks]
-    
-    try:
-        vector_store_instance.delete(filter={"script_id": script_id})
-        print(f"Cleared old vectors for script {script_id}")
-    except NotFoundException:
-        print(f"No old vectors to clear for script {script_id} (this is normal for a new script).")
-    
-    vector_store_instance.add_texts(texts=chunks, metadatas=metadata)
-    print(f"Upserted {len(chunks)} vectors for script {script_id}")
+
+    if manifest is None:
+        # No manifest: the script was never embedded, or an embedding stopped before
+        # writing one, or it was embedded before chunk IDs existed. Chunk IDs start
+        # with the script's ID, so list what is stored; serverless Pinecone cannot
+        # delete by metadata filter. Legacy random-ID vectors are removed once the
+        # manifest is written, below.
+        stored_ids = await _stored_chunk_ids(script_id)
+    else:
+        stored_ids = {chunk["id"] for chunk in manifest["chunks"]}
+
+    # Identical chunks within a script share an ID, so they are embedded once.
+    current_texts = {}
+    for chunk in chunks:
+        current_texts.setdefault(chunk["id"], chunk["text"])
+
+    new_ids = [cid for cid in current_texts if cid not in stored_ids]
+    stale_ids = [cid for cid in stored_ids if cid not in current_texts]
+
+    # Upsert before deleting so the script never drops out of retrieval mid-save.
+    # Upserts are idempotent by ID, so a failure before the manifest is written is safe to retry.
+    if new_ids:
+        await aadd_texts_batched(
+            texts=[current_texts[cid] for cid in new_ids],
+            metadatas=[{"project_id": project_id, "script_id": script_id} for _ in new_ids],
+            ids=new_ids,
+        )
+    if stale_ids:
+        await adelete_vectors(ids=stale_ids)
+    lexical_index.update_script(project_id, script_id, current_texts)
+
+    if chunks:
+        await chunk_manifest_collection.update_one(
+            {"script_id": script_id},
+            {"$set": {
+                "project_id": project_id,
+                "revision": revision,
+                "length": len(script_content),
+                "chunks": [{"id": c["id"], "start": c["start"], "end": c["end"]} for c in chunks],
+                "updated_at": datetime.utcnow(),
+            }},
+            upsert=True,
+        )
+    else:
+        await chunk_manifest_collection.delete_one({"script_id": script_id})
+    if manifest is None:
+        # After the manifest, so the legacy vector scan deletes any it records later.
+        await delete_legacy_vectors({"script_id": script_id})
+
+    if new_ids or stale_ids:
+        await answer_cache.invalidate(project_id)
+    log_event("script_embedded", project_id=project_id, script_id=script_id,
+              chunks=len(current_texts), upserted=len(new_ids), deleted=len(stale_ids))
+
+async def embed_new_scripts(project_id: str, scripts: List[Tuple[str, str]]) -> int:
+    """
+    Embeds a batch of newly imported `(script_id, content)` pairs together, so their
+    chunks fill provider-sized batches across script boundaries instead of one short
+    batch per script. Returns the number of chunks embedded.
+
+    Unlike process_and_embed_script there is nothing to diff: the scripts have no
+    stored vectors. A manifest that already exists (the script was edited and its own
+    embed job got there first) is left alone.
+    """
+    texts, metadatas, ids, manifests = [], [], [], []
+    script_chunks: Dict[str, Dict[str, str]] = {}
+    now = datetime.utcnow()
+    for script_id, content in scripts:
+        chunks = split_script(content, script_id) if content.strip() else []
+        current_texts = script_chunks.setdefault(script_id, {})
+        for chunk in chunks:
+            if chunk["id"] not in current_texts:
+                current_texts[chunk["id"]] = chunk["text"]
+                texts.append(chunk["text"])
+                metadatas.append({"project_id": project_id, "script_id": script_id})
+                ids.append(chunk["id"])
+        if chunks:
+            manifests.append(UpdateOne(
+                {"script_id": script_id},
+                {"$setOnInsert": {
+                    "project_id": project_id,
+                    "chunks": [{"id": c["id"], "start": c["start"], "end": c["end"]} for c in chunks],
+                    "updated_at": now,
+                }},
+                upsert=True,
+            ))
+
+    if ids:
+        await aadd_texts_batched(texts=texts, metadatas=metadatas, ids=ids)
+    for script_id, current_texts in script_chunks.items():
+        lexical_index.update_script(project_id, script_id, current_texts)
+    if manifests:
+        await chunk_manifest_collection.bulk_write(manifests, ordered=False)
+    await answer_cache.invalidate(project_id)
+    log_event("scripts_embedded", project_id=project_id, scripts=len(scripts), chunks=len(ids))
+    return len(ids)
+
+def update_lexical_index(project_id: str, script_id: str, script_content: str):
+    """
+    Brings a saved script's chunks into the project's BM25 index right away, so this
+    process searches new text even while embedding runs in a separate worker.
+    """
+    if not lexical_index.is_loaded(project_id):
+        # Nothing to update; just mark any build in progress as stale.
+        lexical_index.update_script(project_id, script_id, {})
+        return
+    chunks = split_script(script_content, script_id) if script_content.strip() else []
+    lexical_index.update_script(project_id, script_id, {chunk["id"]: chunk["text"] for chunk in chunks})
+
+async def _build_lexical_index(project_id: str) -> ProjectLexicalIndex:
+    while True:
+        version = lexical_index.version(project_id)
+        index = ProjectLexicalIndex()
+        async for script in script_collection.find({"project_id": project_id, **LIVE}, {"content": 1}):
+            content = script.get("content") or ""
+            chunks = split_script(content, str(script["_id"])) if content.strip() else []
+            index.replace_script(str(script["_id"]), {chunk["id"]: chunk["text"] for chunk in chunks})
+        if lexical_index.install(project_id, index, version):
+            return index
+        # A script changed while we were reading; rebuild from the new content.
+
+_lexical_builds: Dict[str, asyncio.Task] = {}
+
+async def get_lexical_index(project_id: str) -> ProjectLexicalIndex:
+    """
+    Returns the project's BM25 index, building it from the scripts' content on first
+    use. Concurrent callers share a single build.
+    """
+    index = lexical_index.get(project_id)
+    if index is not None:
+        return index
+    build = _lexical_builds.get(project_id)
+    if build is None:
+        build = asyncio.create_task(_build_lexical_index(project_id))
+        _lexical_builds[project_id] = build
+        build.add_done_callback(lambda _: _lexical_builds.pop(project_id, None))
+    return await asyncio.shield(build)
 
 # --- 3. Question Answering ---
 
-def get_qa_chain():
+QA_TOP_K = 4
+
+def _document_key(doc: Document) -> str:
+    # Pinecone results may not carry IDs, but chunk IDs are content-addressed.
+    return doc.id or chunk_id(doc.metadata.get("script_id", ""), doc.page_content)
+
+async def retrieve_chunks(
+    project_id: str,
+    question: str,
+    question_embedding: List[float],
+    hybrid: Optional[bool] = None,
+    exclude: Optional[List[str]] = None,
+) -> List[Document]:
+    """
+    Returns the QA_TOP_K chunks most relevant to the question, leaving out the scripts
+    in `exclude` (deleted ones awaiting reclaim). In hybrid mode, vector and BM25
+    candidates are fused by reciprocal rank, so exact matches on names and invented
+    terms surface without widening the prompt.
+    """
+    hybrid = settings.HYBRID_SEARCH if hybrid is None else hybrid
+    store = await vector_store.aget()
+    with timed(VECTOR_OPERATION_SECONDS, operation="query", backend=settings.VECTOR_BACKEND):
+        vector_documents = await store.asimilarity_search_by_vector(
+            question_embedding,
+            k=settings.HYBRID_CANDIDATES if hybrid else QA_TOP_K,
+            filter=exclude_scripts({"project_id": project_id}, exclude or []),
+        )
+    if not hybrid:
+        return vector_documents
+
+    with timed(QA_STAGE_SECONDS, stage="lexical_search"):
+        index = await get_lexical_index(project_id)
+        lexical_hits = index.search(question, settings.HYBRID_CANDIDATES)
+    if exclude:
+        # Another process may have built this index before the scripts were deleted.
+        lexical_hits = [(key, score) for key, score in lexical_hits if index.script_ids[key] not in exclude]
+
+    documents = {_document_key(doc): doc for doc in vector_documents}
+    for key, _ in lexical_hits:
+        documents.setdefault(key, Document(
+            id=key,
+            page_content=index.texts[key],
+            metadata={"project_id": project_id, "script_id": index.script_ids[key]},
+        ))
+    fused = reciprocal_rank_fusion([[_document_key(doc) for doc in vector_documents], [key for key, _ in lexical_hits]])
+    return [documents[key] for key in fused[:QA_TOP_K]]
+
+def build_qa_chain():
     """
-    Creates and returns a RetrievalQA chain for question-answering.
+    Creates the "stuff" answer chain: retrieved chunks are joined into the prompt context.
     """
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
     # **FIX APPLIED HERE**: Switched to a more stable model name
     qa_llm = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash",
+        model=CHAT_MODEL,
         google_api_key=settings.GEMINI_API_KEY,
         temperature=0.3,
-        convert_system_message_to_human=True
-    )
-    
-    retriever = vector_store_instance.as_retriever(
-        search_type="similarity",
-        search_kwargs={'k': 4}
+        convert_system_message_to_human=True,
+        max_retries=1,
+        callbacks=[LLMMetricsCallback("qa")],
     )
-    
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=qa_llm,
-        chain_type="stuff",
-        retriever=retriever,
-        return_source_documents=True,
-    )
-    return qa_chain
+    return create_stuff_documents_chain(qa_llm, PROMPT_SELECTOR.get_prompt(qa_llm))
+
+# Shared answer chain, built on first use or by the startup warm-up. Retrieved documents
+# are passed in per call, so concurrent questions never share retriever state.
+qa_chain = Provider("qa_llm", build_qa_chain)
+
+async def _cached_or_retrieve(project_id: str, question: str, timings: Dict[str, float]):
+    """
+    Returns `(cached_response, None)` on a cache hit, otherwise `(None, (question_embedding,
+    cache_generation, source_documents))` with everything needed to generate an answer.
+    The source documents are the assembled context passages, not the raw chunks; broad
+    questions about a whole script or project get summaries from the summary trees instead,
+    when there are any. Stage durations are recorded in `timings`.
+    """
+    with timed(QA_STAGE_SECONDS, timings, stage="cache_exact"):
+        generation = await answer_cache.generation(project_id)
+        cached = answer_cache.lookup_exact(project_id, question)
+    if cached is not None:
+        return {**cached, "question": question, "cached": True}, None
+
+    embedder = await embeddings.aget()
+    with timed(QA_STAGE_SECONDS, timings, stage="embed_query"):
+        question_embedding = await embedder.aembed_query(question)
+    with timed(QA_STAGE_SECONDS, timings, stage="cache_similar"):
+        cached = answer_cache.lookup_similar(project_id, question_embedding)
+    if cached is not None:
+        return {**cached, "question": question, "cached": True}, None
+
+    hidden = await tombstoned_scripts(project_id) or []
+    if settings.SUMMARY_TREES and is_broad_question(question):
+        with timed(QA_STAGE_SECONDS, timings, stage="summaries"):
+            source_documents = await summary_context(project_id, question, exclude=hidden)
+        if source_documents:
+            return None, (question_embedding, generation, source_documents)
+
+    with timed(QA_STAGE_SECONDS, timings, stage="retrieve"):
+        chunks = await retrieve_chunks(project_id, question, question_embedding, exclude=hidden)
+    with timed(QA_STAGE_SECONDS, timings, stage="assemble_context"):
+        source_documents = assemble_context(chunks, settings.QA_CONTEXT_TOKEN_BUDGET or None)
+    return None, (question_embedding, generation, source_documents)
+
+def _answer_call(question: str, source_documents: List[Document]) -> Tuple[int, str]:
+    """Token estimate and single-flight key for generating an answer from this context."""
+    context = "\n\n".join(doc.page_content for doc in source_documents)
+    key = hashlib.sha256(f"{question}\0{context}".encode("utf-8")).hexdigest()
+    return estimate_tokens(question, context) + ANSWER_OUTPUT_TOKENS, key
+
+def _record_answer(project_id: str, timings: Dict[str, float], cached: bool):
+    QA_ANSWERS.labels(str(cached).lower()).inc()
+    log_event("question_answered", project_id=project_id, cached=cached, stages_ms=timings)
 
 async def answer_question(project_id: str, question: str):
     """
-    Answers a question based on the content of a specific project.
+    Answers a question based on the content of a specific project, serving
+    repeated and near-duplicate questions from the project's answer cache.
     """
-    qa_chain = get_qa_chain()
-    
-    qa_chain.retriever.search_kwargs['filter'] = {'project_id': project_id}
-    
-    result = await qa_chain.ainvoke({"query": question})
-    
-    source_chunks = [doc.page_content for doc in result.get("source_documents", [])]
+    timings = {}
+    cached, retrieval = await _cached_or_retrieve(project_id, question, timings)
+    if cached is not None:
+        _record_answer(project_id, timings, cached=True)
+        return cached
+    question_embedding, generation, source_documents = retrieval
+
+    chain = await qa_chain.aget()
+    tokens, key = _answer_call(question, source_documents)
+    with timed(QA_STAGE_SECONDS, timings, stage="generate"):
+        # The same question asked again before the first answer is cached shares its call.
+        answer = await gateway.call(
+            CHAT_MODEL, lambda: chain.ainvoke({"context": source_documents, "question": question}),
+            tokens=tokens, priority=INTERACTIVE, key=("qa", key),
+        )
+
+    source_chunks = [doc.page_content for doc in source_documents]
     
-    return {
+    result = {
         "question": question,
-        "answer": result.get("result", "Could not find an answer."),
-        "source_chunks": source_chunks
+        "answer": answer or "Could not find an answer.",
+        "source_chunks": source_chunks,
+        "cached": False,
     }
+    answer_cache.store(project_id, question, question_embedding, result, generation)
+    _record_answer(project_id, timings, cached=False)
+    return result
+
+async def stream_answer(project_id: str, question: str) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Streams an answer as `(event, data)` pairs: "sources" with the source chunks first,
+    then "token" for each piece of the answer as Gemini generates it, then "done".
+    """
+    timings = {}
+    cached, retrieval = await _cached_or_retrieve(project_id, question, timings)
+    if cached is not None:
+        _record_answer(project_id, timings, cached=True)
+        yield "sources", cached["source_chunks"]
+        yield "token", cached["answer"]
+        yield "done", {"cached": True}
+        return
+    question_embedding, generation, source_documents = retrieval
+
+    source_chunks = [doc.page_content for doc in source_documents]
+    yield "sources", source_chunks
 
+    chain = await qa_chain.aget()
+    tokens = []
+    with timed(QA_STAGE_SECONDS, timings, stage="generate"):
+        async for token in gateway.stream(
+            CHAT_MODEL, lambda: chain.astream({"context": source_documents, "question": question}),
+            tokens=_answer_call(question, source_documents)[0], priority=INTERACTIVE,
+        ):
+            if token:
+                tokens.append(token)
+                yield "token", token
+
+    result = {
+        "question": question,
+        "answer": "".join(tokens) or "Could not find an answer.",
+        "source_chunks": source_chunks,
+        "cached": False,
+    }
+    answer_cache.store(project_id, question, question_embedding, result, generation)
+    _record_answer(project_id, timings, cached=False)
+    yield "done", {"cached": False}
@@ -0,0 +1,117 @@
+from datetime import datetime
+from typing import Any, Dict, List
+
+from bson import ObjectId
+from pymongo import ReplaceOne
+
+from config import settings
+from database import (
+    chunk_manifest_collection, job_collection, legacy_vector_collection, migration_collection, project_collection,
+    script_collection, tombstone_collection,
+)
+from observability import log_event
+from services.job_queue import job_queue
+from services.tombstones import JOB_RECLAIM, LIVE
+from vector_store import adelete_vectors, afetch_vector_metadata, alist_vector_ids
+
+# Vectors written before chunk IDs were content-addressed have random IDs, so neither
+# a chunk manifest nor the `<script_id>:` prefix finds them, and serverless Pinecone
+# cannot delete them by metadata filter. A one-time scan lists every vector ID, reads
+# the metadata of these legacy vectors and records each one's script and project in
+# `legacy_vectors`; deletes of a script's or project's vectors then go through that
+# record. Legacy vectors the scan finds superseded (their script is gone, or has been
+# embedded again since) are deleted on the spot.
+
+JOB_LEGACY_SCAN = "legacy_vector_scan"
+# The scan's single job document; its progress is kept there between attempts.
+LEGACY_SCAN_ID = "legacy_vector_scan"
+
+
+def is_chunk_id(vector_id: str) -> bool:
+    """Whether a vector ID is a content-addressed chunk ID, `<script_id>:<hash>`."""
+    script_id, separator, _ = vector_id.partition(":")
+    return bool(separator) and ObjectId.is_valid(script_id)
+
+async def legacy_scan_done() -> bool:
+    return await migration_collection.find_one({"_id": LEGACY_SCAN_ID}, {"_id": 1}) is not None
+
+async def delete_legacy_vectors(query: Dict[str, Any]) -> bool:
+    """
+    Deletes the recorded legacy vectors matching `query` (on `script_id` or
+    `project_id`). Returns False while the scan is unfinished, as legacy vectors it
+    has not reached yet may still match.
+    """
+    # Read first: once the scan is done, every legacy vector is recorded.
+    done = await legacy_scan_done()
+    while True:
+        docs = await legacy_vector_collection.find(query, {"_id": 1}) \
+            .limit(settings.VECTOR_UPSERT_BATCH_SIZE).to_list(length=None)
+        if not docs:
+            return done
+        ids = [doc["_id"] for doc in docs]
+        await adelete_vectors(ids=ids)
+        await legacy_vector_collection.delete_many({"_id": {"$in": ids}})
+
+async def _live_ids(collection, ids: List[str]) -> set:
+    valid = [ObjectId(value) for value in ids if isinstance(value, str) and ObjectId.is_valid(value)]
+    return {str(doc["_id"]) async for doc in collection.find({"_id": {"$in": valid}, **LIVE}, {"_id": 1})}
+
+async def _record(metadata: Dict[str, Dict[str, Any]]) -> int:
+    """Records a page of legacy vectors and deletes the superseded ones; returns how many were deleted."""
+    docs = [
+        {"_id": vector_id, "project_id": meta.get("project_id"), "script_id": meta.get("script_id")}
+        for vector_id, meta in metadata.items()
+    ]
+    await legacy_vector_collection.bulk_write(
+        [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs], ordered=False
+    )
+    # Recorded before the manifests are read: an embedding that writes its manifest
+    # after this point deletes the record itself (process_and_embed_script).
+    script_ids = sorted({doc["script_id"] for doc in docs if doc["script_id"]})
+    live_projects = await _live_ids(project_collection, sorted({doc["project_id"] for doc in docs if doc["project_id"]}))
+    live_scripts = await _live_ids(script_collection, script_ids)
+    embedded = {
+        doc["script_id"]
+        async for doc in chunk_manifest_collection.find({"script_id": {"$in": script_ids}}, {"script_id": 1})
+    }
+    superseded = [
+        doc["_id"] for doc in docs
+        if doc["project_id"] not in live_projects
+        or (doc["script_id"] and (doc["script_id"] not in live_scripts or doc["script_id"] in embedded))
+    ]
+    for start in range(0, len(superseded), settings.VECTOR_UPSERT_BATCH_SIZE):
+        batch = superseded[start:start + settings.VECTOR_UPSERT_BATCH_SIZE]
+        await adelete_vectors(ids=batch)
+        await legacy_vector_collection.delete_many({"_id": {"$in": batch}})
+    return len(superseded)
+
+async def run_legacy_scan_job(job: Dict[str, Any]):
+    """
+    Pages through every vector ID, recording legacy vectors. When done, re-queues the
+    reclaim of every tombstone, since reclaims keep their tombstone until then.
+    """
+    progress = dict(job.get("legacy_scan") or {"recorded": 0, "deleted": 0})
+    while True:
+        ids, token = await alist_vector_ids(pagination_token=progress.get("token"), limit=settings.RECLAIM_BATCH_SIZE)
+        legacy = [vector_id for vector_id in ids if not is_chunk_id(vector_id)]
+        if legacy:
+            metadata = await afetch_vector_metadata(legacy)
+            progress["recorded"] += len(metadata)
+            progress["deleted"] += await _record(metadata)
+        if token is None:
+            break
+        progress["token"] = token
+        await job_collection.update_one({"_id": job["_id"]}, {"$set": {"legacy_scan": progress}})
+
+    await migration_collection.update_one(
+        {"_id": LEGACY_SCAN_ID}, {"$set": {"finished_at": datetime.utcnow()}}, upsert=True
+    )
+    await job_collection.update_one({"_id": job["_id"]}, {"$unset": {"legacy_scan": ""}})
+    async for tombstone in tombstone_collection.find({}, {"project_id": 1}):
+        await job_queue.enqueue(JOB_RECLAIM, tombstone["project_id"], tombstone["_id"])
+    log_event("legacy_vector_scan_finished", recorded=progress["recorded"], deleted=progress["deleted"])
+
+async def enqueue_legacy_scan():
+    """Queues the scan unless it has already run (called at worker startup)."""
+    if not await legacy_scan_done():
+        await job_queue.enqueue(JOB_LEGACY_SCAN, "", LEGACY_SCAN_ID)
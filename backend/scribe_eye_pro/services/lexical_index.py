@@ -0,0 +1,155 @@
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config import settings
+
+# Standard BM25 parameters: term-frequency saturation and document-length normalization.
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Reciprocal-rank fusion constant; 60 is the usual choice and damps the top ranks' weight.
+RRF_K = 60
+
+
+def tokenize(text: str) -> List[str]:
+    """Case-folded word tokens; no stemming, so invented names and terms match exactly."""
+    return re.findall(r"\w+", unicodedata.normalize("NFKC", text).casefold())
+
+
+class ProjectLexicalIndex:
+    """
+    In-memory BM25 inverted index over one project's chunks, keyed by chunk ID.
+    """
+
+    def __init__(self):
+        self.texts: Dict[str, str] = {}
+        self.script_ids: Dict[str, str] = {}
+        self.lengths: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.script_chunks: Dict[str, Set[str]] = {}
+        self.total_length = 0
+
+    def _add(self, chunk_id: str, script_id: str, text: str):
+        terms = Counter(tokenize(text))
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[chunk_id] = count
+        self.texts[chunk_id] = text
+        self.script_ids[chunk_id] = script_id
+        self.lengths[chunk_id] = sum(terms.values())
+        self.total_length += self.lengths[chunk_id]
+        self.script_chunks.setdefault(script_id, set()).add(chunk_id)
+
+    def _remove(self, chunk_id: str):
+        for term in set(tokenize(self.texts[chunk_id])):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.lengths.pop(chunk_id)
+        del self.texts[chunk_id]
+        script_id = self.script_ids.pop(chunk_id)
+        self.script_chunks[script_id].discard(chunk_id)
+        if not self.script_chunks[script_id]:
+            del self.script_chunks[script_id]
+
+    def replace_script(self, script_id: str, chunks: Dict[str, str]):
+        """Makes `chunks` (chunk ID -> text) the script's chunks, touching only the ones that changed."""
+        current = self.script_chunks.get(script_id, set())
+        for chunk_id in current - chunks.keys():
+            self._remove(chunk_id)
+        for chunk_id, text in chunks.items():
+            if chunk_id not in current:
+                self._add(chunk_id, script_id, text)
+
+    def remove_script(self, script_id: str):
+        self.replace_script(script_id, {})
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Returns up to `k` `(chunk_id, score)` pairs, best first."""
+        if not self.texts:
+            return []
+        count = len(self.texts)
+        average_length = self.total_length / count or 1
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, frequency in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[chunk_id] / average_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+class LexicalIndex:
+    """
+    Per-project BM25 indexes, built on first use and kept for the `max_projects` most
+    recently used projects.
+
+    Every write bumps the project's version, whether or not its index is loaded, so a
+    build that read scripts before a concurrent write is discarded by `install` instead
+    of caching stale chunks.
+    """
+
+    def __init__(self, max_projects: int):
+        self.max_projects = max_projects
+        self._projects: "OrderedDict[str, ProjectLexicalIndex]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def version(self, project_id: str) -> int:
+        return self._versions.get(project_id, 0)
+
+    def get(self, project_id: str) -> Optional[ProjectLexicalIndex]:
+        with self._lock:
+            index = self._projects.get(project_id)
+            if index is not None:
+                self._projects.move_to_end(project_id)
+            return index
+
+    def is_loaded(self, project_id: str) -> bool:
+        return project_id in self._projects
+
+    def install(self, project_id: str, index: ProjectLexicalIndex, version: int) -> bool:
+        """Caches a freshly built index unless the project changed since `version`."""
+        with self._lock:
+            if version != self.version(project_id):
+                return False
+            self._projects[project_id] = index
+            self._projects.move_to_end(project_id)
+            while len(self._projects) > self.max_projects:
+                self._projects.popitem(last=False)
+            return True
+
+    def update_script(self, project_id: str, script_id: str, chunks: Dict[str, str]):
+        with self._lock:
+            self._versions[project_id] = self.version(project_id) + 1
+            index = self._projects.get(project_id)
+            if index is not None:
+                index.replace_script(script_id, chunks)
+
+    def remove_script(self, project_id: str, script_id: str):
+        self.update_script(project_id, script_id, {})
+
+    def drop_project(self, project_id: str):
+        with self._lock:
+            self._versions[project_id] = self.version(project_id) + 1
+            self._projects.pop(project_id, None)
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = RRF_K) -> List[str]:
+    """Fuses ranked key lists into one ranking by summing 1 / (k + rank) across lists."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+lexical_index = LexicalIndex(max_projects=settings.LEXICAL_INDEX_MAX_PROJECTS)
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any, Dict, List
+
+from database import project_collection, script_collection, entity_collection, chunk_manifest_collection, job_collection, tombstone_collection
+
+# Placeholder IDs: explain() only needs the query shape, not matching documents.
+_PROJECT_ID = "000000000000000000000000"
+_SCRIPT_ID = "000000000000000000000001"
+
+# (route, collection, filter, sort) for every hot query issued by the routes and jobs.
+# Deletes are explained through the equivalent find, which uses the same plan.
+HOT_QUERIES = [
+    ("GET /projects", project_collection, {"deleted_at": None}, [("updated_at", -1), ("_id", -1)]),
+    ("GET /projects/dashboard (jobs lookup)", job_collection, {"project_id": _PROJECT_ID}, None),
+    ("GET /projects/{project_id}/scripts", script_collection, {"project_id": _PROJECT_ID, "deleted_at": None}, [("updated_at", -1), ("_id", -1)]),
+    ("tombstoned scripts of a project", tombstone_collection, {"project_id": _PROJECT_ID}, None),
+    ("GET /projects/{project_id}/entities", entity_collection, {"project_id": _PROJECT_ID}, [("type", 1), ("name", 1), ("_id", 1)]),
+    ("GET /projects/{project_id}/entities?type=", entity_collection, {"project_id": _PROJECT_ID, "type": "character"}, [("name", 1), ("_id", 1)]),
+    ("reclaim job, script (entities)", entity_collection, {"script_id": _SCRIPT_ID}, None),
+    ("reclaim job, project (scripts)", script_collection, {"project_id": _PROJECT_ID}, None),
+    ("reclaim job, project (entities)", entity_collection, {"project_id": _PROJECT_ID}, None),
+    ("reclaim job, project (chunk manifests)", chunk_manifest_collection, {"project_id": _PROJECT_ID}, [("_id", 1)]),
+    ("embed job (chunk manifest)", chunk_manifest_collection, {"script_id": _SCRIPT_ID}, None),
+    ("job claim", job_collection, {"type": "embed", "status": "queued"}, [("run_after", 1)]),
+    ("GET /scripts/{script_id}/status", job_collection, {"script_id": _SCRIPT_ID}, None),
+]
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Flattens a winning plan into its stage names, outermost first."""
+    # Slot-based engine plans nest the classic plan under "queryPlan".
+    plan = plan.get("queryPlan", plan)
+    stages = [plan.get("stage", "UNKNOWN")]
+    children = plan.get("inputStages") or ([plan["inputStage"]] if "inputStage" in plan else [])
+    for child in children:
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+async def explain_hot_queries() -> List[Dict[str, Any]]:
+    reports = []
+    for route, collection, query, sort in HOT_QUERIES:
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        stages = _plan_stages(explanation["queryPlanner"]["winningPlan"])
+        reports.append({
+            "route": route,
+            "collection": collection.name,
+            "filter": query,
+            "stages": stages,
+            "collection_scan": "COLLSCAN" in stages,
+        })
+    return reports
+
+
+if __name__ == "__main__":
+    # `python -m services.query_plans` prints every hot query's plan and flags collection scans.
+    for report in asyncio.run(explain_hot_queries()):
+        flag = "COLLSCAN" if report["collection_scan"] else "ok"
+        print(f"[{flag:>8}] {report['route']}: {' <- '.join(report['stages'])}")
@@ -0,0 +1,321 @@
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+
+from config import settings
+from database import (
+    project_collection, script_collection, entity_collection, canonical_entity_collection, chunk_mention_collection,
+    entity_edge_collection, chunk_manifest_collection, import_collection, summary_tree_collection,
+    script_revision_collection, tombstone_collection, job_collection, answer_cache_collection,
+)
+from vector_store import adelete_vectors, alist_vector_ids
+from services.job_queue import job_queue
+from services.indexing import JOB_EMBED
+from services.entity_registry import remove_script_entities
+from services.entity_graph import remove_script_graph
+from services.tombstones import JOB_RECLAIM, PROJECT, SCRIPT, place_tombstone
+from services.legacy_vectors import JOB_LEGACY_SCAN, delete_legacy_vectors, is_chunk_id, run_legacy_scan_job
+from observability import log_event
+
+# Reclaims what a tombstone (services/tombstones.py) stands for, in phases. Each phase
+# removes documents RECLAIM_BATCH_SIZE at a time and is recorded in the tombstone's
+# `phases_done` when it completes, with counts in `reclaimed`, so a retried job skips
+# finished phases and re-runs the current one from wherever its deletes got to. The
+# tombstone itself goes last.
+#
+# Vectors are deleted by ID (the chunk manifests, then the `<script_id>:` prefix), not
+# by metadata filter, which serverless Pinecone indexes do not support. Legacy
+# random-ID vectors go last, through the legacy vector scan's record; until that scan
+# has finished a reclaim keeps its tombstone (hiding the data), and the scan re-queues
+# it when done.
+
+JOB_SWEEP = "sweep"
+# The sweep's single job document; its progress is kept there between attempts.
+SWEEP_ID = "sweep"
+
+# A project's collections, emptied in this order once its vectors are gone.
+PROJECT_COLLECTIONS = [
+    ("entities", entity_collection),
+    ("canonical_entities", canonical_entity_collection),
+    ("chunk_mentions", chunk_mention_collection),
+    ("entity_edges", entity_edge_collection),
+    ("summary_trees", summary_tree_collection),
+    ("script_revisions", script_revision_collection),
+    ("chunk_manifests", chunk_manifest_collection),
+    ("imports", import_collection),
+    ("scripts", script_collection),
+]
+# Collections the sweep checks for data of scripts that no longer exist.
+SCRIPT_KEYED_COLLECTIONS = [
+    ("entities", entity_collection),
+    ("chunk_mentions", chunk_mention_collection),
+    ("summary_trees", summary_tree_collection),
+    ("script_revisions", script_revision_collection),
+    ("chunk_manifests", chunk_manifest_collection),
+]
+
+
+async def _delete_in_batches(tombstone_id: str, name: str, collection, query: Dict[str, Any]) -> int:
+    """Deletes the documents matching `query` RECLAIM_BATCH_SIZE at a time, counting them on the tombstone."""
+    deleted = 0
+    while True:
+        ids = [doc["_id"] for doc in await collection.find(query, {"_id": 1}).limit(settings.RECLAIM_BATCH_SIZE).to_list(length=None)]
+        if not ids:
+            return deleted
+        result = await collection.delete_many({"_id": {"$in": ids}})
+        deleted += result.deleted_count
+        await tombstone_collection.update_one({"_id": tombstone_id}, {"$inc": {f"reclaimed.{name}": result.deleted_count}})
+
+async def _delete_vector_ids(tombstone_id: str, project_id: str, ids: List[str]):
+    for start in range(0, len(ids), settings.VECTOR_UPSERT_BATCH_SIZE):
+        batch = ids[start:start + settings.VECTOR_UPSERT_BATCH_SIZE]
+        await adelete_vectors(ids=batch, filter={"project_id": project_id})
+        await tombstone_collection.update_one({"_id": tombstone_id}, {"$inc": {"reclaimed.vectors": len(batch)}})
+
+async def _delete_unlisted_vectors(tombstone_id: str, project_id: str, script_id: str):
+    # Vectors under the script's ID prefix that no manifest lists, e.g. upserted by an
+    # embedding that never got to write its manifest.
+    while True:
+        ids, _ = await alist_vector_ids(prefix=f"{script_id}:", limit=settings.VECTOR_UPSERT_BATCH_SIZE)
+        if not ids:
+            return
+        await _delete_vector_ids(tombstone_id, project_id, ids)
+
+async def _run_phases(tombstone: Dict[str, Any], phases: List) -> bool:
+    """Runs the phases not yet done; False if one could not finish yet (it returned False)."""
+    done = set(tombstone.get("phases_done", []))
+    for name, phase in phases:
+        if name in done:
+            continue
+        if await phase() is False:
+            return False
+        await tombstone_collection.update_one({"_id": tombstone["_id"]}, {"$addToSet": {"phases_done": name}})
+    return True
+
+async def reclaim_script(tombstone: Dict[str, Any]):
+    script_id, project_id = tombstone["target_id"], tombstone["project_id"]
+    tombstone_id = tombstone["_id"]
+    by_script = {"script_id": script_id}
+
+    async def jobs():
+        await job_queue.delete_for({"script_id": script_id, "type": {"$ne": JOB_RECLAIM}})
+
+    async def vectors():
+        manifest = await chunk_manifest_collection.find_one(by_script, {"chunks.id": 1})
+        if manifest is not None:
+            await _delete_vector_ids(tombstone_id, project_id, sorted({chunk["id"] for chunk in manifest.get("chunks", [])}))
+        await _delete_unlisted_vectors(tombstone_id, project_id, script_id)
+
+    async def derived():
+        # The registry and graph subtract the script's mentions, so they go before the mentions themselves.
+        await remove_script_graph(project_id, script_id)
+        await remove_script_entities(project_id, script_id)
+        await _delete_in_batches(tombstone_id, "entities", entity_collection, by_script)
+        await _delete_in_batches(tombstone_id, "script_revisions", script_revision_collection, by_script)
+        await summary_tree_collection.delete_one(by_script)
+        await chunk_manifest_collection.delete_one(by_script)
+
+    async def script():
+        await script_collection.delete_one({"_id": ObjectId(script_id)})
+
+    async def legacy_vectors():
+        return await delete_legacy_vectors(by_script)
+
+    return await _run_phases(tombstone, [
+        ("jobs", jobs), ("vectors", vectors), ("derived", derived), ("script", script), ("legacy_vectors", legacy_vectors),
+    ])
+
+async def reclaim_project(tombstone: Dict[str, Any]):
+    project_id = tombstone["target_id"]
+    tombstone_id = tombstone["_id"]
+    by_project = {"project_id": project_id}
+
+    async def jobs():
+        await job_queue.delete_for({"project_id": project_id, "type": {"$ne": JOB_RECLAIM}})
+
+    async def vectors():
+        # Manifests go in _id order; the last one done is saved so a retry carries on after it.
+        while True:
+            current = await tombstone_collection.find_one({"_id": tombstone_id}, {"vectors_after": 1})
+            query = dict(by_project)
+            if current.get("vectors_after") is not None:
+                query["_id"] = {"$gt": current["vectors_after"]}
+            manifests = await chunk_manifest_collection.find(query, {"chunks.id": 1}) \
+                .sort("_id", 1).limit(settings.RECLAIM_BATCH_SIZE).to_list(length=None)
+            if not manifests:
+                break
+            ids = sorted({chunk["id"] for manifest in manifests for chunk in manifest.get("chunks", [])})
+            await _delete_vector_ids(tombstone_id, project_id, ids)
+            await tombstone_collection.update_one({"_id": tombstone_id}, {"$set": {"vectors_after": manifests[-1]["_id"]}})
+        async for script in script_collection.find(by_project, {"_id": 1}):
+            await _delete_unlisted_vectors(tombstone_id, project_id, str(script["_id"]))
+
+    async def data():
+        for name, collection in PROJECT_COLLECTIONS:
+            await _delete_in_batches(tombstone_id, name, collection, by_project)
+
+    async def project():
+        await answer_cache_collection.delete_one({"_id": project_id})
+        await project_collection.delete_one({"_id": ObjectId(project_id)})
+
+    async def legacy_vectors():
+        return await delete_legacy_vectors(by_project)
+
+    return await _run_phases(tombstone, [
+        ("jobs", jobs), ("vectors", vectors), ("data", data), ("project", project), ("legacy_vectors", legacy_vectors),
+    ])
+
+async def run_reclaim_job(job: Dict[str, Any]):
+    tombstone = await tombstone_collection.find_one({"_id": job["script_id"]})
+    if tombstone is None:
+        return
+    reclaim = reclaim_project if tombstone["kind"] == PROJECT else reclaim_script
+    if not await reclaim(tombstone):
+        # The legacy vector scan re-queues this job when it finishes.
+        log_event("tombstone_waiting_for_legacy_scan", project_id=tombstone["project_id"], tombstone=tombstone["_id"])
+        return
+    if tombstone["kind"] == PROJECT:
+        # The project's own script tombstones have nothing left to reclaim.
+        await tombstone_collection.delete_many({"project_id": tombstone["target_id"], "kind": SCRIPT})
+    finished = await tombstone_collection.find_one_and_delete({"_id": tombstone["_id"]})
+    log_event("tombstone_reclaimed", project_id=tombstone["project_id"], tombstone=tombstone["_id"],
+              reclaimed=(finished or tombstone).get("reclaimed", {}))
+
+# --- Orphan sweep ---
+
+async def _save_sweep(job: Dict[str, Any], progress: Dict[str, Any]):
+    await job_collection.update_one({"_id": job["_id"]}, {"$set": {"sweep": progress}})
+
+async def _requeue_marked():
+    """Queues a reclaim for every tombstone, and tombstones anything marked deleted that lacks one."""
+    async for tombstone in tombstone_collection.find({}, {"project_id": 1}):
+        await job_queue.enqueue(JOB_RECLAIM, tombstone["project_id"], tombstone["_id"])
+    async for project in project_collection.find({"deleted_at": {"$ne": None}}, {"_id": 1}):
+        await place_tombstone(PROJECT, str(project["_id"]), str(project["_id"]))
+    async for script in script_collection.find({"deleted_at": {"$ne": None}}, {"project_id": 1}):
+        await place_tombstone(SCRIPT, str(script["_id"]), script["project_id"])
+
+async def _distinct_after(collection, field: str, after: Optional[str]) -> List[Dict[str, Any]]:
+    """The next RECLAIM_BATCH_SIZE distinct values of `field` after `after`, each with a project_id."""
+    match = {field: {"$gt": after}} if after is not None else {field: {"$ne": None}}
+    return await collection.aggregate([
+        {"$match": match},
+        {"$sort": {field: 1}},
+        {"$group": {"_id": f"${field}", "project_id": {"$first": "$project_id"}}},
+        {"$sort": {"_id": 1}},
+        {"$limit": settings.RECLAIM_BATCH_SIZE},
+    ]).to_list(length=None)
+
+async def _sweep_orphaned_scripts(job: Dict[str, Any], progress: Dict[str, Any]) -> int:
+    """Tombstones projects and scripts that are gone but whose data is still around."""
+    found = 0
+    done = set(progress.setdefault("collections_done", []))
+    for name, collection in [("scripts", script_collection)] + SCRIPT_KEYED_COLLECTIONS:
+        if name in done:
+            continue
+        field = "project_id" if name == "scripts" else "script_id"
+        while True:
+            groups = await _distinct_after(collection, field, progress.get("after"))
+            if not groups:
+                break
+            keys = [group["_id"] for group in groups if ObjectId.is_valid(group["_id"])]
+            owner = project_collection if name == "scripts" else script_collection
+            existing = {str(doc["_id"]) async for doc in owner.find({"_id": {"$in": [ObjectId(k) for k in keys]}}, {"_id": 1})}
+            for group in groups:
+                if group["_id"] in existing or not ObjectId.is_valid(group["_id"]):
+                    continue
+                kind = PROJECT if name == "scripts" else SCRIPT
+                await place_tombstone(kind, group["_id"], group["_id"] if kind == PROJECT else group["project_id"])
+                found += 1
+            progress["after"] = groups[-1]["_id"]
+            await _save_sweep(job, progress)
+        progress["collections_done"].append(name)
+        progress["after"] = None
+        await _save_sweep(job, progress)
+    return found
+
+async def _sweep_vectors(job: Dict[str, Any], progress: Dict[str, Any]) -> int:
+    """
+    Deletes vectors no live script accounts for: those of scripts that no longer exist,
+    and those missing from a live script's manifest, unless an embedding of the script
+    is queued or running (it upserts before it writes the manifest).
+    """
+    deleted = 0
+    while True:
+        ids, token = await alist_vector_ids(pagination_token=progress.get("vector_token"), limit=settings.RECLAIM_BATCH_SIZE)
+        by_script: Dict[str, List[str]] = {}
+        for vector_id in ids:
+            # Legacy random-ID vectors are left to the legacy vector scan.
+            if is_chunk_id(vector_id):
+                by_script.setdefault(vector_id.split(":", 1)[0], []).append(vector_id)
+
+        script_ids = sorted(by_script)
+        scripts = {
+            str(doc["_id"]): doc
+            async for doc in script_collection.find(
+                {"_id": {"$in": [ObjectId(s) for s in script_ids]}}, {"project_id": 1, "import_id": 1}
+            )
+        }
+        manifests = {
+            doc["script_id"]: {chunk["id"] for chunk in doc.get("chunks", [])}
+            async for doc in chunk_manifest_collection.find({"script_id": {"$in": script_ids}}, {"script_id": 1, "chunks.id": 1})
+        }
+        embedding = {
+            doc["script_id"]
+            async for doc in job_collection.find(
+                {"type": JOB_EMBED, "script_id": {"$in": script_ids}, "status": {"$in": ["queued", "running"]}},
+                {"script_id": 1},
+            )
+        }
+        # Scripts store their import's ID as a string.
+        import_ids = {doc["import_id"] for doc in scripts.values() if doc.get("import_id")}
+        importing = {
+            str(doc["_id"])
+            async for doc in import_collection.find(
+                {"_id": {"$in": [ObjectId(import_id) for import_id in sorted(import_ids)]}, "status": "indexing"},
+                {"_id": 1},
+            )
+        }
+
+        stale = []
+        for script_id, vector_ids in by_script.items():
+            script = scripts.get(script_id)
+            if script is None:
+                stale.extend(vector_ids)
+            elif script_id not in embedding and str(script.get("import_id")) not in importing:
+                stale.extend(vector_id for vector_id in vector_ids if vector_id not in manifests.get(script_id, set()))
+        for start in range(0, len(stale), settings.VECTOR_UPSERT_BATCH_SIZE):
+            await adelete_vectors(ids=stale[start:start + settings.VECTOR_UPSERT_BATCH_SIZE])
+        deleted += len(stale)
+
+        if token is None:
+            return deleted
+        progress["vector_token"] = token
+        await _save_sweep(job, progress)
+
+async def run_sweep_job(job: Dict[str, Any]):
+    """
+    Reconciles Mongo and the vector index: re-queues pending reclaims, tombstones the
+    data of projects and scripts deleted without one, and deletes vectors nothing
+    accounts for. Progress is kept on the job, so a retried sweep resumes.
+    """
+    progress = dict(job.get("sweep") or {})
+    if not progress.get("requeued"):
+        await _requeue_marked()
+        progress["requeued"] = True
+        await _save_sweep(job, progress)
+    if not progress.get("orphans_done"):
+        progress["orphans"] = progress.get("orphans", 0) + await _sweep_orphaned_scripts(job, progress)
+        progress["orphans_done"] = True
+        await _save_sweep(job, progress)
+    vectors = await _sweep_vectors(job, progress)
+    await job_collection.update_one({"_id": job["_id"]}, {"$unset": {"sweep": ""}})
+    log_event("orphan_sweep_finished", tombstoned=progress["orphans"], vectors_deleted=vectors)
+
+async def enqueue_orphan_sweep():
+    await job_queue.enqueue(JOB_SWEEP, "", SWEEP_ID)
+
+def register_reclaim_jobs():
+    job_queue.register(JOB_RECLAIM, run_reclaim_job, settings.JOB_RECLAIM_CONCURRENCY)
+    job_queue.register(JOB_SWEEP, run_sweep_job, 1)
+    job_queue.register(JOB_LEGACY_SCAN, run_legacy_scan_job, 1)
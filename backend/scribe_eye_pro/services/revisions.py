@@ -0,0 +1,226 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import settings
+from database import script_revision_collection
+
+# Script history as forward deltas: revision N stores the edits that turn revision N-1
+# into N, and every SCRIPT_SNAPSHOT_INTERVAL-th revision (and revision 0) also stores
+# the full text, so any revision is rebuilt from at most that many deltas.
+
+# (start, end, text): replace content[start:end] of the previous revision with text.
+Edit = Tuple[int, int, str]
+Range = Tuple[int, int]
+
+# The splitters' first-choice separator.
+PARAGRAPH = "\n\n"
+
+
+def apply_edits(content: str, edits: Sequence[Edit]) -> str:
+    """
+    Applies edits given against `content`. They must be in order, within the text
+    and not overlap; raises ValueError otherwise.
+    """
+    pieces = []
+    position = 0
+    for start, end, text in edits:
+        if start < position or end < start or end > len(content):
+            raise ValueError(f"Edit [{start}, {end}) is out of order, overlapping or outside the text")
+        pieces.append(content[position:start])
+        pieces.append(text)
+        position = end
+    pieces.append(content[position:])
+    return "".join(pieces)
+
+def diff_edits(old: str, new: str) -> List[Edit]:
+    """One edit replacing whatever lies between the common prefix and suffix; [] if equal."""
+    if old == new:
+        return []
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[len(old) - 1 - suffix] == new[len(new) - 1 - suffix]:
+        suffix += 1
+    return [(prefix, len(old) - suffix, new[prefix:len(new) - suffix])]
+
+def changed_ranges(revisions: Sequence[Sequence[Edit]]) -> List[Range]:
+    """
+    The character ranges of the final text that differ from the text before the first
+    of these consecutive revisions, merged and in order.
+    """
+    ranges: List[Range] = []
+    for edits in revisions:
+        def moved(position: int) -> int:
+            shift = 0
+            for start, end, text in edits:
+                if end <= position:
+                    shift += len(text) - (end - start)
+                elif start < position:
+                    # Inside a replaced span: clamp to the end of its replacement.
+                    return start + shift + len(text)
+                else:
+                    break
+            return position + shift
+
+        shifted = [(moved(start), moved(end)) for start, end in ranges]
+        shift = 0
+        for start, end, text in edits:
+            shifted.append((start + shift, start + shift + len(text)))
+            shift += len(text) - (end - start)
+        ranges = []
+        for start, end in sorted(shifted):
+            if ranges and start <= ranges[-1][1]:
+                ranges[-1] = (ranges[-1][0], max(ranges[-1][1], end))
+            else:
+                ranges.append((start, end))
+    return ranges
+
+def _split_point(content: str, start: int) -> bool:
+    """
+    Whether splitting from just before `start` begins exactly as the whole text's split
+    does there: `start` opens a paragraph (inside a paragraph longer than a chunk the
+    splitter cuts differently when its beginning is not in view), and the separator in
+    front of it follows text. After a longer run of newlines, or a line of spaces, the
+    whole split folds the extra separators and whitespace into the chunk's first piece,
+    which a window starting at the last separator would not see.
+    """
+    separator = start - len(PARAGRAPH)
+    return (
+        separator > 0
+        and content.startswith(PARAGRAPH, separator)
+        and not content[separator - 1].isspace()
+    )
+
+def resplit(
+    content: str,
+    old_chunks: List[Dict[str, Any]],
+    old_length: int,
+    changed: List[Range],
+    split: Callable[[str, int], List[Dict[str, Any]]],
+    chunk_size: int,
+) -> List[Dict[str, Any]]:
+    """
+    Updates the chunks (`id`, `start`, `end`) of the previous text for the current one,
+    splitting again only around the changed ranges. `split(text, offset)` chunks a span
+    starting at `offset` and must be the splitter that produced `old_chunks`.
+
+    Splitting restarts at an old chunk ending well before the first change, which the
+    change cannot have affected, and which starts where the whole text's split provably
+    starts afresh (`_split_point`); without one it starts from the beginning. It stops at the first chunk after the last change
+    that matches an old chunk (shifted): from there on the splitter repeats itself, so
+    the old chunks are reused. The result is what splitting the whole text would give.
+    """
+    if not changed:
+        return old_chunks
+    low, high = changed[0][0], changed[-1][1]
+    shift = len(content) - old_length
+
+    restart = 0
+    for i, chunk in enumerate(old_chunks):
+        if chunk["end"] > low - 2 * chunk_size:
+            break
+        if _split_point(content, chunk["start"]):
+            restart = i
+    # The separator stays in the window: the splitter counts it towards the first chunk.
+    window_start = old_chunks[restart]["start"] - len(PARAGRAPH) if restart else 0
+    before = old_chunks[:restart]
+    following = {
+        (chunk["start"] + shift, chunk["id"]): i
+        for i, chunk in enumerate(old_chunks) if chunk["start"] + shift >= high
+    }
+
+    span = 4 * chunk_size
+    while True:
+        window_end = min(len(content), high + span)
+        middle = split(content[window_start:window_end], window_start)
+        if window_end < len(content):
+            # The last chunks of a window may be cut short by its end; only trust earlier ones.
+            middle = [chunk for chunk in middle if chunk["end"] <= window_end - chunk_size]
+        for j, chunk in enumerate(middle):
+            i = following.get((chunk["start"], chunk["id"]))
+            if i is not None:
+                after = [{**old, "start": old["start"] + shift, "end": old["end"] + shift} for old in old_chunks[i + 1:]]
+                return before + middle[:j + 1] + after
+        if window_end == len(content):
+            return before + middle
+        span *= 2
+
+# --- Storage ---
+
+def _stored(edits: Sequence[Edit]) -> List[list]:
+    return [[start, end, text] for start, end, text in edits]
+
+async def record_revision(project_id: str, script_id: str, revision: int, edits: Sequence[Edit], content: str):
+    """Stores a revision's edits, with the full text on snapshot revisions."""
+    document = {
+        "project_id": project_id,
+        "script_id": script_id,
+        "revision": revision,
+        "edits": _stored(edits),
+        "length": len(content),
+        "created_at": datetime.utcnow(),
+    }
+    if revision % settings.SCRIPT_SNAPSHOT_INTERVAL == 0:
+        document["snapshot"] = content
+    await script_revision_collection.update_one(
+        {"script_id": script_id, "revision": revision}, {"$set": document}, upsert=True
+    )
+
+async def start_history(project_id: str, script_id: str, revision: int, content: str):
+    """
+    Snapshots the current text of a script saved before revisions were kept, so the
+    first tracked edit has something to apply to. A no-op once history exists.
+    """
+    await script_revision_collection.update_one(
+        {"script_id": script_id, "revision": revision},
+        {"$setOnInsert": {
+            "project_id": project_id,
+            "edits": [],
+            "length": len(content),
+            "snapshot": content,
+            "created_at": datetime.utcnow(),
+        }},
+        upsert=True,
+    )
+
+async def _deltas(script_id: str, after: int, through: int) -> Optional[List[List[Edit]]]:
+    """The edits of revisions after..through, or None if any is missing."""
+    docs = await script_revision_collection.find(
+        {"script_id": script_id, "revision": {"$gt": after, "$lte": through}}, {"revision": 1, "edits": 1}
+    ).sort("revision", 1).to_list(length=None)
+    if [doc["revision"] for doc in docs] != list(range(after + 1, through + 1)):
+        return None
+    return [[tuple(edit) for edit in doc["edits"]] for doc in docs]
+
+async def revision_content(script_id: str, revision: int) -> Optional[Dict[str, Any]]:
+    """A past revision (`revision`, `content`, `created_at`), or None if it cannot be rebuilt."""
+    snapshot = await script_revision_collection.find_one(
+        {"script_id": script_id, "revision": {"$lte": revision}, "snapshot": {"$exists": True}},
+        sort=[("revision", -1)],
+    )
+    if snapshot is None:
+        return None
+    deltas = await _deltas(script_id, snapshot["revision"], revision)
+    if deltas is None:
+        return None
+    content = snapshot["snapshot"]
+    for edits in deltas:
+        content = apply_edits(content, edits)
+    target = snapshot if snapshot["revision"] == revision else await script_revision_collection.find_one(
+        {"script_id": script_id, "revision": revision}, {"created_at": 1}
+    )
+    return {"revision": revision, "content": content, "created_at": target["created_at"]}
+
+async def changed_since(script_id: str, revision: Optional[int], current: int) -> Optional[List[Range]]:
+    """
+    The ranges of the current text changed since `revision`, from the stored deltas;
+    None when they cannot be known (no base revision, or history is missing).
+    """
+    if revision is None or revision > current:
+        return None
+    if revision == current:
+        return []
+    deltas = await _deltas(script_id, revision, current)
+    return changed_ranges(deltas) if deltas is not None else None
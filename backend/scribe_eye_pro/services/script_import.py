@@ -0,0 +1,220 @@
+import asyncio
+import os
+import re
+import tarfile
+import zipfile
+from datetime import datetime
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+
+from config import settings
+from database import script_collection, import_collection, content_stats
+from services.indexing import JOB_IMPORT
+from services.job_queue import job_queue
+from observability import log_event
+
+SCRIPT_EXTENSIONS = {".txt", ".text", ".fountain", ".spmd"}
+FOUNTAIN_EXTENSIONS = {".fountain", ".spmd"}
+# Scripts are written when a batch reaches IMPORT_INSERT_BATCH_SIZE scripts or this
+# much content, so a few huge scripts cannot pile up in memory.
+INSERT_BATCH_BYTES = 8 * 1024 * 1024
+
+# Parsed items are ("script", name, title, content) or ("skipped", name, reason).
+ImportItem = Tuple[str, ...]
+
+
+# --- Parsing ---
+
+def _decode(data: bytes) -> str:
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # Older archives are often Windows-1252; latin-1 never fails and keeps the text readable.
+        return data.decode("latin-1")
+
+_TITLE_PAGE_KEY = re.compile(r"^([A-Za-z][A-Za-z ]*):(.*)$")
+_BONEYARD = re.compile(r"/\*.*?\*/", re.S)
+
+def parse_fountain(text: str) -> Tuple[Optional[str], str]:
+    """
+    Splits a Fountain screenplay into its title (from the title page, if any) and its
+    body. The title page is dropped from the body, and so is boneyard (/* ... */),
+    which Fountain defines as text the writer has commented out.
+    """
+    text = text.replace("\r\n", "\n")
+    lines = text.split("\n")
+    title, body_start = None, 0
+    if lines and _TITLE_PAGE_KEY.match(lines[0]):
+        key = None
+        for i, line in enumerate(lines):
+            if not line.strip():
+                body_start = i + 1
+                break
+            match = _TITLE_PAGE_KEY.match(line)
+            if match:
+                key = match.group(1).strip().lower()
+                value = match.group(2).strip()
+            elif line[:1] in (" ", "\t"):
+                value = line.strip()
+            else:
+                # Not a title page after all.
+                title, body_start = None, 0
+                break
+            if key == "title" and value:
+                title = f"{title} {value}" if title else value
+        else:
+            body_start = len(lines)
+    body = _BONEYARD.sub("", "\n".join(lines[body_start:])).strip("\n")
+    if title:
+        title = re.sub(r"[*_]", "", title).strip() or None
+    return title, body
+
+def _script_item(name: str, data: bytes) -> ImportItem:
+    extension = os.path.splitext(name)[1].lower()
+    text = _decode(data)
+    title = None
+    if extension in FOUNTAIN_EXTENSIONS:
+        title, text = parse_fountain(text)
+    else:
+        text = text.replace("\r\n", "\n")
+    return ("script", name, title or os.path.splitext(os.path.basename(name))[0], text)
+
+def _read_limited(stream: IO[bytes]) -> Optional[bytes]:
+    """Reads at most IMPORT_MAX_SCRIPT_BYTES; None if the file is larger."""
+    data = stream.read(settings.IMPORT_MAX_SCRIPT_BYTES + 1)
+    return None if len(data) > settings.IMPORT_MAX_SCRIPT_BYTES else data
+
+def _member_item(name: str, stream: IO[bytes]) -> Optional[ImportItem]:
+    base = os.path.basename(name)
+    if not base or base.startswith(".") or "__MACOSX/" in name:
+        return None
+    if os.path.splitext(base)[1].lower() not in SCRIPT_EXTENSIONS:
+        return ("skipped", name, "unsupported file type")
+    data = _read_limited(stream)
+    if data is None:
+        return ("skipped", name, f"larger than {settings.IMPORT_MAX_SCRIPT_BYTES} bytes")
+    return _script_item(name, data)
+
+def _is_archive(filename: str) -> bool:
+    lower = filename.lower()
+    return lower.endswith((".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz"))
+
+def iter_upload(filename: str, fileobj: IO[bytes]) -> Iterator[ImportItem]:
+    """
+    Yields the scripts in one uploaded file, reading archives member by member so
+    only one script is in memory at a time. Zip members are read through the central
+    directory; tar archives (optionally compressed) are read as a forward-only stream.
+    """
+    try:
+        if filename.lower().endswith(".zip"):
+            with zipfile.ZipFile(fileobj) as archive:
+                for info in archive.infolist():
+                    if info.is_dir():
+                        continue
+                    with archive.open(info) as member:
+                        item = _member_item(info.filename, member)
+                    if item is not None:
+                        yield item
+        elif _is_archive(filename):
+            with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+                for info in archive:
+                    if not info.isfile():
+                        continue
+                    member = archive.extractfile(info)
+                    item = _member_item(info.name, member) if member is not None else None
+                    if item is not None:
+                        yield item
+        else:
+            item = _member_item(filename, fileobj)
+            if item is not None:
+                yield item
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+        yield ("skipped", filename, f"unreadable archive: {e}")
+
+
+# --- Import ---
+
+async def _record_skip(import_id: ObjectId, name: str, reason: str):
+    await import_collection.update_one(
+        {"_id": import_id},
+        {"$push": {"skipped": {"$each": [{"file": name, "reason": reason}],
+                               "$slice": settings.IMPORT_MAX_REPORTED_SKIPS}},
+         "$inc": {"skipped_count": 1}, "$set": {"updated_at": datetime.utcnow()}},
+    )
+
+async def _insert_batch(import_id: ObjectId, batch: List[Dict[str, Any]]):
+    if not batch:
+        return
+    await script_collection.insert_many(batch)
+    await import_collection.update_one(
+        {"_id": import_id},
+        {"$inc": {"scripts_imported": len(batch)}, "$set": {"updated_at": datetime.utcnow()}},
+    )
+
+async def import_scripts(project_id: str, uploads: List[Tuple[str, IO[bytes]]]) -> Dict[str, Any]:
+    """
+    Creates an import record, stream-parses the uploaded files (scripts or archives of
+    scripts) into the project with batched inserts, and queues one import job to
+    embed them all. Returns the import record.
+    """
+    now = datetime.utcnow()
+    record = {
+        "project_id": project_id,
+        "status": "parsing",
+        "files_received": len(uploads),
+        "scripts_imported": 0,
+        "scripts_embedded": 0,
+        "chunks_embedded": 0,
+        "skipped": [],
+        "skipped_count": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+    import_id = (await import_collection.insert_one(record)).inserted_id
+
+    batch: List[Dict[str, Any]] = []
+    batch_bytes = 0
+    try:
+        for filename, fileobj in uploads:
+            items = iter_upload(filename, fileobj)
+            while True:
+                # Archive reads and decompression are blocking; keep them off the event loop.
+                item = await asyncio.to_thread(next, items, None)
+                if item is None:
+                    break
+                if item[0] == "skipped":
+                    await _record_skip(import_id, item[1], item[2])
+                    continue
+                _, _, title, content = item
+                created = datetime.utcnow()
+                batch.append({
+                    "project_id": project_id,
+                    "title": title,
+                    "content": content,
+                    **content_stats(content),
+                    "import_id": str(import_id),
+                    "created_at": created,
+                    "updated_at": created,
+                })
+                batch_bytes += len(content)
+                if len(batch) >= settings.IMPORT_INSERT_BATCH_SIZE or batch_bytes >= INSERT_BATCH_BYTES:
+                    await _insert_batch(import_id, batch)
+                    batch, batch_bytes = [], 0
+        await _insert_batch(import_id, batch)
+    except Exception as e:
+        await import_collection.update_one(
+            {"_id": import_id},
+            {"$set": {"status": "failed", "last_error": str(e), "updated_at": datetime.utcnow()}},
+        )
+        raise
+
+    imported = await import_collection.find_one({"_id": import_id})
+    if imported["scripts_imported"]:
+        await import_collection.update_one({"_id": import_id}, {"$set": {"status": "indexing"}})
+        await job_queue.enqueue(JOB_IMPORT, project_id, str(import_id))
+    else:
+        await import_collection.update_one({"_id": import_id}, {"$set": {"status": "done", "finished_at": datetime.utcnow()}})
+    log_event("scripts_imported", project_id=project_id, import_id=str(import_id),
+              scripts=imported["scripts_imported"], skipped=imported["skipped_count"])
+    return await import_collection.find_one({"_id": import_id})
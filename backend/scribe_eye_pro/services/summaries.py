@@ -0,0 +1,256 @@
+import asyncio
+import hashlib
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain.prompts import PromptTemplate
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+
+from config import settings
+from database import summary_collection, summary_tree_collection
+from llm_gateway import BACKGROUND, CHAT_MODEL, INTERACTIVE, estimate_tokens, gateway
+from observability import LLMMetricsCallback, log_event
+from providers import Provider
+from services.answer_cache import answer_cache
+from services.context_assembly import estimate_tokens as context_tokens
+from services.tombstones import exclude_scripts
+
+# Summary trees: chunk -> scene -> script -> project. Every node is stored under a
+# Merkle key, a hash of what it summarizes (its text for a chunk, its children's keys
+# above that), so a save recomputes only the nodes on the path from changed chunks to
+# the root, and the project root is rebuilt from cached script roots on demand.
+
+# Bump whenever the prompts or model change so cached summaries are not reused.
+SUMMARY_VERSION = f"{CHAT_MODEL}:v1"
+# Scenes longer than this many characters are summarized in chunks, then combined.
+SUMMARY_CHUNK_SIZE = 8000
+# Upper levels combine at most this many child summaries per call.
+SUMMARY_FANOUT = 8
+SUMMARY_OUTPUT_TOKENS = 256
+
+SCENE_HEADING = re.compile(
+    r"^[ \t]*(?:(?:INT|EXT|EST|INT\.?/EXT|I/E)[. ]|\.(?=[A-Z0-9]))[^\n]*$", re.M | re.I
+)
+
+summary_prompt = PromptTemplate.from_template("""
+You are summarizing a screenplay for a writer's reference notes.
+Summarize the following {kind} of "{title}" in at most five sentences. Name every
+character who appears and every location, and keep the order of events.
+
+{kind_upper}:
+{text}
+""")
+
+def build_summary_chain():
+    """Creates the summarization chain on Gemini."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    llm = ChatGoogleGenerativeAI(
+        model=CHAT_MODEL,
+        google_api_key=settings.GEMINI_API_KEY,
+        temperature=0,
+        convert_system_message_to_human=True,
+        max_retries=1,
+        callbacks=[LLMMetricsCallback("summary")],
+    )
+    return summary_prompt | llm | StrOutputParser()
+
+summary_chain = Provider("summary_llm", build_summary_chain)
+# Shared across scripts so summarizing a large import cannot flood Gemini.
+summary_semaphore = asyncio.Semaphore(settings.SUMMARY_CONCURRENCY)
+
+
+def summary_key(level: str, parts: Sequence[str]) -> str:
+    digest = hashlib.sha256("\0".join([SUMMARY_VERSION, level, *parts]).encode("utf-8")).hexdigest()
+    return f"{level}:{digest}"
+
+def split_scenes(content: str) -> List[Tuple[str, str]]:
+    """
+    Splits a script into `(heading, text)` scenes at scene headings (INT./EXT. and
+    the like, or Fountain's forced ".HEADING"). Text before the first heading is its
+    own untitled scene; a script without headings is one scene.
+    """
+    starts = [match.start() for match in SCENE_HEADING.finditer(content)]
+    if not starts or starts[0] > 0:
+        starts.insert(0, 0)
+    scenes = []
+    for start, end in zip(starts, starts[1:] + [len(content)]):
+        text = content[start:end].strip()
+        if not text:
+            continue
+        first_line = text.split("\n", 1)[0].strip()
+        heading = first_line.lstrip(".") if SCENE_HEADING.match(first_line) else "Opening"
+        scenes.append((heading, text))
+    return scenes
+
+
+# --- Building nodes ---
+
+async def _summarize(key: str, kind: str, title: str, text: str, priority: int) -> str:
+    """Returns the cached summary stored under `key`, or generates and stores it."""
+    cached = await summary_collection.find_one_and_update({"_id": key}, {"$set": {"used_at": datetime.utcnow()}})
+    if cached is not None:
+        return cached["summary"]
+    chain = await summary_chain.aget()
+    async with summary_semaphore:
+        summary = await gateway.call(
+            CHAT_MODEL,
+            lambda: chain.ainvoke({"kind": kind, "kind_upper": kind.upper(), "title": title, "text": text}),
+            tokens=estimate_tokens(text) + SUMMARY_OUTPUT_TOKENS, priority=priority, key=("summary", key),
+        )
+    summary = summary.strip()
+    await summary_collection.update_one(
+        {"_id": key}, {"$set": {"summary": summary, "used_at": datetime.utcnow()}}, upsert=True
+    )
+    return summary
+
+async def _combine(level: str, kind: str, title: str, children: List[Tuple[str, str, str]], priority: int) -> Tuple[str, str]:
+    """
+    Reduces `(key, label, summary)` children to one `(key, summary)` node, combining at
+    most SUMMARY_FANOUT at a time. A single child is its own parent.
+    """
+    while len(children) > 1:
+        groups = [children[i:i + SUMMARY_FANOUT] for i in range(0, len(children), SUMMARY_FANOUT)]
+
+        async def combine_group(group):
+            key = summary_key(level, [child_key for child_key, _, _ in group])
+            text = "\n\n".join(f"{label}: {summary}" for _, label, summary in group)
+            label = group[0][1] if len(group) == 1 else f"{group[0][1]} to {group[-1][1]}"
+            return key, label, await _summarize(key, kind, title, text, priority)
+
+        children = list(await asyncio.gather(*(combine_group(group) for group in groups)))
+    return children[0][0], children[0][2]
+
+async def _summarize_scene(title: str, heading: str, text: str) -> Tuple[str, str]:
+    chunks = [text[i:i + SUMMARY_CHUNK_SIZE] for i in range(0, len(text), SUMMARY_CHUNK_SIZE)]
+    chunk_nodes = []
+    for number, chunk in enumerate(chunks, start=1):
+        key = summary_key("chunk", [chunk])
+        chunk_nodes.append((key, f"Part {number}", _summarize(key, "scene", title, chunk, BACKGROUND)))
+    summaries = await asyncio.gather(*(node[2] for node in chunk_nodes))
+    return await _combine(
+        "scene", "scene", title,
+        [(key, label, summary) for (key, label, _), summary in zip(chunk_nodes, summaries)], BACKGROUND,
+    )
+
+async def summarize_script(project_id: str, script_id: str, title: str, content: str):
+    """
+    Brings a script's summary tree up to date and stores it with its scene summaries.
+    Unchanged scenes (and unchanged groups of scenes) are served from the cache.
+    """
+    scenes = split_scenes(content)
+    scene_nodes = await asyncio.gather(*(_summarize_scene(title, heading, text) for heading, text in scenes))
+    if scene_nodes:
+        root_key, root_summary = await _combine(
+            "script", "sequence of scenes", title,
+            [(key, heading, summary) for (heading, _), (key, summary) in zip(scenes, scene_nodes)], BACKGROUND,
+        )
+    else:
+        root_key, root_summary = summary_key("script", []), ""
+
+    previous = await summary_tree_collection.find_one_and_update(
+        {"script_id": script_id},
+        {"$set": {
+            "project_id": project_id,
+            "title": title,
+            "root_key": root_key,
+            "summary": root_summary,
+            "scenes": [
+                {"heading": heading, "key": key, "summary": summary}
+                for (heading, _), (key, summary) in zip(scenes, scene_nodes)
+            ],
+            "updated_at": datetime.utcnow(),
+        }, "$setOnInsert": {"created_at": datetime.utcnow()}},
+        {"root_key": 1},
+        upsert=True,
+    )
+    if previous is None or previous.get("root_key") != root_key:
+        await answer_cache.invalidate(project_id)
+    log_event("script_summarized", project_id=project_id, script_id=script_id, scenes=len(scenes))
+
+
+# --- Answering broad questions ---
+
+# Questions about a whole script or project: retrieving a handful of chunks cannot answer these.
+# Only phrases are matched, since the bare words ("every", "across", "whole", "themes")
+# turn up just as often in questions about a single moment.
+_WORK = r"(?:script|screenplay|story|film|movie|project|series|season|plot|draft)s?"
+_PARTS = r"(?:scenes?|characters?|locations?|scripts?|episodes?|acts?|chapters?)"
+BROAD_QUESTION = re.compile(
+    rf"\b(summar\w*|overview|"
+    rf"(?:the )?(?:whole|entire) {_WORK}|throughout (?:the|this|all)(?: \w+)? {_WORK}|"
+    rf"across (?:all |the |every |each )+(?:{_WORK}|{_PARTS})|"
+    rf"overall (?:themes?|arcs?|tone|structure|message|{_WORK})|"
+    rf"(?:main|central|major|key|recurring|underlying) themes?|themes? (?:of|in|across) (?:the|this|all) {_WORK}|"
+    rf"(?:character|story|narrative|emotional) arcs?|"
+    rf"(?:all|every|each) (?:of )?(?:the )?{_PARTS}|"
+    rf"act (?:one|two|three|four|five|[1-9]|i{{1,3}}|iv|v)|how does .+ (?:change|develop|evolve|grow))\b",
+    re.I,
+)
+
+def is_broad_question(question: str) -> bool:
+    return bool(BROAD_QUESTION.search(question))
+
+def _names(question: str) -> List[str]:
+    """Capitalized words after the first: likely character or place names."""
+    words = re.findall(r"\b\w+\b", question)
+    return [word.casefold() for word in words[1:] if word[:1].isupper() and len(word) > 1]
+
+def _covers(documents: List[Document], names: List[str]) -> bool:
+    """Whether the documents mention any of the names (trivially, if there are none)."""
+    return not names or any(name in doc.page_content.casefold() for doc in documents for name in names)
+
+def _fits(documents: List[Document], budget: int) -> bool:
+    return sum(context_tokens(doc.page_content) for doc in documents) <= budget
+
+async def project_summary(project_id: str, trees: List[Dict[str, Any]]) -> Optional[Document]:
+    """The project-level root, rebuilt from the script roots (cached node by node)."""
+    children = [(tree["root_key"], tree["title"], tree["summary"]) for tree in trees if tree.get("summary")]
+    if not children:
+        return None
+    key, summary = await _combine("project", "collection of scripts", "the project", children, INTERACTIVE)
+    return Document(page_content=summary, metadata={"project_id": project_id, "level": "project", "key": key})
+
+async def summary_context(project_id: str, question: str, exclude: Optional[List[str]] = None) -> List[Document]:
+    """
+    Context for a broad question from the project's summary trees (except those of the
+    scripts in `exclude`): every scene summary if they fit in QA_SUMMARY_TOKEN_BUDGET,
+    else the scenes naming someone the question names, else the script summaries, else
+    the project summary. Returns nothing if no script has been summarized yet, or if
+    the question names someone the chosen summaries never mention, so the question
+    falls back to retrieval.
+    """
+    query = exclude_scripts({"project_id": project_id}, exclude or [])
+    trees = await summary_tree_collection.find(query).sort("created_at", 1).to_list(length=None)
+    if not trees:
+        return []
+    budget = settings.QA_SUMMARY_TOKEN_BUDGET
+
+    scenes = [
+        Document(
+            page_content=f"{tree['title']} - {scene['heading']}: {scene['summary']}",
+            metadata={"project_id": project_id, "script_id": tree["script_id"], "level": "scene"},
+        )
+        for tree in trees for scene in tree.get("scenes", [])
+    ]
+    names = _names(question)
+    if _fits(scenes, budget):
+        return scenes if _covers(scenes, names) else []
+    if names:
+        named = [doc for doc in scenes if any(name in doc.page_content.casefold() for name in names)]
+        if named and _fits(named, budget):
+            return named
+
+    scripts = [
+        Document(
+            page_content=f"{tree['title']}: {tree['summary']}",
+            metadata={"project_id": project_id, "script_id": tree["script_id"], "level": "script"},
+        )
+        for tree in trees if tree.get("summary")
+    ]
+    if _fits(scripts, budget):
+        return scripts if _covers(scripts, names) else []
+    project = await project_summary(project_id, trees)
+    return [project] if project is not None and _covers([project], names) else []
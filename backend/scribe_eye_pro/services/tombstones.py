@@ -0,0 +1,94 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+
+from database import project_collection, script_collection, tombstone_collection
+from services.answer_cache import answer_cache
+from services.job_queue import job_queue
+from services.lexical_index import lexical_index
+
+# Deleting a project or script only marks it: the document gets `deleted_at`, and a
+# tombstone {_id: "<kind>:<id>", kind, target_id, project_id} queues a reclaim job
+# (services/reclaimer.py) that removes its data in the background. Until then reads
+# skip marked documents (LIVE) and the data of tombstoned scripts ($nin on script_id).
+
+PROJECT = "project"
+SCRIPT = "script"
+JOB_RECLAIM = "reclaim"
+
+# Matches project and script documents that are not marked deleted.
+LIVE = {"deleted_at": None}
+
+
+def tombstone_id(kind: str, target_id: str) -> str:
+    return f"{kind}:{target_id}"
+
+async def place_tombstone(kind: str, target_id: str, project_id: str):
+    """Records a tombstone (once) and queues its reclaim job."""
+    tombstone = tombstone_id(kind, target_id)
+    await tombstone_collection.update_one(
+        {"_id": tombstone},
+        {"$setOnInsert": {
+            "kind": kind,
+            "target_id": target_id,
+            "project_id": project_id,
+            "phases_done": [],
+            "reclaimed": {},
+            "created_at": datetime.utcnow(),
+        }},
+        upsert=True,
+    )
+    await job_queue.enqueue(JOB_RECLAIM, project_id, tombstone)
+
+async def tombstone_project(project_id: str) -> bool:
+    """Marks a project deleted and queues the reclaim of its data; False if there is no such live project."""
+    result = await project_collection.update_one(
+        {"_id": ObjectId(project_id), **LIVE}, {"$set": {"deleted_at": datetime.utcnow()}}
+    )
+    if result.matched_count == 0:
+        return False
+    await place_tombstone(PROJECT, project_id, project_id)
+    lexical_index.drop_project(project_id)
+    await answer_cache.invalidate(project_id)
+    return True
+
+async def tombstone_script(script_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Marks a script deleted and queues the reclaim of its data. Returns the script
+    (`project_id` only), or None if there is no such live script.
+    """
+    script = await script_collection.find_one_and_update(
+        {"_id": ObjectId(script_id), **LIVE}, {"$set": {"deleted_at": datetime.utcnow()}}, {"project_id": 1}
+    )
+    if script is None:
+        return None
+    await place_tombstone(SCRIPT, script_id, script["project_id"])
+    lexical_index.remove_script(script["project_id"], script_id)
+    await answer_cache.invalidate(script["project_id"])
+    return script
+
+async def project_deleted(project_id: str) -> bool:
+    return await tombstone_collection.find_one({"_id": tombstone_id(PROJECT, project_id)}, {"_id": 1}) is not None
+
+async def tombstoned_scripts(project_id: str) -> Optional[List[str]]:
+    """
+    The IDs of the project's scripts awaiting reclaim, for filtering data keyed by
+    script; None if the project itself is tombstoned. One lookup on an index that
+    only holds what is still being reclaimed.
+    """
+    tombstones = await tombstone_collection.find(
+        {"project_id": project_id}, {"kind": 1, "target_id": 1}
+    ).to_list(length=None)
+    if any(tombstone["kind"] == PROJECT for tombstone in tombstones):
+        return None
+    return sorted(tombstone["target_id"] for tombstone in tombstones)
+
+async def all_tombstoned_scripts() -> List[str]:
+    """The IDs of every project's scripts awaiting reclaim, for views spanning projects."""
+    tombstones = await tombstone_collection.find({"kind": SCRIPT}, {"target_id": 1}).to_list(length=None)
+    return sorted(tombstone["target_id"] for tombstone in tombstones)
+
+def exclude_scripts(query: Dict[str, Any], script_ids: List[str], field: str = "script_id") -> Dict[str, Any]:
+    """`query` restricted to documents whose `field` is none of `script_ids`."""
+    return {**query, field: {"$nin": script_ids}} if script_ids else query
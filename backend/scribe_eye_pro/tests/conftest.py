@@ -0,0 +1,45 @@
+"""
+Shared setup for the API tests: the app runs in-process against the offline fakes
+from benchmarks/ (mongomock-motor, FakeEmbeddings, FakeChatModel, the local vector
+backend in a temporary directory), so no network or external service is needed.
+"""
+import os
+import sys
+import types
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing the suite configures the environment before the app's modules load.
+from benchmarks import suite  # noqa: E402,F401
+from mongomock.collection import BulkOperationBuilder  # noqa: E402
+
+import vector_store  # noqa: E402
+
+FAKE_LATENCY = types.SimpleNamespace(embed_latency_ms=0, llm_latency_ms=0, token_latency_ms=0)
+
+
+async def upsert_legacy_vector(project_id: str, script_id: str) -> str:
+    """A vector as stored before chunk IDs: a random ID, attributed only by its metadata."""
+    vector_id = str(uuid.uuid4())
+    await vector_store.aadd_texts_batched(
+        texts=[f"old text of {script_id}"],
+        metadatas=[{"project_id": project_id, "script_id": script_id}],
+        ids=[vector_id],
+    )
+    return vector_id
+
+async def vector_stored(vector_id: str) -> bool:
+    return bool(await vector_store.afetch_vector_metadata([vector_id]))
+
+
+def _accept_sort(add):
+    # pymongo 4.11+ passes `sort` to the bulk builder for UpdateOne/ReplaceOne; mongomock
+    # predates it. The app never sets a sort on bulk operations, so it can be dropped.
+    def wrapper(self, *args, sort=None, **kwargs):
+        return add(self, *args, **kwargs)
+    return wrapper
+
+
+for _name in ("add_update", "add_replace"):
+    setattr(BulkOperationBuilder, _name, _accept_sort(getattr(BulkOperationBuilder, _name)))
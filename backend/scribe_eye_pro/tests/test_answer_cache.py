@@ -0,0 +1,74 @@
+import asyncio
+
+import httpx
+
+import main
+from benchmarks import suite
+from benchmarks.fakes import synthetic_script
+from config import settings
+from services import langchain_service
+from services.answer_cache import AnswerCache
+from tests.conftest import FAKE_LATENCY
+
+QUESTION = "Who is in the kitchen?"
+
+
+def _process_cache() -> AnswerCache:
+    """The answer cache of another process: same MongoDB, its own memory."""
+    return AnswerCache(
+        ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+        max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+        similarity_threshold=settings.ANSWER_CACHE_SIMILARITY,
+    )
+
+
+def test_worker_reembedding_invalidates_the_api_cache(monkeypatch):
+    suite.use_fakes(FAKE_LATENCY)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test/api") as client:
+            project_id = (await client.post("/projects", json={"title": "Cache"})).json()["id"]
+            content = synthetic_script(4_000, seed=1)
+            script = (await client.post(
+                f"/projects/{project_id}/scripts", json={"title": "S", "content": content}
+            )).json()
+            await suite.index_script(project_id, script["id"], content)
+
+            async def ask():
+                response = await client.post(f"/projects/{project_id}/question", json={"question": QUESTION})
+                return response.json()["cached"]
+
+            answers = [await ask(), await ask()]
+            # The worker re-embeds the script with its own cache, as with RUN_JOB_WORKERS=false.
+            with monkeypatch.context() as worker:
+                worker.setattr(langchain_service, "answer_cache", _process_cache())
+                await langchain_service.process_and_embed_script(synthetic_script(4_000, seed=2), project_id, script["id"])
+            answers += [await ask(), await ask()]
+            return answers
+
+    assert asyncio.run(scenario()) == [False, True, False, True]
+
+
+def test_answer_computed_before_an_invalidation_elsewhere_is_not_served():
+    suite.use_fakes(FAKE_LATENCY)
+    api, worker = _process_cache(), _process_cache()
+    embedding = [1.0, 0.0, 0.0]
+
+    async def lookup():
+        await api.generation("project")
+        return api.lookup_exact("project", QUESTION)
+
+    async def scenario():
+        generation = await api.generation("project")
+        await worker.invalidate("project")
+        api.store("project", QUESTION, embedding, {"answer": "stale"}, generation)
+        stale = await lookup()
+
+        generation = await api.generation("project")
+        api.store("project", QUESTION, embedding, {"answer": "fresh"}, generation)
+        return stale, await lookup()
+
+    stale, fresh = asyncio.run(scenario())
+    assert stale is None
+    assert fresh == {"answer": "fresh"}
@@ -0,0 +1,67 @@
+import asyncio
+import random
+import time
+
+import httpx
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain.chains.question_answering.stuff_prompt import PROMPT_SELECTOR
+
+import main
+from benchmarks import suite
+from benchmarks.fakes import FakeChatModel, synthetic_script
+from providers import Provider
+from services import langchain_service
+from tests.conftest import FAKE_LATENCY
+
+PROJECTS = 4
+SCRIPTS_PER_PROJECT = 2
+QUESTIONS = 120
+
+
+def test_concurrent_questions_stay_in_their_project(monkeypatch):
+    suite.use_fakes(FAKE_LATENCY)
+    builds = []
+
+    def build_qa_chain():
+        # Slow enough that concurrent first questions all wait on the same build.
+        time.sleep(0.05)
+        llm = FakeChatModel(latency=0.001, token_latency=0)
+        builds.append(llm)
+        return create_stuff_documents_chain(llm, PROMPT_SELECTOR.get_prompt(llm))
+
+    monkeypatch.setattr(langchain_service, "qa_chain", Provider("qa_llm_test", build_qa_chain))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test/api") as client:
+            project_scripts = {}
+            for p in range(PROJECTS):
+                project_id = (await client.post("/projects", json={"title": f"QA {p}"})).json()["id"]
+                project_scripts[project_id] = []
+                for s in range(SCRIPTS_PER_PROJECT):
+                    content = synthetic_script(8_000, seed=p * 10 + s)
+                    script = (await client.post(
+                        f"/projects/{project_id}/scripts", json={"title": f"S{s}", "content": content}
+                    )).json()
+                    await suite.index_script(project_id, script["id"], content)
+                    project_scripts[project_id].append(content)
+
+            project_ids = list(project_scripts)
+            rng = random.Random(7)
+            questions = [(project_ids[i % PROJECTS], suite.random_question(rng)) for i in range(QUESTIONS)]
+            responses = await asyncio.gather(*(
+                client.post(f"/projects/{project_id}/question", json={"question": question})
+                for project_id, question in questions
+            ))
+            return project_scripts, questions, responses
+
+    project_scripts, questions, responses = asyncio.run(scenario())
+
+    for (project_id, _), response in zip(questions, responses):
+        assert response.status_code == 200, response.text
+        passages = response.json()["source_chunks"]
+        assert passages
+        for passage in passages:
+            assert any(passage in content for content in project_scripts[project_id])
+    assert len(builds) == 1
+    assert builds[0].calls > 0
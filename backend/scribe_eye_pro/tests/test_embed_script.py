@@ -0,0 +1,41 @@
+import asyncio
+
+from benchmarks import suite
+from benchmarks.fakes import synthetic_script
+from database import chunk_manifest_collection, project_collection, script_collection
+from services import legacy_vectors
+from services.langchain_service import process_and_embed_script
+from tests.conftest import FAKE_LATENCY, upsert_legacy_vector, vector_stored
+
+
+def test_first_embedding_after_upgrade_removes_legacy_vectors():
+    suite.use_fakes(FAKE_LATENCY)
+
+    async def scenario():
+        project_id = str((await project_collection.insert_one({"title": "Legacy"})).inserted_id)
+        scanned_first, embedded_first = [
+            str((await script_collection.insert_one({"project_id": project_id, "title": title})).inserted_id)
+            for title in ("scanned first", "embedded first")
+        ]
+        vectors = {script_id: await upsert_legacy_vector(project_id, script_id) for script_id in (scanned_first, embedded_first)}
+        results = {}
+
+        # Embedded before the scan reaches its legacy vector: the scan sees the manifest.
+        await process_and_embed_script(synthetic_script(3_000, seed=1), project_id, embedded_first)
+        await legacy_vectors.run_legacy_scan_job({"_id": "legacy-scan-test"})
+        results["embedded_first"] = await vector_stored(vectors[embedded_first])
+        results["scanned_first_before"] = await vector_stored(vectors[scanned_first])
+
+        # Scanned first: the embedding deletes what the scan recorded.
+        await process_and_embed_script(synthetic_script(3_000, seed=2), project_id, scanned_first)
+        results["scanned_first_after"] = await vector_stored(vectors[scanned_first])
+        manifest = await chunk_manifest_collection.find_one({"script_id": scanned_first})
+        results["chunks_stored"] = all([await vector_stored(chunk["id"]) for chunk in manifest["chunks"]])
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert not results["embedded_first"]
+    assert results["scanned_first_before"]
+    assert not results["scanned_first_after"]
+    assert results["chunks_stored"]
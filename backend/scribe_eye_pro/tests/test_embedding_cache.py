@@ -0,0 +1,83 @@
+import asyncio
+import sqlite3
+
+from benchmarks.fakes import FakeEmbeddings
+from embedding_cache import CachedEmbeddings
+
+
+def _cache(max_entries: int = 100, disk_path=None, **kwargs):
+    underlying = FakeEmbeddings(dimension=16, latency=0)
+    return CachedEmbeddings(underlying, "fake", max_entries=max_entries, disk_path=disk_path, **kwargs), underlying
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache, underlying = _cache(max_entries=2)
+    cache.embed_documents(["alpha", "beta"])
+    cache.embed_documents(["alpha"])
+    cache.embed_documents(["gamma"])
+    assert underlying.texts == 3
+
+    cache.embed_documents(["alpha", "gamma"])
+    assert underlying.texts == 3
+    cache.embed_documents(["beta"])
+    assert underlying.texts == 4
+    assert cache.stats() == {"hits": 3, "disk_hits": 0, "misses": 4, "memory_entries": 2}
+
+
+def test_repeated_texts_are_embedded_once_and_returned_in_order():
+    cache, underlying = _cache()
+    vectors = cache.embed_documents(["one", "two", "one"])
+    assert underlying.texts == 2
+    assert vectors[0] == vectors[2] == underlying.embed_documents(["one"])[0]
+    assert vectors[1] != vectors[0]
+
+
+def test_queries_and_documents_are_cached_apart():
+    cache, underlying = _cache()
+    cache.embed_documents(["who is there"])
+    cache.embed_query("who is there")
+    cache.embed_query("who is there")
+    assert underlying.texts == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    texts = [f"line {i}" for i in range(20)]
+    first, _ = _cache(disk_path=path)
+    expected = first.embed_documents(texts)
+
+    restarted, underlying = _cache(disk_path=path)
+    assert restarted.embed_documents(texts) == expected
+    assert underlying.texts == 0
+    assert restarted.stats() == {"hits": 20, "disk_hits": 20, "misses": 0, "memory_entries": 20}
+    # Promoted into memory: served without the disk tier from now on.
+    restarted.embed_documents(texts)
+    assert restarted.stats()["disk_hits"] == 20
+
+
+def test_async_methods_share_both_tiers(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+
+    async def scenario():
+        first, _ = _cache(disk_path=path)
+        documents = await first.aembed_documents(["a b", "c d"])
+        query = await first.aembed_query("e f")
+        restarted, underlying = _cache(disk_path=path)
+        return (
+            documents == await restarted.aembed_documents(["a b", "c d"])
+            and query == await restarted.aembed_query("e f"),
+            underlying.texts,
+        )
+
+    same, provider_texts = asyncio.run(scenario())
+    assert same
+    assert provider_texts == 0
+
+
+def test_disk_tier_is_trimmed_to_its_bound(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache, _ = _cache(max_entries=10, disk_path=path, disk_max_entries=50)
+    cache.embed_documents([f"text {i}" for i in range(1000)])
+    with sqlite3.connect(path) as disk:
+        assert disk.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 50
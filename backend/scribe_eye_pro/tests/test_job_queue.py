@@ -0,0 +1,153 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import ASCENDING
+
+from config import settings
+from services.job_queue import JobQueue
+
+JOB = "embed"
+
+
+async def _queue() -> JobQueue:
+    collection = AsyncMongoMockClient().scribes_eye.jobs
+    await collection.create_index([("type", ASCENDING), ("script_id", ASCENDING)], unique=True)
+    return JobQueue(collection)
+
+async def _job(queue: JobQueue, script_id: str = "script"):
+    return await queue.collection.find_one({"type": JOB, "script_id": script_id})
+
+async def _due_now(queue: JobQueue):
+    """Lets a backed-off job run, as if its delay had passed."""
+    await queue.collection.update_many({}, {"$set": {"run_after": datetime.utcnow()}})
+
+
+def test_enqueues_coalesce_and_a_job_saved_while_running_runs_again():
+    async def scenario():
+        queue = await _queue()
+        for _ in range(3):
+            await queue.enqueue(JOB, "project", "script")
+        queued = await _job(queue)
+        count = await queue.collection.count_documents({})
+
+        job = await queue._claim(JOB)
+        await queue.enqueue(JOB, "project", "script")
+        bumped = await _job(queue)
+        await queue._complete(job)
+        requeued = await _job(queue)
+
+        rerun = await queue._claim(JOB)
+        await queue._complete(rerun)
+        return count, queued, job, bumped, requeued, rerun, await _job(queue)
+
+    count, queued, job, bumped, requeued, rerun, done = asyncio.run(scenario())
+    assert count == 1
+    assert (queued["status"], queued["version"]) == ("queued", 3)
+    assert (job["status"], job["attempts"]) == ("running", 1)
+    assert (bumped["status"], bumped["version"]) == ("running", 4)
+    assert (requeued["status"], requeued["attempts"]) == ("queued", 0)
+    assert rerun["version"] == 4
+    assert done["status"] == "done"
+
+
+def test_enqueue_new_leaves_running_jobs_alone():
+    async def scenario():
+        queue = await _queue()
+        await queue.enqueue(JOB, "project", "running")
+        running = await queue._claim(JOB)
+        await queue.enqueue_new(JOB, "project", ["running", "new"])
+        return running, await _job(queue, "running"), await _job(queue, "new")
+
+    running, after, new = asyncio.run(scenario())
+    assert (after["status"], after["version"]) == ("running", running["version"])
+    assert (new["status"], new["version"]) == ("queued", 1)
+
+
+def test_expired_lease_is_claimed_again(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_LEASE_SECONDS", 0.05)
+
+    async def scenario():
+        queue = await _queue()
+        await queue.enqueue(JOB, "project", "script")
+        first = await queue._claim(JOB)
+        # The worker holding it dies: nothing renews the lease.
+        while_leased = await queue._claim(JOB)
+        await asyncio.sleep(0.1)
+        return first, while_leased, await queue._claim(JOB)
+
+    first, while_leased, reclaimed = asyncio.run(scenario())
+    assert first is not None
+    assert while_leased is None
+    assert reclaimed["_id"] == first["_id"]
+    assert reclaimed["attempts"] == 2
+
+
+def test_failures_back_off_exponentially_then_give_up(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_RETRY_BASE_SECONDS", 10)
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 3)
+
+    async def scenario():
+        queue = await _queue()
+        await queue.enqueue(JOB, "project", "script")
+        delays, claimed_early = [], []
+        for _ in range(settings.JOB_MAX_ATTEMPTS):
+            job = await queue._claim(JOB)
+            failed_at = datetime.utcnow()
+            await queue._fail(job, RuntimeError(f"attempt {job['attempts']}"))
+            after = await _job(queue)
+            if after["status"] == "queued":
+                delays.append(after["run_after"] - failed_at)
+                claimed_early.append(await queue._claim(JOB))
+                await _due_now(queue)
+        return delays, claimed_early, await _job(queue)
+
+    delays, claimed_early, failed = asyncio.run(scenario())
+    assert [round(delay / timedelta(seconds=1)) for delay in delays] == [10, 20]
+    assert claimed_early == [None, None]
+    assert (failed["status"], failed["last_error"], failed["attempts"]) == ("failed", "attempt 3", 3)
+
+
+def test_failure_of_a_superseded_job_requeues_it_at_once(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_RETRY_BASE_SECONDS", 10)
+
+    async def scenario():
+        queue = await _queue()
+        await queue.enqueue(JOB, "project", "script")
+        job = await queue._claim(JOB)
+        await queue.enqueue(JOB, "project", "script")
+        await queue._fail(job, RuntimeError("stale content"))
+        return await queue._claim(JOB)
+
+    rerun = asyncio.run(scenario())
+    assert (rerun["version"], rerun["attempts"]) == (2, 1)
+
+
+def test_workers_retry_until_the_handler_succeeds(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_RETRY_BASE_SECONDS", 0)
+    monkeypatch.setattr(settings, "JOB_POLL_SECONDS", 0.01)
+    calls = []
+
+    async def handler(job):
+        calls.append(job["attempts"])
+        if len(calls) == 1:
+            raise RuntimeError("provider unavailable")
+
+    async def scenario():
+        queue = await _queue()
+        queue.register(JOB, handler, concurrency=2)
+        await queue.start()
+        try:
+            await queue.enqueue(JOB, "project", "script")
+            for _ in range(200):
+                job = await _job(queue)
+                if job["status"] == "done":
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await queue.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "done"
+    assert calls == [1, 2]
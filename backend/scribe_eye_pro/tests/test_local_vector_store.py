@@ -0,0 +1,161 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import local_vector_store
+from local_vector_store import LocalVectorStore
+
+DIMENSION = 8
+PROJECT = "project"
+
+
+def _store(directory) -> LocalVectorStore:
+    return LocalVectorStore(str(directory), embedding=None, dimension=DIMENSION)
+
+def _add(store: LocalVectorStore, script_id: str, count: int, seed: int, start: int = 0):
+    ids = [f"{script_id}:{i}" for i in range(start, start + count)]
+    vectors = np.random.default_rng(seed).normal(size=(count, DIMENSION)).tolist()
+    store.add_embeddings(
+        [f"text of {vector_id}" for vector_id in ids], vectors,
+        [{"project_id": PROJECT, "script_id": script_id} for _ in ids], ids,
+    )
+    return dict(zip(ids, vectors))
+
+def _consistent(store: LocalVectorStore, vectors) -> bool:
+    """Every stored ID is one of `vectors` and finds itself, with its own text, as its nearest row."""
+    if set(store.list_ids(limit=1000)) != set(vectors):
+        return False
+    for vector_id, vector in vectors.items():
+        (document, score), = store.similarity_search_by_vector_with_score(vector, k=1, filter={"project_id": PROJECT})
+        if document.id != vector_id or document.page_content != f"text of {vector_id}" or score < 0.999:
+            return False
+    return True
+
+
+def test_add_and_search_with_filters(tmp_path):
+    store = _store(tmp_path)
+    vectors = {**_add(store, "a", 5, seed=1), **_add(store, "b", 5, seed=2)}
+    assert _consistent(store, vectors)
+
+    query = vectors["a:3"]
+    only_b = store.similarity_search_by_vector(query, k=10, filter={"project_id": PROJECT, "script_id": "b"})
+    assert {doc.id for doc in only_b} == {f"b:{i}" for i in range(5)}
+    not_b = store.similarity_search_by_vector(query, k=10, filter={"project_id": PROJECT, "script_id": {"$nin": ["b"]}})
+    assert not_b[0].id == "a:3" and {doc.id for doc in not_b} == {f"a:{i}" for i in range(5)}
+    assert store.similarity_search_by_vector(query, k=3, filter={"project_id": "elsewhere"}) == []
+
+
+def test_upsert_replaces_a_stored_id(tmp_path):
+    store = _store(tmp_path)
+    vectors = _add(store, "a", 5, seed=1)
+    replacement = _add(store, "a", 1, seed=9)
+    assert _consistent(store, {**vectors, **replacement})
+    assert len(store.list_ids(limit=100)) == 5
+
+
+def test_delete_by_id_script_and_project(tmp_path):
+    store = _store(tmp_path)
+    vectors = {**_add(store, "a", 10, seed=1), **_add(store, "b", 10, seed=2), **_add(store, "c", 10, seed=3)}
+
+    assert store.delete(ids=["a:0", "missing"], filter={"project_id": PROJECT})
+    assert store.delete(filter={"project_id": PROJECT, "script_id": {"$in": ["b"]}})
+    assert not store.delete(filter={"project_id": PROJECT, "script_id": "b"})
+    kept = {vector_id: vector for vector_id, vector in vectors.items() if vector_id[0] != "b" and vector_id != "a:0"}
+    assert _consistent(store, kept)
+
+    assert store.delete(filter={"project_id": PROJECT})
+    assert store.list_ids(limit=100) == []
+
+
+def test_compaction_keeps_each_script_contiguous(tmp_path):
+    store = _store(tmp_path)
+    vectors = {}
+    # Interleaved writes scatter each script's rows across the matrix.
+    for round_ in range(3):
+        vectors.update(_add(store, "s0", 3, seed=round_, start=3 * round_))
+        vectors.update(_add(store, "s1", 3, seed=10 + round_, start=3 * round_))
+        _add(store, "x", 4, seed=20 + round_, start=4 * round_)
+    index = store._projects[PROJECT]
+    assert len(index.script_ranges["s0"]) == 3
+
+    store.delete(filter={"project_id": PROJECT, "script_id": "x"})
+    index = store._projects[PROJECT]
+    assert index.dead == 0
+    assert len(index.rows) == len(vectors)
+    assert all(len(ranges) == 1 for ranges in index.script_ranges.values())
+    assert _consistent(store, vectors)
+    assert _consistent(_store(tmp_path), vectors)
+
+
+def test_reload_replays_the_row_log(tmp_path):
+    store = _store(tmp_path)
+    vectors = {**_add(store, "a", 10, seed=1), **_add(store, "b", 2, seed=2)}
+    vectors.update(_add(store, "a", 1, seed=3))
+    store.delete(ids=["b:1"], filter={"project_id": PROJECT})
+    del vectors["b:1"]
+    with open(tmp_path / PROJECT / "rows.jsonl", "a", encoding="utf-8") as log:
+        log.write('{"row": 99, "id": "half-writ')
+
+    restarted = _store(tmp_path)
+    assert _consistent(restarted, vectors)
+    # The torn record is gone, so rows appended after it are read back too.
+    vectors.update(_add(restarted, "c", 2, seed=4))
+    assert _consistent(_store(tmp_path), vectors)
+
+
+def test_reload_migrates_rows_kept_in_the_header(tmp_path):
+    store = _store(tmp_path)
+    vectors = _add(store, "a", 4, seed=1)
+    directory = tmp_path / PROJECT
+    index = store._projects[PROJECT]
+    with open(directory / "meta.json", "w", encoding="utf-8") as header:
+        json.dump({"dimension": DIMENSION, "capacity": index.capacity, "rows": index.rows}, header)
+    os.remove(directory / "rows.jsonl")
+
+    assert _consistent(_store(tmp_path), vectors)
+    with open(directory / "meta.json", encoding="utf-8") as header:
+        assert "rows" not in json.load(header)
+    assert _consistent(_store(tmp_path), vectors)
+
+
+def _crash_compaction_at(monkeypatch, step: str):
+    """Makes the next compaction fail at `step`, as if the process died there."""
+    if step == "write":
+        write_log = local_vector_store._ProjectIndex._write_log
+
+        def crash_on_compacted_log(path, rows):
+            if path.endswith(local_vector_store.COMPACTED):
+                raise OSError("crashed")
+            write_log(path, rows)
+
+        monkeypatch.setattr(local_vector_store._ProjectIndex, "_write_log", staticmethod(crash_on_compacted_log))
+    else:
+        replace, calls = os.replace, []
+
+        def crash_on_second_replace(source, target):
+            calls.append(target)
+            if len(calls) == 2:
+                raise OSError("crashed")
+            replace(source, target)
+
+        monkeypatch.setattr(os, "replace", crash_on_second_replace)
+
+
+@pytest.mark.parametrize("step", ["write", "move"])
+def test_crash_during_compaction_leaves_a_consistent_index(tmp_path, monkeypatch, step):
+    store = _store(tmp_path)
+    kept = _add(store, "kept", 20, seed=1)
+    _add(store, "deleted", 20, seed=2)
+    store.add_embeddings(["text of kept:0"], [kept["kept:0"]], [{"project_id": PROJECT, "script_id": "kept"}], ["kept:0"])
+
+    with monkeypatch.context() as crash:
+        _crash_compaction_at(crash, step)
+        with pytest.raises(OSError):
+            store.delete(filter={"project_id": PROJECT, "script_id": "deleted"})
+
+    restarted = _store(tmp_path)
+    # The deletion was logged before compacting: either way only the kept rows are left.
+    assert _consistent(restarted, kept)
+    assert sorted(os.listdir(tmp_path / PROJECT)) == ["meta.json", "rows.jsonl", "vectors.f32"]
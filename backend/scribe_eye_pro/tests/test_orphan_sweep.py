@@ -0,0 +1,56 @@
+import asyncio
+import io
+
+from bson import ObjectId
+
+import vector_store
+from benchmarks import suite
+from benchmarks.fakes import synthetic_script
+from database import script_collection
+from services import reclaimer
+from services.script_import import import_scripts
+from tests.conftest import FAKE_LATENCY
+
+
+async def _stored_ids(script_id: str):
+    ids, _ = await vector_store.alist_vector_ids(prefix=f"{script_id}:", limit=1000)
+    return set(ids)
+
+
+async def _upsert_unmanifested(project_id: str, script_id: str):
+    """Vectors as an embedding leaves them before it writes the script's manifest."""
+    ids = [f"{script_id}:chunk-{i}" for i in range(3)]
+    await vector_store.aadd_texts_batched(
+        texts=[f"chunk {i} of {script_id}" for i in range(3)],
+        metadatas=[{"project_id": project_id, "script_id": script_id} for _ in ids],
+        ids=ids,
+    )
+    return set(ids)
+
+
+def test_sweep_keeps_vectors_of_scripts_still_being_imported():
+    suite.use_fakes(FAKE_LATENCY)
+
+    async def scenario():
+        project_id = str(ObjectId())
+        record = await import_scripts(project_id, [
+            (f"episode-{i}.txt", io.BytesIO(synthetic_script(2_000, seed=i).encode("utf-8"))) for i in range(2)
+        ])
+        assert record["status"] == "indexing"
+        imported = [str(doc["_id"]) async for doc in script_collection.find({"import_id": str(record["_id"])})]
+        assert imported
+        standalone = str((await script_collection.insert_one({"project_id": project_id, "title": "Loose"})).inserted_id)
+
+        expected = {script_id: await _upsert_unmanifested(project_id, script_id) for script_id in imported}
+        await _upsert_unmanifested(project_id, standalone)
+
+        job = {"_id": "sweep-test"}
+        await reclaimer.run_sweep_job(job)
+        return {script_id: await _stored_ids(script_id) for script_id in imported}, expected, await _stored_ids(standalone)
+
+    kept, expected, standalone_left = asyncio.run(scenario())
+
+    # The import's indexing job has not embedded these yet, so their vectors are in flight.
+    assert kept == expected
+    # A script no embedding or import is working on has its unmanifested vectors swept.
+    assert standalone_left == set()
@@ -0,0 +1,51 @@
+import asyncio
+
+from benchmarks import suite
+from database import project_collection, script_collection, tombstone_collection
+from services import legacy_vectors, reclaimer
+from services.tombstones import SCRIPT, tombstone_id, tombstone_script
+from tests.conftest import FAKE_LATENCY, upsert_legacy_vector, vector_stored
+
+
+async def _reclaim(script_id: str):
+    await reclaimer.run_reclaim_job({"script_id": tombstone_id(SCRIPT, script_id)})
+
+
+def test_reclaim_removes_legacy_vectors_of_deleted_scripts():
+    suite.use_fakes(FAKE_LATENCY)
+
+    async def scenario():
+        project_id = str((await project_collection.insert_one({"title": "Legacy"})).inserted_id)
+        deleted_early, deleted_late, kept = [
+            str((await script_collection.insert_one({"project_id": project_id, "title": title})).inserted_id)
+            for title in ("deleted before the scan", "deleted after the scan", "kept")
+        ]
+        vectors = {script_id: await upsert_legacy_vector(project_id, script_id) for script_id in (deleted_early, deleted_late, kept)}
+        results = {}
+
+        # Before the scan, a reclaim cannot know every legacy vector, so it keeps the tombstone.
+        await tombstone_script(deleted_early)
+        await _reclaim(deleted_early)
+        results["waiting"] = await tombstone_collection.find_one({"_id": tombstone_id(SCRIPT, deleted_early)}) is not None
+
+        await legacy_vectors.run_legacy_scan_job({"_id": "legacy-scan-test"})
+        results["early_vector_after_scan"] = await vector_stored(vectors[deleted_early])
+        await _reclaim(deleted_early)
+        results["early_tombstone_after_scan"] = await tombstone_collection.find_one({"_id": tombstone_id(SCRIPT, deleted_early)})
+
+        # After the scan, the record leads the reclaim to the legacy vector.
+        await tombstone_script(deleted_late)
+        await _reclaim(deleted_late)
+        results["late_vector"] = await vector_stored(vectors[deleted_late])
+        results["late_tombstone"] = await tombstone_collection.find_one({"_id": tombstone_id(SCRIPT, deleted_late)})
+        results["kept_vector"] = await vector_stored(vectors[kept])
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert results["waiting"]
+    assert not results["early_vector_after_scan"]
+    assert results["early_tombstone_after_scan"] is None
+    assert not results["late_vector"]
+    assert results["late_tombstone"] is None
+    assert results["kept_vector"]
@@ -0,0 +1,47 @@
+import random
+
+from benchmarks.fakes import synthetic_script
+from services.langchain_service import EMBEDDING_CHUNK_SIZE, split_script
+from services.revisions import apply_edits, changed_ranges, diff_edits, resplit
+
+SEPARATORS = ["\n\n"] * 6 + ["\n\n\n", "\n\n\n\n", "\n\n\n\n\n\n\n", " \n\n", "\n\n  \n\n"]
+INSERTS = ["", "x", "\n", "\n\n", "\n\n\n\n", "MARA\nHello there.", "word " * 250]
+
+
+def _split(text, offset):
+    return split_script(text, "script", offset)
+
+def _spans(chunks):
+    return [(chunk["start"], chunk["end"], chunk["id"]) for chunk in chunks]
+
+def _text(rng: random.Random) -> str:
+    """A screenplay with paragraph breaks of irregular length, as pasted text often has."""
+    paragraphs = synthetic_script(rng.choice([3_000, 8_000, 20_000]), seed=rng.randrange(10**6)).split("\n\n")
+    return "".join(paragraph + rng.choice(SEPARATORS) for paragraph in paragraphs)
+
+def _edit(rng: random.Random, text: str):
+    start = rng.randrange(len(text) + 1)
+    end = min(len(text), start + rng.choice([0, 1, 5, 50, 400]))
+    return [(start, end, rng.choice(INSERTS))]
+
+
+def test_diff_edits_round_trip():
+    rng = random.Random(3)
+    for _ in range(200):
+        old = _text(rng)
+        new = apply_edits(old, _edit(rng, old))
+        assert apply_edits(old, diff_edits(old, new)) == new
+
+
+def test_resplit_matches_a_full_split():
+    rng = random.Random(7)
+    for trial in range(300):
+        old = _text(rng)
+        revisions, new = [], old
+        for _ in range(rng.randint(1, 3)):
+            edits = _edit(rng, new)
+            new = apply_edits(new, edits)
+            revisions.append(edits)
+        resplit_chunks = resplit(new, _split(old, 0), len(old), changed_ranges(revisions), _split, EMBEDDING_CHUNK_SIZE)
+        assert _spans(resplit_chunks) == _spans(_split(new, 0)), f"trial {trial}"
+
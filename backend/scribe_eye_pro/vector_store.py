@@ -1,42 +1,177 @@
-from pinecone import Pinecone, ServerlessSpec
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from config import settings
+import asyncio
 import time
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from config import settings
+from embedding_cache import CachedEmbeddings
+from llm_gateway import GatedEmbeddings, gateway
+from local_vector_store import LocalVectorStore
+from observability import VECTOR_OPERATION_SECONDS, VECTOR_RECORDS, log_event, timed
+from providers import Provider
+
+# Both backends implement LangChain's VectorStore plus `delete(ids=..., filter=...)`
+# with Pinecone-style metadata filters on `project_id` and `script_id`.
+# Nothing here touches the network at import time: the embedding client and the
+# vector store are providers, created on first use or by the startup warm-up.
 
-pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+EMBEDDING_MODEL = "models/text-embedding-004"
+# The dimension for Google's text-embedding-004 is 768
+EMBEDDING_DIMENSION = 768
+# Metadata key under which PineconeVectorStore keeps each chunk's text
+PINECONE_TEXT_KEY = "text"
 
-# Initialize embeddings model using Google Gemini
-embeddings = GoogleGenerativeAIEmbeddings(
-    model="models/text-embedding-004",
-    google_api_key=settings.GEMINI_API_KEY
+gateway.configure(
+    EMBEDDING_MODEL, settings.GEMINI_EMBEDDING_REQUESTS_PER_MINUTE, settings.GEMINI_EMBEDDING_TOKENS_PER_MINUTE
 )
 
-def get_vector_store() -> PineconeVectorStore:
-    """Initializes and returns the Pinecone vector store."""
+def cached_embeddings(underlying: Embeddings) -> CachedEmbeddings:
+    """
+    Puts a cache in front of an embeddings model so repeated texts (unchanged chunks,
+    boilerplate scenes, repeated questions) are embedded once; misses go through the
+    Gemini gateway's rate limits.
+    """
+    return CachedEmbeddings(
+        GatedEmbeddings(underlying, EMBEDDING_MODEL),
+        model_name=EMBEDDING_MODEL,
+        max_entries=settings.EMBEDDING_CACHE_SIZE,
+        disk_path=settings.EMBEDDING_CACHE_PATH,
+        disk_max_entries=settings.EMBEDDING_CACHE_DISK_SIZE,
+    )
+
+def create_embeddings() -> CachedEmbeddings:
+    """Initializes the Google Gemini embeddings model behind the embedding cache."""
+    # Imported here: the Google client libraries are a large share of import time.
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    return cached_embeddings(
+        GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=settings.GEMINI_API_KEY)
+    )
+
+embeddings = Provider("embeddings", create_embeddings)
+
+def create_pinecone_vector_store() -> VectorStore:
+    """Connects to the Pinecone index, creating it (and waiting until it is ready) if needed."""
+    from pinecone import Pinecone, ServerlessSpec
+    from langchain_pinecone import PineconeVectorStore
+
+    pc = Pinecone(api_key=settings.PINECONE_API_KEY)
     index_name = settings.PINECONE_INDEX_NAME
     
     # Check if index exists, create if not
     if index_name not in pc.list_indexes().names():
-        print(f"Creating index '{index_name}'...")
-        # The dimension for Google's text-embedding-004 is 768
+        log_event("pinecone_index_creating", index=index_name)
         pc.create_index(
             name=index_name,
-            dimension=768, 
+            dimension=EMBEDDING_DIMENSION, 
             metric="cosine",
             spec=ServerlessSpec(cloud="aws", region="us-east-1")
         )
         # Wait for index to be ready
         while not pc.describe_index(index_name).status['ready']:
             time.sleep(1)
-        print("Index created successfully.")
+        log_event("pinecone_index_created", index=index_name)
 
-    vector_store = PineconeVectorStore.from_existing_index(
-        index_name=index_name,
-        embedding=embeddings
+    return PineconeVectorStore(
+        index=pc.Index(index_name),
+        embedding=embeddings.get(),
+        text_key=PINECONE_TEXT_KEY
     )
-    return vector_store
 
-# Global vector store instance
-vector_store_instance = get_vector_store()
+def create_vector_store() -> VectorStore:
+    """Returns the vector store for the configured VECTOR_BACKEND."""
+    if settings.VECTOR_BACKEND == "pinecone":
+        return create_pinecone_vector_store()
+    if settings.VECTOR_BACKEND == "local":
+        return LocalVectorStore(settings.LOCAL_INDEX_DIR, embeddings.get(), dimension=EMBEDDING_DIMENSION)
+    raise ValueError(f"Unknown VECTOR_BACKEND '{settings.VECTOR_BACKEND}' (expected 'pinecone' or 'local')")
+
+vector_store = Provider("vector_store", create_vector_store)
+
+# --- Async write path ---
+
+async def _upsert_vectors(texts: List[str], vectors: List[List[float]], metadatas: List[Dict[str, Any]], ids: List[str]):
+    VECTOR_RECORDS.labels("upsert").inc(len(ids))
+    vector_store_instance = await vector_store.aget()
+    with timed(VECTOR_OPERATION_SECONDS, operation="upsert", backend=settings.VECTOR_BACKEND):
+        if isinstance(vector_store_instance, LocalVectorStore):
+            await asyncio.to_thread(vector_store_instance.add_embeddings, texts, vectors, metadatas, ids)
+            return
+        records = [
+            (vector_id, vector, {**metadata, PINECONE_TEXT_KEY: text})
+            for vector_id, vector, metadata, text in zip(ids, vectors, metadatas, texts)
+        ]
+        await asyncio.to_thread(vector_store_instance.index.upsert, vectors=records)
+
+async def aadd_texts_batched(texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str]):
+    """
+    Embeds texts in provider-sized batches and upserts each batch as soon as it is
+    embedded, with a bounded number of embedding and upsert requests in flight.
+    """
+    embed_slots = asyncio.Semaphore(settings.EMBEDDING_CONCURRENCY)
+    upsert_slots = asyncio.Semaphore(settings.VECTOR_UPSERT_CONCURRENCY)
+    embedder = await embeddings.aget()
+
+    async def process_batch(start: int):
+        end = start + settings.EMBEDDING_BATCH_SIZE
+        async with embed_slots:
+            vectors = await embedder.aembed_documents(texts[start:end])
+        upserts = []
+        for offset in range(0, len(vectors), settings.VECTOR_UPSERT_BATCH_SIZE):
+            lo, hi = start + offset, start + min(offset + settings.VECTOR_UPSERT_BATCH_SIZE, len(vectors))
+            upserts.append(upsert_batch(texts[lo:hi], vectors[lo - start:hi - start], metadatas[lo:hi], ids[lo:hi]))
+        await asyncio.gather(*upserts)
+
+    async def upsert_batch(*batch):
+        async with upsert_slots:
+            await _upsert_vectors(*batch)
+
+    await asyncio.gather(*(process_batch(start) for start in range(0, len(texts), settings.EMBEDDING_BATCH_SIZE)))
+
+async def alist_vector_ids(
+    prefix: str = "", pagination_token: Optional[str] = None, limit: int = 100
+) -> Tuple[List[str], Optional[str]]:
+    """
+    A page of up to `limit` vector IDs starting with `prefix` (chunk IDs start with
+    `<script_id>:`), and the token for the next page, or None after the last.
+    """
+    vector_store_instance = await vector_store.aget()
+    with timed(VECTOR_OPERATION_SECONDS, operation="list", backend=settings.VECTOR_BACKEND):
+        if isinstance(vector_store_instance, LocalVectorStore):
+            ids = await asyncio.to_thread(vector_store_instance.list_ids, prefix, pagination_token, limit)
+            return ids, (ids[-1] if len(ids) == limit else None)
+        page = await asyncio.to_thread(
+            vector_store_instance.index.list_paginated,
+            prefix=prefix or None, limit=limit, pagination_token=pagination_token,
+        )
+        ids = [vector.id for vector in page.vectors]
+        return ids, (page.pagination.next if page.pagination else None)
+
+async def afetch_vector_metadata(ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """The metadata of each of `ids` that exists (Pinecone fetches up to 1000 IDs per call)."""
+    vector_store_instance = await vector_store.aget()
+    with timed(VECTOR_OPERATION_SECONDS, operation="fetch", backend=settings.VECTOR_BACKEND):
+        if isinstance(vector_store_instance, LocalVectorStore):
+            return await asyncio.to_thread(vector_store_instance.get_metadata, ids)
+        found = {}
+        for start in range(0, len(ids), 1000):
+            response = await asyncio.to_thread(vector_store_instance.index.fetch, ids=ids[start:start + 1000])
+            found.update({vector_id: dict(vector.metadata or {}) for vector_id, vector in response.vectors.items()})
+        return found
+
+async def adelete_vectors(ids: Optional[List[str]] = None, filter: Optional[Dict[str, Any]] = None):
+    """Deletes vectors by IDs or metadata filter without blocking the event loop."""
+    if ids:
+        VECTOR_RECORDS.labels("delete").inc(len(ids))
+    vector_store_instance = await vector_store.aget()
+    with timed(VECTOR_OPERATION_SECONDS, operation="delete", backend=settings.VECTOR_BACKEND):
+        if isinstance(vector_store_instance, LocalVectorStore):
+            await asyncio.to_thread(vector_store_instance.delete, ids=ids, filter=filter)
+            return
+        from pinecone.exceptions import NotFoundException
 
+        try:
+            await vector_store_instance.adelete(ids=ids, filter=filter)
+        except NotFoundException:
+            # Pinecone reports a missing namespace when there is nothing to delete.
+            pass
@@ -0,0 +1,34 @@
+import asyncio
+
+from prometheus_client import start_http_server
+
+from config import settings
+from database import ensure_indexes
+from observability import configure_logging
+from services.indexing import register_indexing_jobs
+from services.reclaimer import register_reclaim_jobs
+from services.legacy_vectors import enqueue_legacy_scan
+from services.job_queue import job_queue
+
+# Runs the background job workers without the web server: `python worker.py`.
+# Web processes can then set RUN_JOB_WORKERS=false to keep AI work off request workers.
+
+async def main():
+    configure_logging(settings.LOG_LEVEL)
+    if settings.WORKER_METRICS_PORT:
+        start_http_server(settings.WORKER_METRICS_PORT)
+    await ensure_indexes()
+    register_indexing_jobs()
+    register_reclaim_jobs()
+    await job_queue.start()
+    await enqueue_legacy_scan()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await job_queue.stop()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("Workers stopped.")
@@ -12,11 +12,53 @@ export interface Entity {
   created_at: string;
 }
 
+// One entity per project, merging every script's mentions by name and aliases.
+export interface CanonicalEntity {
+  id: string;
+  project_id: string;
+  type: EntityType;
+  name: string;
+  aliases: string[];
+  description: string | null;
+  script_ids: string[];
+  created_at: string;
+  updated_at: string;
+}
+
+// Co-occurrence graph: weights count the script chunks mentioning an entity (nodes) or both entities (edges).
+export interface EntityGraph {
+  nodes: { id: string; type: EntityType; name: string; weight: number }[];
+  edges: { source: string; target: string; weight: number }[];
+}
+
+export interface EntityGraphParams {
+  entity_id?: string;
+  type?: EntityType;
+  limit?: number;
+  edge_limit?: number;
+}
+
 export const entitiesApi = {
   getByProject: (projectId: number, type?: EntityType) => {
     const params = type ? { type } : {};
     return axiosClient.get<Entity[]>(`/projects/${projectId}/entities`, { params });
   },
+
+  getCanonical: (projectId: number, type?: EntityType, cursor?: string) => {
+    const params = { ...(type ? { type } : {}), ...(cursor ? { cursor } : {}) };
+    return axiosClient.get<CanonicalEntity[]>(`/projects/${projectId}/entities/canonical`, { params });
+  },
+
+  search: (projectId: number, q: string, type?: EntityType, limit = 10) => {
+    const params = { q, limit, ...(type ? { type } : {}) };
+    return axiosClient.get<CanonicalEntity[]>(`/projects/${projectId}/entities/search`, { params });
+  },
+
+  addAliases: (projectId: number, entityId: string, aliases: string[]) =>
+    axiosClient.post<CanonicalEntity>(`/projects/${projectId}/entities/canonical/${entityId}/aliases`, { aliases }),
   
+  getGraph: (projectId: number, params: EntityGraphParams = {}) =>
+    axiosClient.get<EntityGraph>(`/projects/${projectId}/entities/graph`, { params }),
+
   getById: (id: number) => axiosClient.get<Entity>(`/entities/${id}`),
 };
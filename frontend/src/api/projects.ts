@@ -8,6 +8,15 @@ export interface Project {
   updated_at: string;
 }
 
+export interface ProjectDashboardEntry extends Project {
+  script_count: number;
+  word_count: number;
+  entity_counts: Record<string, number>;
+  last_updated: string;
+  indexing_state: 'not_indexed' | 'queued' | 'processing' | 'indexed' | 'failed';
+  job_counts: Record<string, number>;
+}
+
 export interface CreateProjectData {
   title: string;
   description: string;
@@ -16,6 +25,10 @@ export interface CreateProjectData {
 export const projectsApi = {
   getAll: () => axiosClient.get<Project[]>('/projects'),
   
+  // Projects with their stats in one request; paged like getAll via the X-Next-Cursor header.
+  getDashboard: (params?: { limit?: number; cursor?: string }) =>
+    axiosClient.get<ProjectDashboardEntry[]>('/projects/dashboard', { params }),
+  
   getById: (id: number) => axiosClient.get<Project>(`/projects/${id}`),
   
   create: (data: CreateProjectData) => 
@@ -7,9 +7,54 @@ export interface QuestionRequest {
 export interface QuestionResponse {
   answer: string;
   question: string;
+  source_chunks: string[];
+  cached: boolean;
+}
+
+export interface QuestionStreamHandlers {
+  onSources?: (sourceChunks: string[]) => void;
+  onToken: (token: string) => void;
+  onDone?: (info: { cached: boolean }) => void;
 }
 
 export const qaApi = {
   askQuestion: (projectId: number, data: QuestionRequest) => 
     axiosClient.post<QuestionResponse>(`/projects/${projectId}/question`, data),
+
+  // Streams the answer over Server-Sent Events: sources first, then answer tokens.
+  askQuestionStream: async (projectId: number, data: QuestionRequest, handlers: QuestionStreamHandlers) => {
+    const response = await fetch(`${axiosClient.defaults.baseURL}/projects/${projectId}/question/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+      body: JSON.stringify(data),
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`Question stream failed with status ${response.status}`);
+    }
+
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += value;
+
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+
+        const event = rawEvent.match(/^event: (.*)$/m)?.[1];
+        const payload = rawEvent.match(/^data: (.*)$/m)?.[1];
+        if (!event || payload === undefined) continue;
+        const parsed = JSON.parse(payload);
+
+        if (event === 'sources') handlers.onSources?.(parsed);
+        else if (event === 'token') handlers.onToken(parsed);
+        else if (event === 'done') handlers.onDone?.(parsed);
+        else if (event === 'error') throw new Error(parsed.detail);
+      }
+    }
+  },
 };
@@ -5,10 +5,43 @@ export interface Script {
   project_id: number;
   title: string;
   content: string;
+  revision: number;
   created_at: string;
   updated_at: string;
 }
 
+export interface ScriptSummary {
+  id: number;
+  project_id: number;
+  title: string;
+  length: number;
+  word_count: number;
+  preview: string;
+  created_at: string;
+  updated_at: string;
+}
+
+export interface PageParams {
+  limit?: number;
+  cursor?: string;
+}
+
+export interface ImportJob {
+  id: string;
+  project_id: number;
+  status: 'parsing' | 'indexing' | 'done' | 'failed';
+  files_received: number;
+  scripts_imported: number;
+  scripts_embedded: number;
+  chunks_embedded: number;
+  skipped_count: number;
+  skipped: { file: string; reason: string }[];
+  last_error?: string;
+  created_at: string;
+  updated_at: string;
+  finished_at?: string;
+}
+
 export interface CreateScriptData {
   title: string;
   content?: string;
@@ -19,6 +52,40 @@ export interface UpdateScriptData {
   content?: string;
 }
 
+export interface TextEdit {
+  start: number;
+  end: number;
+  text: string;
+}
+
+export interface PatchScriptData {
+  base_revision: number;
+  edits: TextEdit[];
+  title?: string;
+}
+
+export interface ScriptPatchResult {
+  id: string;
+  revision: number;
+  length: number;
+  word_count: number;
+  updated_at: string;
+}
+
+export interface ScriptRevisionSummary {
+  revision: number;
+  length: number;
+  snapshot: boolean;
+  created_at: string;
+}
+
+export interface ScriptRevision {
+  script_id: string;
+  revision: number;
+  content: string;
+  created_at: string;
+}
+
 export interface AnalysisResponse {
   message: string;
   task_id: string;
@@ -33,15 +100,36 @@ export interface TaskStatus {
 export const scriptsApi = {
   getById: (id: number) => axiosClient.get<Script>(`/scripts/${id}`),
   
-  getByProject: (projectId: number) => 
-    axiosClient.get<Script[]>(`/projects/${projectId}/scripts`),
+  // The next page's cursor comes back in the X-Next-Cursor response header.
+  getByProject: (projectId: number, params?: PageParams) => 
+    axiosClient.get<ScriptSummary[]>(`/projects/${projectId}/scripts`, { params }),
   
   create: (projectId: number, data: CreateScriptData) => 
     axiosClient.post<Script>(`/projects/${projectId}/scripts`, data),
   
+  // Plain text, Fountain, or zip/tar archives of them; poll getImport for indexing progress.
+  importFiles: (projectId: number, files: File[]) => {
+    const form = new FormData();
+    files.forEach((file) => form.append('files', file));
+    return axiosClient.post<ImportJob>(`/projects/${projectId}/scripts/import`, form);
+  },
+  
+  getImport: (projectId: number, importId: string) => 
+    axiosClient.get<ImportJob>(`/projects/${projectId}/imports/${importId}`),
+  
   update: (id: number, data: UpdateScriptData) => 
     axiosClient.put<Script>(`/scripts/${id}`, data),
   
+  // Fails with 409 (current revision in the X-Script-Revision header) if base_revision is stale.
+  patch: (id: number, data: PatchScriptData) => 
+    axiosClient.patch<ScriptPatchResult>(`/scripts/${id}`, data),
+  
+  getRevisions: (id: number, params?: PageParams) => 
+    axiosClient.get<ScriptRevisionSummary[]>(`/scripts/${id}/revisions`, { params }),
+  
+  getRevision: (id: number, revision: number) => 
+    axiosClient.get<ScriptRevision>(`/scripts/${id}/revisions/${revision}`),
+  
   delete: (id: number) => axiosClient.delete(`/scripts/${id}`),
   
   analyze: (id: number) => 